@@ -0,0 +1,41 @@
+"""Per-round checkpoints of a task for --resume.
+
+After every complete round the generator writes ``<output_dir>/checkpoint.json``
+with what its memory journals do not capture: the round number, the initial
+plan, how many messages of each memory belong to complete rounds, and the
+state of every tool server that has a ``checkpoint`` tool (e.g. the saved
+scene and the render counter of the executor). A task started again with
+``--resume`` restores the memories and tool servers from it and continues
+with the next round instead of starting over.
+"""
+
+import json
+import os
+from typing import Any, Dict, Optional
+
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+def load_checkpoint(output_dir: str) -> Optional[Dict[str, Any]]:
+    """Return the task's last checkpoint, or None if there is none."""
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_checkpoint(output_dir: str, checkpoint: Dict[str, Any]) -> None:
+    """Replace the task's checkpoint atomically."""
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f, indent=4, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def clear_checkpoint(output_dir: str) -> None:
+    """Remove the checkpoint of an earlier run of the task."""
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    if os.path.exists(path):
+        os.unlink(path)
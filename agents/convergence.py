@@ -0,0 +1,150 @@
+"""Early stopping of generator trajectories on render similarity.
+
+The generator runs up to --max-rounds unless the model calls ``end``, also
+when its renders stopped getting closer to the target. A ConvergenceMonitor
+scores every render of ``execute_and_evaluate`` against the target with the
+photometric loss of the evaluators (mean squared error of RGB in [0, 1]),
+plus the CLIP distance (1 - cosine similarity) with ``--early-stop-clip``,
+and tells the generator to stop when
+
+- the loss is at most ``--early-stop-threshold``, or
+- ``--early-stop-patience`` evaluated rounds in a row did not improve on the
+  best loss by more than ``--early-stop-min-delta``.
+
+Render ``i`` of a round is compared with target view ``i`` (``render<i>.png``
+of a target directory) and the losses of the views are averaged. Rounds
+without renders (errors, other tools) do not count. Every score is appended
+to ``<output_dir>/convergence.jsonl``.
+"""
+
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from utils.image_similarity import clip_similarity, photometric_loss
+
+# Target files of a directory with a single view, in order of preference
+_SINGLE_VIEW_TARGETS = ("visprompt1.png", "style1.png")
+
+
+def target_views(target_path: Optional[str]) -> List[str]:
+    """Return the target image of each view, in view order."""
+    if not target_path or not os.path.exists(target_path):
+        return []
+    if not os.path.isdir(target_path):
+        return [target_path]
+    renders = sorted(
+        (f for f in os.listdir(target_path) if re.fullmatch(r"render\d+\.png", f)),
+        key=lambda f: int(f[len("render"):-len(".png")]),
+    )
+    if renders:
+        return [os.path.join(target_path, f) for f in renders]
+    return [os.path.join(target_path, f) for f in _SINGLE_VIEW_TARGETS if os.path.exists(os.path.join(target_path, f))][:1]
+
+
+class ConvergenceMonitor:
+    """Tracks the best render loss of a trajectory and decides when to stop.
+
+    Attributes:
+        patience: Evaluated rounds without improvement before stopping (0
+            disables).
+        threshold: Loss at or below which the trajectory stops (0 disables).
+        min_delta: Improvement over the best loss that counts as one.
+        use_clip: Whether the CLIP distance is added to the loss.
+        targets: Target image of each view.
+        path: The task's convergence.jsonl, or None without an output
+            directory.
+        best_loss: Best loss so far, or None.
+        best_round: Round of the best loss.
+        stale_rounds: Evaluated rounds since the best loss.
+    """
+
+    def __init__(self, config: Dict[str, Any], resume: bool = False) -> None:
+        """Initialize the monitor from the agent configuration.
+
+        Args:
+            config: Configuration dictionary with the early_stop_* settings
+                of main.py, target_image_path and output_dir.
+            resume: Keep the scores of an earlier run of the task.
+
+        Raises:
+            ImportError: If the CLIP distance is requested and transformers
+                or torch is not installed.
+        """
+        self.patience = config.get("early_stop_patience") or 0
+        self.threshold = config.get("early_stop_threshold") or 0.0
+        self.min_delta = config.get("early_stop_min_delta") or 0.0
+        self.use_clip = bool(config.get("early_stop_clip"))
+        self.targets = target_views(config.get("target_image_path"))
+        self.path = os.path.join(config["output_dir"], "convergence.jsonl") if config.get("output_dir") else None
+        if self.path and os.path.exists(self.path) and not resume:
+            os.unlink(self.path)
+        self.best_loss: Optional[float] = None
+        self.best_round: Optional[int] = None
+        self.stale_rounds = 0
+        if self.use_clip:
+            import torch  # noqa: F401  (fail early if unavailable)
+            import transformers  # noqa: F401
+        if (self.patience or self.threshold) and not self.targets:
+            logging.warning("Early stopping is disabled: no target image found")
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the monitor can stop a trajectory."""
+        return bool(self.patience or self.threshold) and bool(self.targets)
+
+    def update(self, round_num: int, images: List[str]) -> Optional[str]:
+        """Score a round's renders and decide whether to stop.
+
+        Args:
+            round_num: The generator round.
+            images: Paths of the round's renders.
+
+        Returns:
+            Why the trajectory should stop, or None to continue.
+        """
+        pairs = [(image, target) for image, target in zip(images, self.targets) if os.path.exists(image)]
+        if not self.enabled or not pairs:
+            return None
+        losses = []
+        for image_path, target_path in pairs:
+            with Image.open(image_path) as image, Image.open(target_path) as target:
+                loss = photometric_loss(image, target)
+                if self.use_clip:
+                    loss += 1.0 - clip_similarity(image, target)
+            losses.append(loss)
+        loss = float(np.mean(losses))
+
+        if self.best_loss is None or loss < self.best_loss - self.min_delta:
+            self.best_loss, self.best_round, self.stale_rounds = loss, round_num, 0
+        else:
+            self.stale_rounds += 1
+        reason = None
+        if self.threshold and loss <= self.threshold:
+            reason = f"render loss {loss:.5f} reached the threshold {self.threshold:g}"
+        elif self.patience and self.stale_rounds >= self.patience:
+            reason = f"no improvement for {self.stale_rounds} rounds (best loss {self.best_loss:.5f} in round {self.best_round})"
+        self._log({"round": round_num, "loss": loss, "views": losses, "best_loss": self.best_loss, "best_round": self.best_round, "stale_rounds": self.stale_rounds, "stop": reason})
+        return reason
+
+    def state(self) -> Dict[str, Any]:
+        """Return the monitor's state for the task checkpoint."""
+        return {"best_loss": self.best_loss, "best_round": self.best_round, "stale_rounds": self.stale_rounds}
+
+    def restore(self, state: Optional[Dict[str, Any]]) -> None:
+        """Restore the state returned by state."""
+        if state:
+            self.best_loss = state.get("best_loss")
+            self.best_round = state.get("best_round")
+            self.stale_rounds = state.get("stale_rounds", 0)
+
+    def _log(self, record: Dict[str, Any]) -> None:
+        if self.path is None:
+            return
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")
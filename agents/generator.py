@@ -4,16 +4,25 @@ The Generator Agent is responsible for iteratively generating and refining code
 based on visual targets, using tool calls to execute and evaluate the generated code.
 """
 
+import asyncio
 import json
+import logging
 import os
-from typing import Any, Dict, List, Optional
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
+from agents.checkpoint import clear_checkpoint, load_checkpoint, save_checkpoint
+from agents.convergence import ConvergenceMonitor
+from agents.memory_journal import MemoryJournal
+from agents.phase_log import PhaseLog
 from agents.prompt_builder import PromptBuilder
-from agents.tool_client import ExternalToolClient
+from agents.tool_client import ExternalToolClient, ServerPool
 from agents.verifier import VerifierAgent
-from utils.common import get_image_base64, get_model_response, tournament_select_best, parse_groq_tool_call
+from utils.common import get_model_response, get_streamed_response, tournament_select_best, parse_groq_tool_call
+from utils.llm_cache import cache_client
+from utils.rate_limit import rate_limit_client
 
 class GeneratorAgent:
     """Agent responsible for generating and refining code based on visual targets.
@@ -29,13 +38,23 @@ class GeneratorAgent:
         tool_client: Client for calling external MCP tools.
     """
 
-    def __init__(self, args: Dict[str, Any], verifier: VerifierAgent) -> None:
+    def __init__(
+        self,
+        args: Dict[str, Any],
+        verifier: VerifierAgent,
+        clients: Optional[Tuple[OpenAI, AsyncOpenAI]] = None,
+        server_pool: Optional[ServerPool] = None
+    ) -> None:
         """Initialize the Generator Agent.
 
         Args:
             args: Configuration dictionary with keys like 'model', 'api_key',
                   'generator_tools', 'max_rounds', etc.
             verifier: Verifier agent instance for analyzing generated outputs.
+            clients: Optional (sync, async) OpenAI clients shared with other
+                tasks; they are not closed on cleanup.
+            server_pool: Optional pool of started MCP servers shared with
+                other tasks.
         """
         self.config = args
         self.memory: List[Dict[str, Any]] = []
@@ -48,20 +67,40 @@ class GeneratorAgent:
             self.init_chat_args['parallel_tool_calls'] = False
 
         # Initialize tool client
-        self.tool_client = ExternalToolClient(self.config.get("generator_tools"), self.config)
+        self.tool_client = ExternalToolClient(self.config.get("generator_tools"), self.config, pool=server_pool)
 
         # Initialize OpenAI client
-        client_kwargs = {
-            "api_key": self.config.get("api_key"),
-            "base_url": self.config.get("api_base_url") or os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1"
-        }
-        self.client = OpenAI(**client_kwargs)
+        self.owns_clients = clients is None
+        if clients:
+            self.client, self.async_client = clients
+        else:
+            client_kwargs = {
+                "api_key": self.config.get("api_key"),
+                "base_url": self.config.get("api_base_url") or os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1"
+            }
+            self.client = cache_client(rate_limit_client(OpenAI(**client_kwargs)))
+            # Chat completions go through the async client so they do not block the event loop
+            self.async_client = cache_client(rate_limit_client(AsyncOpenAI(**client_kwargs)))
+
+        # Memory is appended to <output_dir>/generator_memory.jsonl
+        self.checkpoint = load_checkpoint(self.config.get("output_dir")) if self.config.get("resume") else None
+        self.journal = MemoryJournal(self.config.get("output_dir"), "generator", resume=self.checkpoint is not None)
+        self.phases = PhaseLog(self.config.get("output_dir"), "generator")
+        self.convergence = ConvergenceMonitor(self.config, resume=self.checkpoint is not None)
 
         # Initialize system prompt
         self.prompt_builder = PromptBuilder(self.client, self.config)
         self.system_prompt = self.prompt_builder.build_prompt("generator", "system")
         self.memory.extend(self.system_prompt)
 
+        # Continue from the memory of the last complete round
+        if self.checkpoint is not None:
+            self.memory = self.journal.restore(self.checkpoint["generator_messages"]) or self.memory
+            self.init_plan = self.checkpoint.get("init_plan")
+            self.convergence.restore(self.checkpoint.get("convergence"))
+        else:
+            clear_checkpoint(self.config.get("output_dir"))
+
     async def run(self) -> None:
         """Run the generator agent loop to produce and refine code.
 
@@ -70,18 +109,28 @@ class GeneratorAgent:
         """
         print("\n=== Running generator agent ===\n")
 
+        start_round = 0
+        if self.checkpoint is not None:
+            start_round = self.checkpoint["round"] + 1
+            if self.checkpoint.get("finished"):
+                start_round = self.config.get("max_rounds")
+            print(f"=== Resuming from the checkpoint of round {self.checkpoint['round']} ===")
+            await self.tool_client.restore(self.checkpoint["tools"].get("generator", {}))
+            await self.verifier.tool_client.restore(self.checkpoint["tools"].get("verifier", {}))
+
         # If init.py is in the tool servers, auto-call reconstruct_full_scene
         # to initialize the 3D scene before the conversation begins.
         try:
-            if any("init.py" in server for server in self.tool_client.tool_servers):
+            if self.checkpoint is None and any("init.py" in server for server in self.tool_client.tool_servers):
                 print("=== Auto-calling init.reconstruct_full_scene to initialize scene ===")
                 _ = await self.tool_client.call_tool("reconstruct_full_scene", {})
                 print("=== init.reconstruct_full_scene finished ===")
         except Exception as e:
             print(f"Warning: auto init reconstruct_full_scene failed: {e}")
 
-        for i in range(self.config.get("max_rounds")):
+        for i in range(start_round, self.config.get("max_rounds")):
             print(f"=== Round {i} ===\n")
+            round_start = time.time()
             
             # Prepare chat args
             print("Prepare chat args...")
@@ -95,7 +144,16 @@ class GeneratorAgent:
 
             # Generate response
             print("Generate response...")
-            responses = get_model_response(self.client, chat_args, self.config.get("num_candidates", 4))
+            if self.config.get("stream") and self.config.get("num_candidates", 4) <= 1:
+                model_response = self._stream_response(chat_args)
+            else:
+                model_response = get_model_response(self.async_client, chat_args, self.config.get("num_candidates", 4), self.config.get("llm_concurrency") or 0)
+            with self.phases.phase("llm", round=i):
+                if self.config.get("pipeline"):
+                    # Start Blender while the LLM samples the next step
+                    responses, _ = await asyncio.gather(model_response, self._warm_tools())
+                else:
+                    responses = await model_response
             message = responses[0].choices[0].message
             
             # Handle tool call
@@ -115,10 +173,15 @@ class GeneratorAgent:
                     self.memory.append({"role": "assistant", "content": "No output"})
                 self.memory.append({"role": "user", "content": "Every single output must contain a 'tool_call' field. Your previous message did not contain a 'tool_call' field. Please reconsider."})
                 self._save_memory()
+                await self._save_checkpoint(i)
+                self.phases.write("round", round_start, round=i)
                 continue
             elif self.config.get("no_tools"):
                 # We can support multiple candidates here
                 tool_responses = []
+                # With forked candidate evaluation, execute all candidates in one batch
+                batch_codes = []
+                use_batch = self.config.get("fork_candidates") and "execute_candidates" in self.tool_client.tool_to_server
                 for response in responses:
                     message = response.choices[0].message
                     content = message.content
@@ -127,6 +190,9 @@ class GeneratorAgent:
                         json_content = json.loads(json_content)
                         json_content = {'thought': str(json_content.get('thought', '')), 'code_diff': str(json_content.get('code_diff', '')), 'code': str(json_content.get('code', ''))}
                         tool_name = "execute_and_evaluate"
+                        if use_batch:
+                            batch_codes.append(json_content['code'])
+                            continue
                         tool_response = await self.tool_client.call_tool("execute_and_evaluate", json_content)
                         tool_responses.append(tool_response)
                     except Exception as e:
@@ -135,10 +201,21 @@ class GeneratorAgent:
                         self.memory.append({"role": "user", "content": f"Error executing tool: {e}. Please try again."})
                         self._save_memory()
                         continue
-                best_idx = tournament_select_best(tool_responses, self.config.get("target_image_path"), self.config.get("model"))
+                if batch_codes:
+                    batch_response = await self.tool_client.call_tool("execute_candidates", {"codes": batch_codes})
+                    tool_responses.extend(batch_response.get("candidates", [batch_response]))
+                # The tournament makes blocking VLM calls, keep the event loop free for other tasks
+                best_idx = await asyncio.to_thread(
+                    tournament_select_best,
+                    tool_responses,
+                    self.config.get("target_image_path"),
+                    self.config.get("model"),
+                    self.config.get("tournament_margin") or 0.0,
+                    bool(self.config.get("tournament_clip")),
+                )
                 tool_response = tool_responses[best_idx]
                 if tool_response.get('require_verifier', False):
-                    verifier_result = await self.verifier.run({"argument": json_content, "execution": tool_response})
+                    verifier_result = await self._run_verifier({"argument": json_content, "execution": tool_response}, message, tool_response)
                     tool_response['verifier_result'] = verifier_result
             else:
                 # Use parsed tool call (for Groq) or native tool_calls
@@ -158,33 +235,135 @@ class GeneratorAgent:
                 
                 # If the tool is execute_and_evaluate, run the verifier
                 if tool_response.get('require_verifier', False):
-                    verifier_result = await self.verifier.run({"argument": tool_arguments, "execution": tool_response, "init_plan": self.init_plan})
+                    verifier_result = await self._run_verifier({"argument": tool_arguments, "execution": tool_response, "init_plan": self.init_plan}, message, tool_response)
                     tool_response['verifier_result'] = verifier_result
                     
+            # Stop once the renders converged on the target
+            stop_reason = None
+            if tool_name == "execute_and_evaluate" and tool_response.get("image") and self.convergence.enabled:
+                stop_reason = await asyncio.to_thread(self.convergence.update, i, tool_response["image"])
+
             # Update and save memory
             print("Update and save memory...")
             self._update_memory({"assistant": message, "user": tool_response})
             self._save_memory()
+            await self._save_checkpoint(i, finished=tool_name == "end" or stop_reason is not None)
+            self.phases.write("round", round_start, round=i)
             
             if tool_name == "end":
                 break
-        
+            if stop_reason:
+                print(f"=== Stopping early: {stop_reason} ===")
+                break
+
+        # Re-render the final round at full quality if a final profile is set
+        if self.config.get("final_render_profile") and "render_final" in self.tool_client.tool_to_server:
+            print("=== Re-rendering final round ===")
+            result = await self.tool_client.call_tool("render_final", {})
+            print(f"=== Final render: {result.get('text')} ===")
+
         print("\n=== Finish generator process ===\n")
     
-    def _update_memory(self, message: Dict[str, Any]) -> None:
-        """Update the conversation memory with the new assistant and tool messages.
+    async def _run_verifier(self, user_message: Dict[str, Any], message: Any, tool_response: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the verifier on a round, preparing the next round meanwhile if pipelined.
+
+        Args:
+            user_message: The verifier's input.
+            message: The model response of the round.
+            tool_response: The tool response of the round, without the
+                verifier result.
+
+        Returns:
+            The verifier result.
+        """
+        if not self.config.get("pipeline"):
+            return await self.verifier.run(user_message)
+        verifier_result, _ = await asyncio.gather(
+            self.verifier.run(user_message),
+            self._prefetch_next_round(message, tool_response),
+        )
+        return verifier_result
+
+    async def _prefetch_next_round(self, message: Any, tool_response: Dict[str, Any]) -> None:
+        """Prepare what the next round needs independently of the verifier result.
+
+        Encodes the round's images and builds the next memory window once in
+        a thread, which fills the image caches the real build then hits, and
+        starts Blender workers that are not running. A failed build only
+        costs the prefetch.
+
+        Args:
+            message: The model response of the round.
+            tool_response: The tool response of the round.
+        """
+        def build() -> None:
+            self.prompt_builder.build_memory(self.memory + self._round_messages({"assistant": message, "user": tool_response}))
+
+        built, _ = await asyncio.gather(asyncio.to_thread(build), self._warm_tools(), return_exceptions=True)
+        if isinstance(built, Exception):
+            logging.warning(f"Prefetching the next memory window failed: {built}")
+
+    async def _stream_response(self, chat_args: Dict[str, Any]) -> List[Any]:
+        """Stream the round's single response, preparing its execution while it arrives.
+
+        Once the response's tool call is known to be execute_and_evaluate the
+        executor's Blender workers are started, and once its code argument is
+        complete the executor writes the round's code file (prepare_execution),
+        both while the rest of the response streams in. They finish before
+        the tool call is made.
+
+        Args:
+            chat_args: Chat completion arguments.
+
+        Returns:
+            The response, as a list of one candidate.
+        """
+        preparing: List[asyncio.Future] = []
+
+        def on_field(tool_name: str, field: Optional[str], value: Any) -> None:
+            if tool_name != "execute_and_evaluate":
+                return
+            if field is None:
+                preparing.append(asyncio.ensure_future(self._warm_tools()))
+            elif field == "code" and "prepare_execution" in self.tool_client.tool_to_server:
+                preparing.append(asyncio.ensure_future(self.tool_client.call_tool("prepare_execution", {"code": value})))
+
+        try:
+            response = await get_streamed_response(self.async_client, chat_args, on_field, bool(self.config.get("no_tools")))
+        finally:
+            for result in await asyncio.gather(*preparing, return_exceptions=True):
+                if isinstance(result, Exception):
+                    logging.warning(f"Preparing the execution failed: {result}")
+        return [response]
+
+    async def _warm_tools(self) -> None:
+        """Start the executor's resident Blender workers if it supports warming."""
+        if "warm" not in self.tool_client.tool_to_server:
+            return
+        try:
+            await self.tool_client.call_tool("warm", {})
+        except Exception as e:
+            logging.warning(f"Warming Blender workers failed: {e}")
+
+    def _round_messages(self, message: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Build the memory messages of a round's tool call and its response.
 
         Args:
             message: Dictionary containing 'assistant' (the model response) and
                      'user' (the tool response with text, images, and optional verifier result).
+
+        Returns:
+            The assistant message, the tool message and, for images, a user message.
         """
+        messages = []
+
         # Add tool calling
         assistant_content = message['assistant'].content
         if not self.config.get("no_tools"):
             assistant_tool_calls = message['assistant'].tool_calls[0].model_dump()
-            self.memory.append({"role": "assistant", "content": assistant_content, "tool_calls": [assistant_tool_calls]})
+            messages.append({"role": "assistant", "content": assistant_content, "tool_calls": [assistant_tool_calls]})
         else:
-            self.memory.append({"role": "assistant", "content": assistant_content})
+            messages.append({"role": "assistant", "content": assistant_content})
         
         # Add tool response
         if not self.config.get("no_tools"):
@@ -197,10 +376,9 @@ class GeneratorAgent:
         user_response = []
         
         if 'image' in message['user']:
-            for text, image in zip(message['user']['text'], message['user']['image']):
-                user_response.append({"type": "text", "text": text})
-                user_response.append({"type": "image_url", "image_url": {"url": get_image_base64(image)}})
-                user_response.append({"type": "text", "text": f"Image loaded from local path: {image}"})
+            user_response.extend(self.prompt_builder.images.image_parts(
+                message['user']['image'], "Image loaded from local path: {path}", texts=message['user']['text']
+            ))
         else:
             for text in message['user']['text']:
                 tool_response.append({"type": "text", "text": text})
@@ -212,11 +390,23 @@ class GeneratorAgent:
             tool_response.append({"type": "text", "text": "The next user message contains the image result of the tool call."})
         
         if self.config.get("no_tools"):
-            self.memory.append({"role": "assistant", "content": tool_response})
+            messages.append({"role": "assistant", "content": tool_response})
         else:
-            self.memory.append({"role": "tool", "content": tool_response, "name": tool_call_name, "tool_call_id": tool_call_id})
+            messages.append({"role": "tool", "content": tool_response, "name": tool_call_name, "tool_call_id": tool_call_id})
         if user_response:
-            self.memory.append({"role": "user", "content": user_response})
+            messages.append({"role": "user", "content": user_response})
+        return messages
+
+    def _update_memory(self, message: Dict[str, Any]) -> None:
+        """Update the conversation memory with the new assistant and tool messages.
+
+        Args:
+            message: Dictionary containing 'assistant' (the model response) and
+                     'user' (the tool response with text, images, and optional verifier result).
+        """
+        with self.phases.phase("encode"):
+            self.memory.extend(self._round_messages(message))
+        tool_call_name = '' if self.config.get("no_tools") else message['assistant'].tool_calls[0].function.name
         
         # Add initial plan
         if tool_call_name == "initialize_plan":
@@ -240,11 +430,33 @@ class GeneratorAgent:
                 print(f"Error adding downloaded assets: {e}")
     
     def _save_memory(self) -> None:
-        """Save the conversation memory to a JSON file in the output directory."""
-        output_file = self.config.get("output_dir") + "/generator_memory.json"
-        with open(output_file, "w") as f:
-            json.dump(self.memory, f, indent=4, ensure_ascii=False)
-    
+        """Save the conversation memory to its journal in the output directory."""
+        with self.phases.phase("memory"):
+            self.journal.save(self.memory)
+
+    async def _save_checkpoint(self, round_num: int, finished: bool = False) -> None:
+        """Checkpoint a complete round so the task can be resumed after it.
+
+        Args:
+            round_num: The round that just completed.
+            finished: Whether the generator ended the task in this round.
+        """
+        with self.phases.phase("checkpoint", round=round_num):
+            save_checkpoint(self.config.get("output_dir"), {
+                "round": round_num,
+                "finished": finished,
+                "init_plan": self.init_plan,
+                "convergence": self.convergence.state(),
+                "generator_messages": len(self.memory),
+                "verifier_messages": len(self.verifier.saved_memory),
+                "tools": {
+                    "generator": await self.tool_client.checkpoint(),
+                    "verifier": await self.verifier.tool_client.checkpoint(),
+                },
+            })
+
     async def cleanup(self) -> None:
         """Clean up external connections."""
-        await self.tool_client.cleanup()
\ No newline at end of file
+        await self.tool_client.cleanup()
+        if self.owns_clients:
+            await self.async_client.close()
\ No newline at end of file
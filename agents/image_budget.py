@@ -0,0 +1,271 @@
+"""Image payload budget for messages sent to the VLM.
+
+Renders are attached to every round at full resolution, and multi-camera
+tasks attach several per round. ImageBudget controls what those images cost:
+
+- each image can be downscaled and re-encoded as JPEG or WebP;
+- the renders of one tool call can be tiled into a single mosaic image;
+- a request whose images exceed the byte or token budget has its older
+  images shrunk, then replaced by a text placeholder, until it fits. The
+  images of the system prompt (target and initial images) and the latest
+  image are never touched.
+
+Tokens are estimated with OpenAI's image pricing (512px tiles at high
+detail, a flat cost at low detail); other providers scale similarly with
+resolution.
+"""
+
+import base64
+import io
+import logging
+import math
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from PIL import Image, ImageDraw
+
+from utils.common import get_image_base64, image_cache
+
+# Token cost of an image at low detail, and per 512px tile plus base at high detail
+_LOW_DETAIL_TOKENS = 85
+_TILE_TOKENS = 170
+
+# Longest side of images shrunk to fit the request budget
+_SHRUNK_SIDE = 256
+
+_MIME = {"JPEG": "jpeg", "PNG": "png", "WEBP": "webp"}
+
+
+def _to_data_url(image: Image.Image, save_format: str, quality: int) -> str:
+    """Encode a PIL image as a data URL."""
+    if save_format == "JPEG" and image.mode != "RGB":
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            # JPEG has no alpha, composite onto white like get_image_base64
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.split()[-1])
+            image = background
+        else:
+            image = image.convert("RGB")
+    elif image.mode == "P":
+        image = image.convert("RGBA")
+    buffer = io.BytesIO()
+    if save_format == "PNG":
+        image.save(buffer, format="PNG")
+    else:
+        image.save(buffer, format=save_format, quality=quality)
+    return f"data:image/{_MIME[save_format]};base64,{base64.b64encode(buffer.getvalue()).decode('utf-8')}"
+
+
+def _decode_data_url(url: str) -> Image.Image:
+    """Open the image of a data URL."""
+    return Image.open(io.BytesIO(base64.b64decode(url.split(",", 1)[1])))
+
+
+@lru_cache(maxsize=512)
+def _image_size(url: str) -> Tuple[int, int]:
+    """Return the pixel size of a data URL's image (reads the header only)."""
+    return _decode_data_url(url).size
+
+
+@lru_cache(maxsize=256)
+def _shrink(url: str, side: int, quality: int) -> str:
+    """Downscale a data URL's image to a longest side and re-encode it as JPEG."""
+    image = _decode_data_url(url)
+    image.thumbnail((side, side), Image.LANCZOS)
+    return _to_data_url(image, "JPEG", quality)
+
+
+def estimate_image_tokens(url: str, detail: Optional[str] = None) -> int:
+    """Estimate the prompt tokens of an image with OpenAI's tile formula.
+
+    Args:
+        url: Data URL of the image.
+        detail: The image_url detail ('low' has a flat cost).
+    """
+    if detail == "low":
+        return _LOW_DETAIL_TOKENS
+    if not url.startswith("data:"):
+        # Remote image of unknown size, count a single tile
+        return _LOW_DETAIL_TOKENS + _TILE_TOKENS
+    width, height = _image_size(url)
+    # Fit in 2048x2048, then scale the shortest side down to 768
+    scale = min(1.0, 2048 / max(width, height))
+    if min(width, height) * scale > 768:
+        scale = 768 / min(width, height)
+    tiles = math.ceil(width * scale / 512) * math.ceil(height * scale / 512)
+    return _LOW_DETAIL_TOKENS + _TILE_TOKENS * tiles
+
+
+class ImageBudget:
+    """Encodes images for the VLM and keeps requests within an image budget.
+
+    With the default configuration images are sent as get_image_base64
+    returns them and no budget is enforced.
+
+    Attributes:
+        max_side: Longest side images are downscaled to (0 keeps the size).
+        image_format: 'original', 'jpeg' or 'webp'.
+        quality: JPEG/WebP quality.
+        mosaic: Whether the images of one tool call are tiled into one image.
+        budget_bytes: Budget of the images of one request in bytes (0 disables).
+        token_budget: Budget of the images of one request in estimated tokens
+            (0 disables).
+    """
+
+    def __init__(self, config: Dict[str, Any]) -> None:
+        """Initialize the budget from the agent configuration.
+
+        Args:
+            config: Configuration dictionary with the image_* settings of
+                main.py.
+        """
+        self.max_side = config.get("image_max_side") or 0
+        self.image_format = config.get("image_format") or "original"
+        self.quality = config.get("image_quality") or 85
+        self.mosaic = bool(config.get("image_mosaic"))
+        self.budget_bytes = int((config.get("image_budget_kb") or 0) * 1024)
+        self.token_budget = config.get("image_token_budget") or 0
+
+    def encode(self, image_path: str) -> str:
+        """Return the data URL of an image file under the configured options."""
+        if not self.max_side and self.image_format == "original":
+            return get_image_base64(image_path)
+        options = ("budget", self.max_side, self.image_format, self.quality)
+        return image_cache.get(image_path, options, lambda: self._encode(Image.open(image_path), image_path))
+
+    def _encode(self, image: Image.Image, image_path: str) -> str:
+        """Downscale and re-encode an opened image."""
+        if self.max_side and max(image.size) > self.max_side:
+            image.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+        if self.image_format == "jpeg":
+            save_format = "JPEG"
+        elif self.image_format == "webp":
+            save_format = "WEBP"
+        else:
+            ext = os.path.splitext(image_path)[1].lower()
+            save_format = "JPEG" if ext in (".jpg", ".jpeg") else "PNG"
+        return _to_data_url(image, save_format, self.quality)
+
+    def image_parts(
+        self,
+        images: Sequence[str],
+        path_text: str,
+        texts: Optional[Sequence[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Build the content parts showing the images of one tool call.
+
+        Each image becomes its caption (if given), the image and a line with
+        its local path. With mosaic enabled, several images become one
+        mosaic with numbered tiles, preceded by the numbered captions.
+
+        Args:
+            images: Path of each image.
+            path_text: Text after each image; '{path}' is replaced by its path.
+            texts: Caption of each image; images without one are skipped.
+        """
+        if texts is not None:
+            count = min(len(images), len(texts))
+            images, texts = list(images)[:count], list(texts)[:count]
+        if self.mosaic and len(images) > 1:
+            parts = []
+            if texts is not None:
+                captions = "\n".join(f"[{i + 1}] {text}" for i, text in enumerate(texts))
+                parts.append({"type": "text", "text": f"{captions}\nThe {len(images)} images are tiled left to right, top to bottom into one image and numbered in their corners."})
+            parts.append({"type": "image_url", "image_url": {"url": self.encode_mosaic(images)}})
+            parts.append({"type": "text", "text": path_text.format(path=", ".join(f"[{i + 1}] {path}" for i, path in enumerate(images)))})
+            return parts
+        parts = []
+        for i, image in enumerate(images):
+            if texts is not None:
+                parts.append({"type": "text", "text": texts[i]})
+            parts.append({"type": "image_url", "image_url": {"url": self.encode(image)}})
+            parts.append({"type": "text", "text": path_text.format(path=image)})
+        return parts
+
+    def encode_mosaic(self, image_paths: Sequence[str]) -> str:
+        """Return the data URL of the images tiled into a numbered grid."""
+        stats = tuple((os.path.abspath(p), os.stat(p).st_mtime_ns, os.stat(p).st_size) for p in image_paths[1:])
+        options = ("mosaic", stats, self.max_side, self.image_format, self.quality)
+        return image_cache.get(image_paths[0], options, lambda: self._encode_mosaic(image_paths))
+
+    def _encode_mosaic(self, image_paths: Sequence[str]) -> str:
+        images = [Image.open(p).convert("RGB") for p in image_paths]
+        cols = math.ceil(math.sqrt(len(images)))
+        rows = math.ceil(len(images) / cols)
+        tile_w = max(image.width for image in images)
+        tile_h = max(image.height for image in images)
+        mosaic = Image.new("RGB", (cols * tile_w, rows * tile_h), (255, 255, 255))
+        draw = ImageDraw.Draw(mosaic)
+        label_size = max(16, tile_h // 12)
+        for i, image in enumerate(images):
+            x, y = (i % cols) * tile_w, (i // cols) * tile_h
+            mosaic.paste(image, (x, y))
+            draw.rectangle((x, y, x + label_size * 1.6, y + label_size * 1.4), fill=(0, 0, 0))
+            draw.text((x + label_size * 0.3, y + label_size * 0.1), str(i + 1), fill=(255, 255, 255), font_size=label_size)
+        if self.image_format == "original" and not self.max_side:
+            return _to_data_url(mosaic, "PNG", self.quality)
+        return self._encode(mosaic, image_paths[0])
+
+    def fit(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Shrink or drop older images until a request fits the budget.
+
+        Messages are copied where they change; the agent's memory is not
+        modified.
+
+        Args:
+            messages: Messages of one request.
+
+        Returns:
+            The messages, with older images shrunk to a low-detail JPEG or
+            replaced by a placeholder as needed.
+        """
+        if not self.budget_bytes and not self.token_budget:
+            return messages
+        messages = [
+            {**message, "content": list(message["content"])} if isinstance(message.get("content"), list) else message
+            for message in messages
+        ]
+        # Images after the system prompt, oldest first; the latest stays as is
+        refs = [
+            (i, j)
+            for i, message in enumerate(messages[2:], start=2) if isinstance(message.get("content"), list)
+            for j, part in enumerate(message["content"]) if part.get("type") == "image_url"
+        ][:-1]
+        for step in (self._shrink_part, self._drop_part):
+            for i, j in refs:
+                if self._fits(messages):
+                    return messages
+                messages[i]["content"][j] = step(messages[i]["content"][j])
+        if not self._fits(messages):
+            logging.warning("Images of the request exceed the image budget even after dropping older images")
+        return messages
+
+    def _usage(self, messages: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """Return the bytes and estimated tokens of the images in messages."""
+        total_bytes = total_tokens = 0
+        for message in messages:
+            if not isinstance(message.get("content"), list):
+                continue
+            for part in message["content"]:
+                if part.get("type") == "image_url":
+                    url = part["image_url"]["url"]
+                    total_bytes += len(url)
+                    if self.token_budget:
+                        total_tokens += estimate_image_tokens(url, part["image_url"].get("detail"))
+        return total_bytes, total_tokens
+
+    def _fits(self, messages: List[Dict[str, Any]]) -> bool:
+        total_bytes, total_tokens = self._usage(messages)
+        return (not self.budget_bytes or total_bytes <= self.budget_bytes) and (not self.token_budget or total_tokens <= self.token_budget)
+
+    def _shrink_part(self, part: Dict[str, Any]) -> Dict[str, Any]:
+        if part.get("type") != "image_url" or part["image_url"].get("detail") == "low":
+            return part
+        return {"type": "image_url", "image_url": {"url": _shrink(part["image_url"]["url"], _SHRUNK_SIDE, self.quality), "detail": "low"}}
+
+    def _drop_part(self, part: Dict[str, Any]) -> Dict[str, Any]:
+        if part.get("type") != "image_url":
+            return part
+        return {"type": "text", "text": "[Older image omitted to fit the image budget]"}
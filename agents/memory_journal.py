@@ -0,0 +1,232 @@
+"""Append-only journal of agent memory.
+
+The agents used to rewrite their whole memory, base64 images included, to a
+JSON file after every message, so each round wrote more than the last. A
+MemoryJournal instead appends only the messages that are new since the last
+save, one JSON line each, to ``<output_dir>/<agent>_memory.jsonl``. Images
+are written once to ``<output_dir>/memory_images/`` under their content hash
+and referenced by path from the journal.
+
+Messages after the first two (system prompt and task context) are only ever
+appended by the agents; the first two are journaled again whenever they
+change (e.g. when the initial plan is added). A record is
+``{"index": i, "message": {...}}`` and replaces message ``i`` if it exists,
+so replaying the journal in order rebuilds the memory, also after a crash.
+
+Export the old ``<agent>_memory.json`` format, or compact a journal to one
+record per message, with::
+
+    python -m agents.memory_journal export <output_dir>
+    python -m agents.memory_journal compact <output_dir>
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List
+
+IMAGE_DIR = "memory_images"
+
+# Messages at the head of the memory that the agents modify in place
+_MUTABLE_HEAD = 2
+
+_EXTENSIONS = {"png": "png", "jpeg": "jpg", "webp": "webp"}
+_MIME = {"png": "png", "jpg": "jpeg", "webp": "webp"}
+
+
+class MemoryJournal:
+    """Appends an agent's memory to a JSONL journal with images stored by hash.
+
+    Attributes:
+        path: The journal file.
+        image_dir: Directory of the content-addressed images.
+    """
+
+    def __init__(self, output_dir: str, agent: str, resume: bool = False) -> None:
+        """Initialize the journal.
+
+        Args:
+            output_dir: Task output directory.
+            agent: Agent name, used in the file name (e.g. 'generator').
+            resume: Keep an existing journal for restore instead of starting
+                a new one.
+        """
+        self.path = Path(output_dir) / f"{agent}_memory.jsonl"
+        self.image_dir = Path(output_dir) / IMAGE_DIR
+        self._count = 0
+        if self.path.exists() and not resume:
+            self.path.unlink()
+        self._head: List[str] = []
+        # Image reference per data URL; lookups reuse the string's cached hash
+        self._refs: Dict[str, str] = {}
+
+    def save(self, memory: List[Dict[str, Any]]) -> None:
+        """Append the messages that changed since the last save.
+
+        Args:
+            memory: The agent's full memory.
+        """
+        records = []
+        head = [
+            json.dumps({"index": i, "message": self._externalize(m)}, ensure_ascii=False) + "\n"
+            for i, m in enumerate(memory[:_MUTABLE_HEAD])
+        ]
+        records.extend(line for i, line in enumerate(head) if i >= len(self._head) or self._head[i] != line)
+        self._head = head
+        for i in range(max(self._count, _MUTABLE_HEAD), len(memory)):
+            records.append(json.dumps({"index": i, "message": self._externalize(memory[i])}, ensure_ascii=False) + "\n")
+        self._count = max(self._count, len(memory))
+        if records:
+            with open(self.path, "a") as f:
+                f.write("".join(records))
+
+    def restore(self, length: int) -> List[Dict[str, Any]]:
+        """Continue the journal from its first messages, dropping the rest.
+
+        The journal is rewritten with one record per kept message.
+
+        Args:
+            length: Number of messages to keep (e.g. those of the last
+                complete round).
+
+        Returns:
+            The kept messages with images inlined.
+        """
+        memory = load_journal(self.path, inline_images=False)[:length] if self.path.exists() else []
+        lines = [json.dumps({"index": i, "message": m}, ensure_ascii=False) + "\n" for i, m in enumerate(memory)]
+        tmp = self.path.with_suffix(".jsonl.tmp")
+        with open(tmp, "w") as f:
+            f.write("".join(lines))
+        os.replace(tmp, self.path)
+        self._count = len(memory)
+        self._head = lines[:_MUTABLE_HEAD]
+        return [_inline(m, self.path.parent) for m in memory]
+
+    def _externalize(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the message with its data URL images replaced by image paths."""
+        content = message.get("content")
+        if not isinstance(content, list):
+            return message
+        parts = []
+        for part in content:
+            url = part.get("image_url", {}).get("url", "") if part.get("type") == "image_url" else ""
+            if url.startswith("data:"):
+                image_url = {k: v for k, v in part["image_url"].items() if k != "url"}
+                parts.append({**part, "image_url": {"path": self._store_image(url), **image_url}})
+            else:
+                parts.append(part)
+        return {**message, "content": parts}
+
+    def _store_image(self, url: str) -> str:
+        """Write a data URL's image under its content hash once; return its relative path."""
+        ref = self._refs.get(url)
+        if ref is None:
+            header, data = url.split(",", 1)
+            subtype = header[len("data:image/"):].split(";")[0]
+            ref = f"{IMAGE_DIR}/{hashlib.sha256(data.encode()).hexdigest()[:32]}.{_EXTENSIONS.get(subtype, subtype)}"
+            target = self.image_dir.parent / ref
+            if not target.exists():
+                self.image_dir.mkdir(parents=True, exist_ok=True)
+                tmp = target.with_suffix(target.suffix + ".tmp")
+                tmp.write_bytes(base64.b64decode(data))
+                os.replace(tmp, target)
+            self._refs[url] = ref
+        return ref
+
+
+def load_journal(path: Path, inline_images: bool = True) -> List[Dict[str, Any]]:
+    """Rebuild a memory by replaying its journal.
+
+    A truncated last line (from a crash during a write) is ignored.
+
+    Args:
+        path: The journal file.
+        inline_images: Turn image paths back into base64 data URLs.
+
+    Returns:
+        The memory as the agent held it at its last save.
+    """
+    path = Path(path)
+    memory: List[Dict[str, Any]] = []
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            index, message = record["index"], record["message"]
+            if index < len(memory):
+                memory[index] = message
+            else:
+                memory.append(message)
+    if inline_images:
+        memory = [_inline(message, path.parent) for message in memory]
+    return memory
+
+
+def _inline(message: Dict[str, Any], output_dir: Path) -> Dict[str, Any]:
+    """Return the message with image paths replaced by base64 data URLs."""
+    content = message.get("content")
+    if not isinstance(content, list):
+        return message
+    parts = []
+    for part in content:
+        if part.get("type") == "image_url" and "path" in part["image_url"]:
+            image_url = dict(part["image_url"])
+            ref = image_url.pop("path")
+            mime = _MIME.get(ref.rsplit(".", 1)[-1], "png")
+            data = base64.b64encode((output_dir / ref).read_bytes()).decode("utf-8")
+            parts.append({**part, "image_url": {"url": f"data:image/{mime};base64,{data}", **image_url}})
+        else:
+            parts.append(part)
+    return {**message, "content": parts}
+
+
+def export_memory(output_dir: str) -> List[str]:
+    """Write every journal of a task as the old indented <agent>_memory.json.
+
+    Returns:
+        The files written.
+    """
+    written = []
+    for journal in sorted(Path(output_dir).glob("*_memory.jsonl")):
+        target = journal.with_suffix(".json")
+        with open(target, "w") as f:
+            json.dump(load_journal(journal), f, indent=4, ensure_ascii=False)
+        written.append(str(target))
+    return written
+
+
+def compact_journal(output_dir: str) -> List[str]:
+    """Rewrite every journal of a task with one record per message.
+
+    Returns:
+        The journals rewritten.
+    """
+    written = []
+    for journal in sorted(Path(output_dir).glob("*_memory.jsonl")):
+        memory = load_journal(journal, inline_images=False)
+        tmp = journal.with_suffix(".jsonl.tmp")
+        with open(tmp, "w") as f:
+            for i, message in enumerate(memory):
+                f.write(json.dumps({"index": i, "message": message}, ensure_ascii=False) + "\n")
+        os.replace(tmp, journal)
+        written.append(str(journal))
+    return written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export or compact agent memory journals")
+    parser.add_argument("command", choices=["export", "compact"], help="export: write <agent>_memory.json with inline images; compact: one journal record per message")
+    parser.add_argument("output_dir", help="Task output directory")
+    args = parser.parse_args()
+    written = export_memory(args.output_dir) if args.command == "export" else compact_journal(args.output_dir)
+    for path in written:
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Per-phase timing records of the agent loop.
+
+The executor and the investigator log every Blender execution to
+``<output_dir>/timings.jsonl``. PhaseLog appends the agent side to the same
+file, one record per phase: LLM requests, tool calls (as seen by the MCP
+client), image encoding, memory journal saves, checkpoints and whole rounds.
+A record is ``{"time", "start", "wall", "tool", "kind", ...}`` with ``tool``
+the agent (or 'tool_client') and ``kind`` the phase, so the agent loop and
+Blender can be compared in one timeline (see benchmarks/).
+"""
+
+import json
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+
+class PhaseLog:
+    """Appends the timings of an agent's phases to the task's timings.jsonl.
+
+    Attributes:
+        path: The task's timings.jsonl, or None if the task has no output
+            directory (nothing is logged then).
+        tool: Name written to the records (e.g. 'generator').
+    """
+
+    def __init__(self, output_dir: Optional[str], tool: str) -> None:
+        """Initialize the log.
+
+        Args:
+            output_dir: Task output directory holding timings.jsonl.
+            tool: Name written to the records.
+        """
+        self.path = Path(output_dir) / "timings.jsonl" if output_dir else None
+        self.tool = tool
+
+    @contextmanager
+    def phase(self, kind: str, **fields: Any) -> Iterator[None]:
+        """Log the time spent in the context as one record of a phase.
+
+        Args:
+            kind: The phase (e.g. 'llm', 'tool_call', 'encode', 'memory').
+            **fields: Annotations of the record (e.g. round, name).
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.write(kind, start, **fields)
+
+    def write(self, kind: str, start: float, **fields: Any) -> None:
+        """Append the record of a phase that started at start and ends now."""
+        if self.path is None:
+            return
+        now = time.time()
+        record = {"time": now, "start": start, "wall": round(now - start, 5), "tool": self.tool, "kind": kind, **fields}
+        try:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError:
+            pass
@@ -11,8 +11,20 @@ from typing import Any, Dict, List, Optional
 
 from openai import OpenAI
 
+from agents.image_budget import ImageBudget, estimate_image_tokens
 from prompts import prompt_manager
-from utils.common import get_image_base64
+
+# Rough characters per token of English text and code, for the memory budget
+_CHARS_PER_TOKEN = 4
+# Per-message overhead of the chat format in tokens
+_MESSAGE_TOKENS = 4
+# Added to the verifier's system prompt with --parallel-verifier-tools
+_PARALLEL_TOOLS_PROMPT = (
+    "Exception to the one-tool-call rule: to observe the scene from several viewpoints, you may return several "
+    "independent investigation tool calls (initialize_viewpoint, set_camera, investigate, set_visibility, "
+    "set_keyframe) in one response. They run in order in one Blender session and their results come back "
+    "together. Call end on its own."
+)
 
 
 class PromptBuilder:
@@ -35,6 +47,7 @@ class PromptBuilder:
         """
         self.client = client
         self.config = config
+        self.images = ImageBudget(config)
 
     def build_prompt(
         self,
@@ -80,33 +93,33 @@ class PromptBuilder:
         if self.config.get("init_image_path") and agent_type == "generator":
             if os.path.isdir(self.config.get("init_image_path")):
                 if 'render1.png' in os.listdir(self.config.get("init_image_path")):
-                    content.append({"type": "image_url", "image_url": {"url": get_image_base64(os.path.join(self.config.get("init_image_path"), 'render1.png'))}})
+                    content.append({"type": "image_url", "image_url": {"url": self.images.encode(os.path.join(self.config.get("init_image_path"), 'render1.png'))}})
                     content.append({"type": "text", "text": f"Initial image loaded from local path: {os.path.join(self.config.get('init_image_path'), 'render1.png')}"})
                 else:
                     for i, file in enumerate(os.listdir(self.config.get("init_image_path"))):
-                        content.append({"type": "image_url", "image_url": {"url": get_image_base64(os.path.join(self.config.get("init_image_path"), file))}})
+                        content.append({"type": "image_url", "image_url": {"url": self.images.encode(os.path.join(self.config.get("init_image_path"), file))}})
                         content.append({"type": "text", "text": f"Initial image {i+1} loaded from local path: {os.path.join(self.config.get('init_image_path'), file)}"})
             else:
-                content.append({"type": "image_url", "image_url": {"url": get_image_base64(self.config.get("init_image_path"))}})
+                content.append({"type": "image_url", "image_url": {"url": self.images.encode(self.config.get("init_image_path"))}})
                 content.append({"type": "text", "text": f"Initial image loaded from local path: {self.config.get('init_image_path')}"})
 
         if self.config.get("target_image_path"):
             if os.path.isdir(self.config.get("target_image_path")):
                 if 'visprompt1.png' in os.listdir(self.config.get("target_image_path")):
-                    content.append({"type": "image_url", "image_url": {"url": get_image_base64(os.path.join(self.config.get("target_image_path"), 'visprompt1.png'))}})
+                    content.append({"type": "image_url", "image_url": {"url": self.images.encode(os.path.join(self.config.get("target_image_path"), 'visprompt1.png'))}})
                     content.append({"type": "text", "text": f"Target image loaded from local path: {os.path.join(self.config.get('target_image_path'), 'visprompt1.png')}"})
                 elif 'style1.png' in os.listdir(self.config.get("target_image_path")):
-                    content.append({"type": "image_url", "image_url": {"url": get_image_base64(os.path.join(self.config.get("target_image_path"), 'style1.png'))}})
+                    content.append({"type": "image_url", "image_url": {"url": self.images.encode(os.path.join(self.config.get("target_image_path"), 'style1.png'))}})
                     content.append({"type": "text", "text": f"Target image loaded from local path: {os.path.join(self.config.get('target_image_path'), 'style1.png')}"})
                 elif 'render1.png' in os.listdir(self.config.get("target_image_path")):
-                    content.append({"type": "image_url", "image_url": {"url": get_image_base64(os.path.join(self.config.get("target_image_path"), 'render1.png'))}})
+                    content.append({"type": "image_url", "image_url": {"url": self.images.encode(os.path.join(self.config.get("target_image_path"), 'render1.png'))}})
                     content.append({"type": "text", "text": f"Target image loaded from local path: {os.path.join(self.config.get('target_image_path'), 'render1.png')}"})
                 else:
                     for i, file in enumerate(os.listdir(self.config.get("target_image_path"))):
-                        content.append({"type": "image_url", "image_url": {"url": get_image_base64(os.path.join(self.config.get("target_image_path"), file))}})
+                        content.append({"type": "image_url", "image_url": {"url": self.images.encode(os.path.join(self.config.get("target_image_path"), file))}})
                         content.append({"type": "text", "text": f"Target image {i+1} loaded from local path: {os.path.join(self.config.get('target_image_path'), file)}"})
             else:
-                content.append({"type": "image_url", "image_url": {"url": get_image_base64(self.config.get("target_image_path"))}})
+                content.append({"type": "image_url", "image_url": {"url": self.images.encode(self.config.get("target_image_path"))}})
                 content.append({"type": "text", "text": f"Target image loaded from local path: {self.config.get('target_image_path')}"})  
             
         if self.config.get("target_description"):
@@ -114,11 +127,14 @@ class PromptBuilder:
         
         if self.config.get("resource_dir"):
             for file in os.listdir(os.path.join(self.config.get("resource_dir"), "media")):
-                content.append({"type": "image_url", "image_url": {"url": get_image_base64(os.path.join(self.config.get("resource_dir"), "media", file))}})
+                content.append({"type": "image_url", "image_url": {"url": self.images.encode(os.path.join(self.config.get("resource_dir"), "media", file))}})
                 content.append({"type": "text", "text": f"Resource image loaded from local path: {os.path.join(self.config.get('resource_dir'), 'media', file)}. You can import these images when generating the scene."})
             content.append({"type": "text", "text": f"Please specify the output slide path as output.pptx in the code."})
             
-        return [{"role": "system", "content": prompts.get('system', '')}, {"role": "user", "content": content}]
+        system = prompts.get('system', '')
+        if agent_type == "verifier" and self.config.get("parallel_verifier_tools") and not self.config.get("no_tools"):
+            system = f"{system}\n\n{_PARALLEL_TOOLS_PROMPT}"
+        return [{"role": "system", "content": system}, {"role": "user", "content": content}]
 
     def _build_user_prompt(self, prompts: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Build a user prompt from execution results for the verifier."""
@@ -128,9 +144,8 @@ class PromptBuilder:
         for key, value in prompts['argument'].items():
             content.append({"type": "text", "text": f"{key}: {value}"})
         if 'image' in prompts['execution']:
-            for text, image in zip(prompts['execution']['text'], prompts['execution']['image']):
-                content.append({"type": "image_url", "image_url": {"url": get_image_base64(image)}})
-                content.append({"type": "text", "text": f"Current scene render image loaded from local path: {image}"})
+            images = list(prompts['execution']['image'])[:len(prompts['execution']['text'])]
+            content.extend(self.images.image_parts(images, "Current scene render image loaded from local path: {path}"))
         else:
             for text in prompts['execution']['text']:
                 content.append({"type": "text", "text": text})
@@ -140,16 +155,29 @@ class PromptBuilder:
         """Build a truncated memory using sliding window for context management.
 
         Applies a sliding window to limit memory length while preserving system
-        prompts and handling undo operations appropriately.
+        prompts and handling undo operations appropriately. With
+        memory_token_budget set, the window is filled backwards by estimated
+        tokens instead of by message count: the system prompt, the newest
+        message and the latest render are always kept (newer messages that
+        do not fit are skipped until the render is in), and older messages
+        that do not fit with their images get the images replaced by a stub.
+        Assistant tool calls and their tool replies stay in or leave the
+        window together.
 
         Args:
             memory: Full conversation memory list.
 
         Returns:
-            Truncated memory list respecting the configured memory_length.
+            Truncated memory list respecting the configured memory_length or
+            memory_token_budget.
         """
         system_memory = memory[:2]
         reverse_memory = memory[2:][::-1]
+        token_budget = self.config.get("memory_token_budget") or 0
+        if token_budget:
+            remaining = token_budget - sum(self._estimate_tokens(m) for m in system_memory)
+            latest_render = next((m for m in reverse_memory if self._has_image(m)), None)
+            reserved = self._estimate_tokens(latest_render) if latest_render is not None else 0
         chat_memory = []
         i = 0
         while i < len(reverse_memory):
@@ -163,13 +191,28 @@ class PromptBuilder:
                 continue  # Re-check the new position from the top of the loop
             if i >= len(reverse_memory):
                 break
-            chat_memory.append(reverse_memory[i])
-            if len(chat_memory) >= self.config.get("memory_length"):
+            message = reverse_memory[i]
+            if token_budget:
+                if message is latest_render:
+                    remaining -= reserved
+                    reserved = 0
+                else:
+                    cost = self._estimate_tokens(message)
+                    if cost > remaining - reserved and self._has_image(message):
+                        message = self._stub_images(message)
+                        cost = self._estimate_tokens(message)
+                    if cost > remaining - reserved and chat_memory:
+                        if reserved:
+                            # The latest render is not in yet; skip this one instead of stopping
+                            i += 1
+                            continue
+                        break
+                    remaining -= cost
+            chat_memory.append(message)
+            if not token_budget and len(chat_memory) >= self.config.get("memory_length"):
                 break
             i += 1
-        if len(chat_memory) > 0 and chat_memory[-1]['role'] == 'tool':
-            chat_memory.pop()
-        all_memory = system_memory + chat_memory[::-1]
+        all_memory = system_memory + self._pair_tool_calls(chat_memory[::-1])
         if self.config.get('explicit_comp'):
             target_image_message = []
             for i in range(len(memory[1]['content'])):
@@ -205,4 +248,60 @@ class PromptBuilder:
                         "text": "Here are three images: target state, last state, and the state before the last state. Please compare these images and determine whether your current operation is effectively approaching the target scenario, thereby determine your next action."
                     }] + target_image_message + last_image_message + last_last_image_message
                 })
-        return all_memory
\ No newline at end of file
+        return self.images.fit(all_memory)
+
+    @staticmethod
+    def _has_image(message: Dict[str, Any]) -> bool:
+        """Return whether a message contains an image."""
+        content = message.get('content')
+        return isinstance(content, list) and any(part.get('type') == 'image_url' for part in content)
+
+    @staticmethod
+    def _pair_tool_calls(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Drop assistant tool calls missing a reply and tool replies missing their call.
+
+        The window may cut a round's messages (a parallel call has several
+        replies), and the API rejects either half on its own.
+        """
+        def call_id(tool_call: Any) -> Any:
+            return tool_call.get('id') if isinstance(tool_call, dict) else tool_call.id
+
+        replied = {m.get('tool_call_id') for m in messages if m['role'] == 'tool'}
+        called = set()
+        paired = []
+        for message in messages:
+            if message['role'] == 'assistant' and message.get('tool_calls'):
+                ids = {call_id(tool_call) for tool_call in message['tool_calls']}
+                if not ids <= replied:
+                    continue
+                called |= ids
+            elif message['role'] == 'tool' and message.get('tool_call_id') not in called:
+                continue
+            paired.append(message)
+        return paired
+
+    @staticmethod
+    def _stub_images(message: Dict[str, Any]) -> Dict[str, Any]:
+        """Return a copy of a message with its images replaced by a text stub."""
+        content = [
+            {"type": "text", "text": "[Older image omitted]"} if part.get('type') == 'image_url' else part
+            for part in message['content']
+        ]
+        return {**message, 'content': content}
+
+    @staticmethod
+    def _estimate_tokens(message: Dict[str, Any]) -> int:
+        """Estimate the prompt tokens of a message from its text length and images."""
+        tokens = _MESSAGE_TOKENS
+        content = message.get('content')
+        if isinstance(content, str):
+            tokens += len(content) // _CHARS_PER_TOKEN
+        elif isinstance(content, list):
+            for part in content:
+                if part.get('type') == 'image_url':
+                    tokens += estimate_image_tokens(part['image_url']['url'], part['image_url'].get('detail'))
+                else:
+                    tokens += len(part.get('text', '')) // _CHARS_PER_TOKEN
+        for tool_call in message.get('tool_calls') or []:
+            tokens += len(tool_call['function'].get('arguments') or '') // _CHARS_PER_TOKEN
+        return tokens
@@ -14,6 +14,7 @@ from typing import Any, Dict, List, Optional
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 
+from agents.phase_log import PhaseLog
 from utils._path import path_to_cmd
 
 class ServerHandle:
@@ -60,6 +61,11 @@ class ServerHandle:
         if self._task:
             await self._task
 
+    @property
+    def alive(self) -> bool:
+        """Whether the server connection is up."""
+        return self.session is not None and self._task is not None and not self._task.done()
+
     async def list_tools(self) -> List[str]:
         """List all available tools from this server.
 
@@ -98,6 +104,50 @@ class ServerHandle:
             raise RuntimeError(f"Server {self.path} is not started.")
         return await asyncio.wait_for(self.session.call_tool(tool_name, args), timeout=timeout)
 
+class ServerPool:
+    """Started MCP servers kept for reuse by the tasks of one process.
+
+    A server is checked out by one tool client at a time, which initializes
+    it with its task's arguments, so tasks never share server state. When
+    the client is cleaned up the server goes back to the pool instead of
+    being stopped, and the next task skips the server's startup.
+
+    Attributes:
+        idle: Started servers not checked out, indexed by server path.
+    """
+
+    def __init__(self) -> None:
+        self.idle: Dict[str, List[ServerHandle]] = {}
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, path: str) -> ServerHandle:
+        """Check out a started server, starting one if none is idle."""
+        async with self._lock:
+            handles = self.idle.get(path, [])
+            while handles:
+                handle = handles.pop()
+                if handle.alive:
+                    return handle
+        handle = ServerHandle(path)
+        await handle.start()
+        return handle
+
+    async def release(self, handle: ServerHandle) -> None:
+        """Return a server to the pool, or stop it if it died."""
+        if not handle.alive:
+            await handle.stop()
+            return
+        async with self._lock:
+            self.idle.setdefault(handle.path, []).append(handle)
+
+    async def close(self) -> None:
+        """Stop all idle servers."""
+        async with self._lock:
+            handles = [h for hs in self.idle.values() for h in hs]
+            self.idle.clear()
+        await asyncio.gather(*(h.stop() for h in handles))
+
+
 class ExternalToolClient:
     """Client for connecting to multiple external MCP tool servers.
 
@@ -106,32 +156,43 @@ class ExternalToolClient:
 
     Attributes:
         tool_to_server: Mapping from tool name to server path.
+        server_tools: Tool names of each server, indexed by server path.
         tool_configs: Tool configurations indexed by server path.
         handles: Active ServerHandle instances indexed by server path.
         tool_servers: List of server script paths to connect to.
     """
 
-    def __init__(self, tool_servers: str, args: Optional[Dict[str, Any]] = None) -> None:
+    def __init__(self, tool_servers: str, args: Optional[Dict[str, Any]] = None, pool: Optional[ServerPool] = None) -> None:
         """Initialize the external tool client.
 
         Args:
             tool_servers: Comma-separated list of MCP server script paths.
             args: Configuration arguments to pass to each server during initialization.
+            pool: Optional pool to take started servers from and return them
+                to on cleanup.
         """
         self.tool_to_server: Dict[str, str] = {}
+        self.server_tools: Dict[str, List[str]] = {}
         self.tool_configs: Dict[str, List[Dict[str, Any]]] = {}
         self.handles: Dict[str, ServerHandle] = {}
         self.tool_servers = tool_servers.split(",")
         self.args = args
+        self.pool = pool
+        self.phases = PhaseLog((args or {}).get("output_dir"), "tool_client")
 
     async def connect_servers(self) -> None:
         """Connect to all configured MCP servers and discover their tools."""
-        self.handles = {p: ServerHandle(p) for p in self.tool_servers}
-        await asyncio.gather(*(h.start() for h in self.handles.values()))
+        if self.pool:
+            handles = await asyncio.gather(*(self.pool.acquire(p) for p in self.tool_servers))
+            self.handles = dict(zip(self.tool_servers, handles))
+        else:
+            self.handles = {p: ServerHandle(p) for p in self.tool_servers}
+            await asyncio.gather(*(h.start() for h in self.handles.values()))
 
         # Build tool -> server mapping
         for path, handle in self.handles.items():
             tool_names = await handle.list_tools()
+            self.server_tools[path] = tool_names
             for tool_name in tool_names:
                 self.tool_to_server[tool_name] = path
             print(f"MCP Server {path} connected. Tools: {tool_names}")
@@ -160,11 +221,47 @@ class ExternalToolClient:
         if not server_path:
             raise RuntimeError(f"Tool {tool_name} not found in any server.")
         handle = self.handles[server_path]
-        result = await handle.call_tool(tool_name, tool_args)
-        result = json.loads(result.content[0].text)
+        with self.phases.phase("tool_call", name=tool_name):
+            result = await handle.call_tool(tool_name, tool_args)
+            result = json.loads(result.content[0].text)
         return result['output']
 
+    async def checkpoint(self) -> Dict[str, Any]:
+        """Collect the checkpoint state of every server with a checkpoint tool.
+
+        Returns:
+            The state of each server, indexed by server path.
+        """
+        paths = [p for p, names in self.server_tools.items() if "checkpoint" in names]
+        results = await asyncio.gather(*(self.handles[p].call_tool("checkpoint", {}) for p in paths))
+        states = {}
+        for path, result in zip(paths, results):
+            result = json.loads(result.content[0].text)
+            if result.get("status") == "success":
+                states[path] = result['output']['state']
+            else:
+                logging.warning(f"Checkpoint of {path} failed: {result['output']}")
+        return states
+
+    async def restore(self, states: Dict[str, Any]) -> None:
+        """Restore the checkpoint state of every server that has one.
+
+        Args:
+            states: State of each server, as returned by checkpoint.
+        """
+        paths = [p for p in states if p in self.handles and "restore" in self.server_tools.get(p, [])]
+        results = await asyncio.gather(*(self.handles[p].call_tool("restore", {"state": states[p]}) for p in paths))
+        for path, result in zip(paths, results):
+            result = json.loads(result.content[0].text)
+            if result.get("status") != "success":
+                raise RuntimeError(f"Restoring {path} failed: {result['output']}")
+
     async def cleanup(self) -> None:
-        """Clean up connections by stopping all MCP servers."""
+        """Clean up connections by stopping all MCP servers, or returning them to the pool."""
+        if self.pool:
+            await asyncio.gather(*(self.pool.release(h) for h in self.handles.values()))
+            self.handles = {}
+            print("All MCP servers returned to the pool.")
+            return
         await asyncio.gather(*(h.stop() for h in self.handles.values()))
         print("All MCP servers stopped.")
\ No newline at end of file
@@ -7,13 +7,18 @@ for the Generator Agent to refine its output.
 
 import json
 import os
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
+from agents.checkpoint import load_checkpoint
+from agents.memory_journal import MemoryJournal
+from agents.phase_log import PhaseLog
 from agents.prompt_builder import PromptBuilder
-from agents.tool_client import ExternalToolClient
-from utils.common import get_image_base64, get_model_response
+from agents.tool_client import ExternalToolClient, ServerPool
+from utils.common import get_model_response
+from utils.llm_cache import cache_client
+from utils.rate_limit import rate_limit_client
 
 
 class VerifierAgent:
@@ -30,12 +35,21 @@ class VerifierAgent:
         tool_client: Client for calling external MCP tools.
     """
 
-    def __init__(self, args: Dict[str, Any]) -> None:
+    def __init__(
+        self,
+        args: Dict[str, Any],
+        clients: Optional[Tuple[OpenAI, AsyncOpenAI]] = None,
+        server_pool: Optional[ServerPool] = None
+    ) -> None:
         """Initialize the Verifier Agent.
 
         Args:
             args: Configuration dictionary with keys like 'model', 'api_key',
                   'verifier_tools', 'max_rounds', 'clear_memory', etc.
+            clients: Optional (sync, async) OpenAI clients shared with other
+                tasks; they are not closed on cleanup.
+            server_pool: Optional pool of started MCP servers shared with
+                other tasks.
         """
         self.config = args
         self.memory: List[Dict[str, Any]] = []
@@ -43,25 +57,40 @@ class VerifierAgent:
 
         # Initialize chat args
         self.init_chat_args: Dict[str, Any] = {}
-        if 'gpt' in self.config.get("model") and not self.config.get("no_tools"):
+        if 'gpt' in self.config.get("model") and not self.config.get("no_tools") and not self.config.get("parallel_verifier_tools"):
             self.init_chat_args['parallel_tool_calls'] = False
 
         # Initialize tool client
-        self.tool_client = ExternalToolClient(self.config.get("verifier_tools"), self.config)
+        self.tool_client = ExternalToolClient(self.config.get("verifier_tools"), self.config, pool=server_pool)
 
         # Initialize OpenAI client
-        client_kwargs = {
-            "api_key": self.config.get("api_key"),
-            "base_url": self.config.get("api_base_url") or os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1"
-        }
-        self.client = OpenAI(**client_kwargs)
+        self.owns_clients = clients is None
+        if clients:
+            self.client, self.async_client = clients
+        else:
+            client_kwargs = {
+                "api_key": self.config.get("api_key"),
+                "base_url": self.config.get("api_base_url") or os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1"
+            }
+            self.client = cache_client(rate_limit_client(OpenAI(**client_kwargs)))
+            self.async_client = cache_client(rate_limit_client(AsyncOpenAI(**client_kwargs)))
+
+        # Memory is appended to <output_dir>/verifier_memory.jsonl
+        self.checkpoint = load_checkpoint(self.config.get("output_dir")) if self.config.get("resume") else None
+        self.journal = MemoryJournal(self.config.get("output_dir"), "verifier", resume=self.checkpoint is not None)
+        self.phases = PhaseLog(self.config.get("output_dir"), "verifier")
 
         # Initialize system prompt
         self.prompt_builder = PromptBuilder(self.client, self.config)
         self.system_prompt = self.prompt_builder.build_prompt("verifier", "system")
         self.memory.extend(self.system_prompt)
         self.saved_memory.extend(self.system_prompt)
-        
+
+        # Continue from the memory of the last complete generator round
+        if self.checkpoint is not None:
+            self.saved_memory = self.journal.restore(self.checkpoint["verifier_messages"]) or list(self.system_prompt)
+            self.memory = list(self.system_prompt) if self.config.get("clear_memory") else list(self.saved_memory)
+
     async def run(self, user_message: Dict[str, Any]) -> Dict[str, Any]:
         """Verify the generated scene and provide feedback.
 
@@ -82,7 +111,8 @@ class VerifierAgent:
             print("Reload scene...")
             await self.tool_client.call_tool("reload_scene", {})
         print("Build user message...")
-        user_message = self.prompt_builder.build_prompt("verifier", "user", user_message)
+        with self.phases.phase("encode"):
+            user_message = self.prompt_builder.build_prompt("verifier", "user", user_message)
         if self.config.get("clear_memory"):
             print("Clear memory...")
             self.memory = self.system_prompt + user_message
@@ -109,7 +139,8 @@ class VerifierAgent:
             
             # Generate response
             print("Generate response...")
-            response = get_model_response(self.client, chat_args, 1)
+            with self.phases.phase("llm", round=i):
+                response = await get_model_response(self.async_client, chat_args, 1)
             message = response[0].choices[0].message
             
             # Handle tool call
@@ -138,14 +169,26 @@ class VerifierAgent:
                     self._save_memory()
                     continue
             else:
-                tool_call = message.tool_calls[0]
+                tool_calls = message.tool_calls
+                end_calls = [c for c in tool_calls if c.function.name == "end"]
+                if self.config.get("parallel_verifier_tools") and len(tool_calls) > 1 and not end_calls:
+                    print(f"Call {len(tool_calls)} tools in one batch...")
+                    tool_responses = await self._call_tools(tool_calls)
+                    print("Update and save memory...")
+                    with self.phases.phase("encode"):
+                        self._update_memory_parallel(message, tool_calls, tool_responses)
+                    self._save_memory()
+                    continue
+                # Only one call is executed; end takes precedence
+                tool_call = end_calls[0] if end_calls else tool_calls[0]
                 tool_name = tool_call.function.name
                 print(f"Call tool {tool_name}...")
                 tool_response = await self.tool_client.call_tool(tool_name, json.loads(tool_call.function.arguments))
                 
             # Update and save memory
             print("Update and save memory...")
-            self._update_memory({"assistant": message, "user": tool_response})
+            with self.phases.phase("encode"):
+                self._update_memory({"assistant": message, "user": tool_response, "tool_call": tool_call if not self.config.get("no_tools") else None})
             self._save_memory()
 
             if tool_name == "end":
@@ -168,8 +211,9 @@ class VerifierAgent:
         """
         # Add tool calling
         assistant_content = message['assistant'].content
+        tool_call = message.get('tool_call') or (message['assistant'].tool_calls[0] if message['assistant'].tool_calls else None)
         if not self.config.get("no_tools"):
-            assistant_tool_calls = message['assistant'].tool_calls[0].model_dump()
+            assistant_tool_calls = tool_call.model_dump()
             self.memory.append({"role": "assistant", "content": assistant_content, "tool_calls": [assistant_tool_calls]})
             self.saved_memory.append({"role": "assistant", "content": assistant_content, "tool_calls": [assistant_tool_calls]})
         else:
@@ -178,8 +222,8 @@ class VerifierAgent:
         
         # Add tool response
         if not self.config.get("no_tools"):
-            tool_call_id = message['assistant'].tool_calls[0].id
-            tool_call_name = message['assistant'].tool_calls[0].function.name
+            tool_call_id = tool_call.id
+            tool_call_name = tool_call.function.name
         else:
             tool_call_id = ''
             tool_call_name = ''
@@ -187,10 +231,9 @@ class VerifierAgent:
         user_response = []
         if 'image' in message['user']:
             tool_response.append({"type": "text", "text": "The next user message contains the image result of the tool call."})
-            for text, image in zip(message['user']['text'], message['user']['image']):
-                user_response.append({"type": "text", "text": text})
-                user_response.append({"type": "image_url", "image_url": {"url": get_image_base64(image)}})
-                user_response.append({"type": "text", "text": f"Image loaded from local path: {image}"})
+            user_response.extend(self.prompt_builder.images.image_parts(
+                message['user']['image'], "Image loaded from local path: {path}", texts=message['user']['text']
+            ))
         else:
             for text in message['user']['text']:
                 tool_response.append({"type": "text", "text": text}) 
@@ -205,12 +248,62 @@ class VerifierAgent:
             self.memory.append({"role": "user", "content": user_response})
             self.saved_memory.append({"role": "user", "content": user_response})
 
+    async def _call_tools(self, tool_calls: List[Any]) -> List[Dict[str, Any]]:
+        """Execute several tool calls of one response, batched where the server supports it.
+
+        Investigator calls go to investigate_batch, which renders them in one
+        Blender execution; otherwise the calls run one by one.
+
+        Args:
+            tool_calls: The tool calls of the response, in order.
+
+        Returns:
+            The output of each call.
+        """
+        calls = [{"name": c.function.name, "arguments": json.loads(c.function.arguments)} for c in tool_calls]
+        batch_server = self.tool_client.tool_to_server.get("investigate_batch")
+        if batch_server and all(self.tool_client.tool_to_server.get(c["name"]) == batch_server for c in calls):
+            output = await self.tool_client.call_tool("investigate_batch", {"calls": calls})
+            if "results" in output:
+                return output["results"]
+            return [output] * len(calls)
+        return [await self.tool_client.call_tool(c["name"], c["arguments"]) for c in calls]
+
+    def _update_memory_parallel(self, message: Any, tool_calls: List[Any], tool_responses: List[Dict[str, Any]]) -> None:
+        """Update both memories with a response of several tool calls.
+
+        Every call gets its tool message with its text results; the images
+        of all calls come back together in one user message.
+
+        Args:
+            message: The model response.
+            tool_calls: Its tool calls.
+            tool_responses: The output of each call.
+        """
+        messages = [{"role": "assistant", "content": message.content, "tool_calls": [c.model_dump() for c in tool_calls]}]
+        user_response = []
+        for i, (tool_call, response) in enumerate(zip(tool_calls, tool_responses)):
+            if 'image' in response:
+                tool_response = [{"type": "text", "text": f"The images of this call are in the next user message, under 'Call {i + 1}'."}]
+                user_response.append({"type": "text", "text": f"Call {i + 1} ({tool_call.function.name}):"})
+                user_response.extend(self.prompt_builder.images.image_parts(
+                    response['image'], "Image loaded from local path: {path}", texts=response['text']
+                ))
+            else:
+                tool_response = [{"type": "text", "text": text} for text in response.get('text', [])]
+            messages.append({"role": "tool", "content": tool_response, "name": tool_call.function.name, "tool_call_id": tool_call.id})
+        if user_response:
+            messages.append({"role": "user", "content": user_response})
+        self.memory.extend(messages)
+        self.saved_memory.extend(messages)
+
     def _save_memory(self) -> None:
-        """Save the persistent memory to a JSON file in the output directory."""
-        output_file = self.config.get("output_dir") + "/verifier_memory.json"
-        with open(output_file, "w") as f:
-            json.dump(self.saved_memory, f, indent=4, ensure_ascii=False)
+        """Save the persistent memory to its journal in the output directory."""
+        with self.phases.phase("memory"):
+            self.journal.save(self.saved_memory)
 
     async def cleanup(self) -> None:
         """Clean up external connections."""
-        await self.tool_client.cleanup()
\ No newline at end of file
+        await self.tool_client.cleanup()
+        if self.owns_clients:
+            await self.async_client.close()
\ No newline at end of file
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Stand-in for the Blender executable of the executor.
+
+Accepts the command line the executor builds for a fresh Blender process
+(``[--threads N] --background --python <prelude> <file> --python <script>
+-- <code> <render_dir> [<save>]``), waits the configured latency and writes
+deterministic PNG renders derived from the code file into the render
+directory, and the save file if one is given. Like the real prelude it
+appends a timing record to ``VIGA_TIMINGS_FILE``.
+
+Configured through the environment, which the executor passes on:
+
+- ``FAKE_BLENDER_LATENCY``: seconds per execution (default 0);
+- ``FAKE_BLENDER_IMAGES``: renders per execution (default 1);
+- ``FAKE_BLENDER_SIZE``: side of the renders in pixels (default 512).
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+
+from PIL import Image, ImageDraw
+
+
+def render(seed: bytes, index: int, size: int, path: str) -> None:
+    """Write a deterministic image for a code file and camera."""
+    digest = hashlib.sha256(seed + bytes([index])).digest()
+    image = Image.new("RGB", (size, size), tuple(digest[:3]))
+    draw = ImageDraw.Draw(image)
+    x, y = digest[3] * size // 512, digest[4] * size // 512
+    draw.rectangle((x, y, x + size // 3, y + size // 3), fill=tuple(digest[5:8]))
+    image.save(path, format="PNG")
+
+
+def main(argv: list) -> int:
+    launch = float(os.environ.get("VIGA_LAUNCH_TIME", time.time()))
+    start = time.time()
+    if "--" not in argv:
+        print("fake_blender: no script arguments after '--'", file=sys.stderr)
+        return 1
+    script_args = argv[argv.index("--") + 1:]
+    code_path = script_args[0] if script_args else ""
+    render_dir = script_args[1] if len(script_args) > 1 and script_args[1] != "NONE" else None
+    save_path = script_args[2] if len(script_args) > 2 else None
+
+    time.sleep(float(os.environ.get("FAKE_BLENDER_LATENCY") or 0))
+    seed = b""
+    if os.path.isfile(code_path):
+        with open(code_path, "rb") as f:
+            seed = f.read()
+    exec_seconds = time.time() - start
+
+    renders = []
+    if render_dir:
+        os.makedirs(render_dir, exist_ok=True)
+        size = int(os.environ.get("FAKE_BLENDER_SIZE") or 512)
+        for i in range(int(os.environ.get("FAKE_BLENDER_IMAGES") or 1)):
+            render_start = time.time()
+            render(seed, i, size, os.path.join(render_dir, f"render{i + 1}.png"))
+            renders.append({"camera": f"Camera{i + 1}" if i else "Camera", "seconds": round(time.time() - render_start, 4)})
+    if save_path:
+        # Replace the file like save_as_mainfile does; the snapshot store may hardlink the old one
+        tmp_path = f"{save_path}.tmp{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            f.write(b"BLENDER-fake" + hashlib.sha256(seed).digest())
+        os.replace(tmp_path, save_path)
+    print(f"fake_blender: executed {code_path}")
+
+    if os.environ.get("VIGA_TIMINGS_FILE"):
+        record = {
+            "startup": round(start - launch, 4),
+            "blend_load": 0.0,
+            "exec": round(exec_seconds, 4),
+            "renders": renders,
+            "blend_save": 0.0,
+            "resident": False,
+            "script_args": script_args,
+            "peak_rss_mb": None,
+        }
+        with open(os.environ["VIGA_TIMINGS_FILE"], "a") as f:
+            f.write(json.dumps(record) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""Scripted stand-in for an OpenAI-compatible chat completions server.
+
+Answers ``POST .../chat/completions`` after a configurable latency with a
+scripted response chosen by the tools offered in the request:
+
+- requests offering ``execute_and_evaluate`` (the generator) get a call of
+  it with new code every time, so no execution is served from a cache;
+- requests offering ``end`` (the verifier) get a call of ``end``;
+- requests without tools get the JSON answer of the no-tools prompts, with
+  both the generator's and the verifier's fields.
+
+``n`` is honored, and ``usage`` estimates tokens from the request size.
+Streamed requests (``stream``) get the same response as server-sent chunks
+spread over the latency, the tool call arguments in pieces. No network
+beyond the loopback interface is needed::
+
+    python benchmarks/fake_llm.py --port 8000 --latency 0.5
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+_CODE = """import bpy
+
+# Benchmark step {step}
+bpy.ops.mesh.primitive_cube_add(size={size}, location=(0, 0, 0))
+"""
+
+
+class FakeLLMServer:
+    """Scripted chat completions server running in a background thread.
+
+    Attributes:
+        latency: Seconds every response is delayed.
+        jitter: Up to this many seconds are added to the latency at random.
+        requests: Number of requests answered.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, jitter: float = 0.0, seed: int = 0) -> None:
+        """Create the server; it listens once started.
+
+        Args:
+            host: Interface to listen on.
+            port: Port to listen on (0 picks a free one).
+            latency: Seconds every response is delayed.
+            jitter: Up to this many seconds are added to the latency at random.
+            seed: Seed of the jitter.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._steps = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to pass as --api-base-url."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def serve(self) -> None:
+        """Serve in this thread until stopped."""
+        self._server.serve_forever()
+
+    def start(self) -> "FakeLLMServer":
+        """Serve in a daemon thread."""
+        self._thread = threading.Thread(target=self.serve, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def next_delay(self) -> float:
+        """Count a request and return its delay."""
+        with self._lock:
+            self.requests += 1
+            return self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def complete(self, request: Dict[str, Any], request_bytes: int) -> Dict[str, Any]:
+        """Build the scripted response of a chat completion request after its delay."""
+        time.sleep(self.next_delay())
+        return self.respond(request, request_bytes)
+
+    def respond(self, request: Dict[str, Any], request_bytes: int) -> Dict[str, Any]:
+        """Build the scripted response of a chat completion request."""
+        tools = {t.get("function", {}).get("name") for t in request.get("tools") or []}
+        choices = [self._choice(i, tools) for i in range(max(1, int(request.get("n") or 1)))]
+        prompt_tokens = request_bytes // 4
+        completion_tokens = 50 * len(choices)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": choices,
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    def stream_chunks(self, response: Dict[str, Any], pieces: int = 8) -> List[Dict[str, Any]]:
+        """Split a response into the chunks of a streamed response."""
+        chunks = []
+        for choice in response["choices"]:
+            message = choice["message"]
+            deltas: List[Dict[str, Any]] = [{"role": "assistant", "content": ""}]
+            content = message.get("content") or ""
+            step = max(1, -(-len(content) // pieces))
+            deltas.extend({"content": content[i:i + step]} for i in range(0, len(content), step))
+            for index, call in enumerate(message.get("tool_calls") or []):
+                arguments = call["function"]["arguments"]
+                deltas.append({"tool_calls": [{"index": index, "id": call["id"], "type": "function", "function": {"name": call["function"]["name"], "arguments": ""}}]})
+                step = max(1, -(-len(arguments) // pieces))
+                deltas.extend({"tool_calls": [{"index": index, "function": {"arguments": arguments[i:i + step]}}]} for i in range(0, len(arguments), step))
+            for delta in deltas:
+                chunks.append({"index": choice["index"], "delta": delta, "finish_reason": None})
+            chunks.append({"index": choice["index"], "delta": {}, "finish_reason": choice["finish_reason"]})
+        return [
+            {"id": response["id"], "object": "chat.completion.chunk", "created": response["created"], "model": response["model"], "choices": [chunk]}
+            for chunk in chunks
+        ]
+
+    def _choice(self, index: int, tools: set) -> Dict[str, Any]:
+        if "execute_and_evaluate" in tools:
+            name, arguments = "execute_and_evaluate", self._generator_step()
+        elif "end" in tools:
+            name, arguments = "end", {"visual_difference": "The cube is too small.", "edit_suggestion": "Increase the cube size."}
+        else:
+            answer = {**self._generator_step(), "visual_difference": "The cube is too small.", "edit_suggestion": "Increase the cube size."}
+            message = {"role": "assistant", "content": f"```json\n{json.dumps(answer)}\n```"}
+            return {"index": index, "finish_reason": "stop", "message": message}
+        message = {
+            "role": "assistant",
+            "content": "",
+            "tool_calls": [{"id": f"call_{uuid.uuid4().hex[:24]}", "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}],
+        }
+        return {"index": index, "finish_reason": "tool_calls", "message": message}
+
+    def _generator_step(self) -> Dict[str, str]:
+        with self._lock:
+            self._steps += 1
+            step = self._steps
+        return {"thought": f"Step {step}: adjust the cube.", "code_diff": "", "code": _CODE.format(step=step, size=1 + step % 5)}
+
+    def _handler_class(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                try:
+                    request = json.loads(body)
+                except ValueError:
+                    self._send(400, {"error": {"message": "Invalid JSON"}})
+                    return
+                if request.get("stream"):
+                    self._stream(request, len(body))
+                else:
+                    self._send(200, server.complete(request, len(body)))
+
+            def _stream(self, request: Dict[str, Any], request_bytes: int) -> None:
+                delay = server.next_delay()
+                chunks = server.stream_chunks(server.respond(request, request_bytes))
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                for chunk in chunks:
+                    time.sleep(delay / len(chunks))
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+
+            def _send(self, status: int, payload: Dict[str, Any]) -> None:
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        return Handler
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Scripted OpenAI-compatible chat completions server")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds every response is delayed")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many seconds are added to the latency at random")
+    args = parser.parse_args(argv)
+    server = FakeLLMServer(args.host, args.port, args.latency, args.jitter)
+    print(f"Serving scripted chat completions at {server.url}")
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
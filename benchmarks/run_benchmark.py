@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""Offline benchmark of the agent loop.
+
+Runs ``main.py`` on a synthetic BlenderGym task against the scripted LLM of
+``fake_llm.py`` and the stub Blender of ``fake_blender.py``, so the
+orchestration overhead (MCP transport, image encoding, memory journals,
+checkpoints) can be measured on a CPU-only machine without network. LLM and
+Blender latencies are configurable, so their share can be set to zero to
+see the overhead alone or to realistic values to see how much of it is
+hidden.
+
+Every run reads the task's ``timings.jsonl`` (agent phases from
+``agents/phase_log.py``, Blender executions from the executor) and reports
+rounds per second, latency percentiles per phase and the peak resident
+memory of the process tree. Arguments the harness does not know are passed
+to ``main.py``, so configurations can be compared::
+
+    python benchmarks/run_benchmark.py --rounds 10 --repeat 3 --report base.json
+    python benchmarks/run_benchmark.py --rounds 10 --repeat 3 --baseline base.json --pipeline
+
+With ``--baseline`` the exit status is 1 if rounds per second or the median
+of a phase got worse than the baseline by more than ``--tolerance``.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.fake_blender import render
+from benchmarks.fake_llm import FakeLLMServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Phases in report order, with what they cover
+PHASES = {
+    "round": "One generator round, verifier included",
+    "llm": "LLM request of the generator or the verifier",
+    "tool_call": "Tool call as seen by the MCP client",
+    "blender": "Blender execution as seen by the executor",
+    "mcp": "Tool call time outside Blender (MCP transport and tool handler)",
+    "encode": "Adding a round to memory, images encoded",
+    "memory": "Memory journal save",
+    "checkpoint": "Checkpoint of a round, tool servers included",
+}
+
+# Phases whose median may grow by this much without counting as a regression
+_SLACK_SECONDS = 0.002
+
+
+def prepare_task(work_dir: str, image_size: int) -> Dict[str, str]:
+    """Create the synthetic task: images, initial code, scene file and Blender stub.
+
+    Returns:
+        Paths of the task files, by main.py argument.
+    """
+    task_dir = os.path.join(work_dir, "task")
+    for name in ("target", "init"):
+        os.makedirs(os.path.join(task_dir, name), exist_ok=True)
+        render(name.encode(), 0, image_size, os.path.join(task_dir, name, "render1.png"))
+    init_code = os.path.join(task_dir, "init.py")
+    with open(init_code, "w") as f:
+        f.write("import bpy\n\nbpy.ops.mesh.primitive_cube_add(size=1, location=(0, 0, 0))\n")
+    blend_file = os.path.join(task_dir, "scene.blend")
+    with open(blend_file, "wb") as f:
+        f.write(b"BLENDER-fake")
+    # The executor runs the Blender command directly, so wrap the stub in an executable
+    blender = os.path.join(task_dir, "blender")
+    with open(blender, "w") as f:
+        f.write(f'#!/bin/sh\nexec "{sys.executable}" "{os.path.join(REPO_ROOT, "benchmarks", "fake_blender.py")}" "$@"\n')
+    os.chmod(blender, 0o755)
+    return {
+        "init_code_path": init_code,
+        "init_image_path": os.path.join(task_dir, "init"),
+        "target_image_path": os.path.join(task_dir, "target"),
+        "blender_file": blend_file,
+        "blender_command": blender,
+    }
+
+
+def _tree_rss_mb(root: int) -> Optional[float]:
+    """Return the summed resident memory of a process and its descendants in MB, or None without /proc."""
+    if not os.path.isdir("/proc"):
+        return None
+    page_mb = os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    parents, rss = {}, {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # Fields after the parenthesized command name; ppid is the 2nd, rss the 22nd
+        fields = stat[stat.rfind(")") + 2:].split()
+        parents[int(entry)] = int(fields[1])
+        rss[int(entry)] = int(fields[21]) * page_mb
+    tree, frontier = {root}, [root]
+    while frontier:
+        pid = frontier.pop()
+        children = [p for p, parent in parents.items() if parent == pid and p not in tree]
+        tree.update(children)
+        frontier.extend(children)
+    return sum(rss.get(pid, 0.0) for pid in tree)
+
+
+def run_once(task: Dict[str, str], server: FakeLLMServer, output_dir: str, args: argparse.Namespace, extra_args: List[str]) -> Dict[str, Any]:
+    """Run main.py once and measure it.
+
+    Returns:
+        The run's wall time, exit status, peak memory and timing records.
+    """
+    cmd = [
+        sys.executable, "main.py",
+        "--mode", "blendergym",
+        "--model", "gpt-4o",
+        "--api-key", "benchmark",
+        "--api-base-url", server.url,
+        "--max-rounds", str(args.rounds),
+        "--output-dir", output_dir,
+        "--init-code-path", task["init_code_path"],
+        "--init-image-path", task["init_image_path"],
+        "--target-image-path", task["target_image_path"],
+        "--blender-command", task["blender_command"],
+        "--blender-file", task["blender_file"],
+        "--blender-save", os.path.join(output_dir, "state.blend"),
+        "--generator-tools", args.generator_tools,
+        "--verifier-tools", args.verifier_tools,
+        *extra_args,
+    ]
+    env = os.environ.copy()
+    env.update({
+        "FAKE_BLENDER_LATENCY": str(args.blender_latency),
+        "FAKE_BLENDER_IMAGES": str(args.images),
+        "FAKE_BLENDER_SIZE": str(args.image_size),
+    })
+    # Every request must reach the scripted server
+    env.pop("LLM_CACHE", None)
+    env.pop("LLM_CACHE_MODE", None)
+
+    os.makedirs(output_dir, exist_ok=True)
+    start = time.time()
+    with open(os.path.join(output_dir, "benchmark.log"), "w") as log:
+        proc = subprocess.Popen(cmd, cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+        peak = [0.0]
+        done = threading.Event()
+
+        def sample() -> None:
+            while not done.wait(0.1):
+                rss = _tree_rss_mb(proc.pid)
+                if rss is not None:
+                    peak[0] = max(peak[0], rss)
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        returncode = proc.wait()
+        done.set()
+        sampler.join()
+    wall = time.time() - start
+
+    records = []
+    timings = os.path.join(output_dir, "timings.jsonl")
+    if os.path.exists(timings):
+        with open(timings, "r") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    return {"wall": wall, "returncode": returncode, "peak_rss_mb": peak[0] or None, "records": records}
+
+
+def phase_samples(records: List[Dict[str, Any]]) -> Tuple[Dict[str, List[float]], int, float]:
+    """Sort a run's timing records into phase samples.
+
+    Returns:
+        The samples of each phase in seconds, the number of rounds and the
+        time from the start of the first round to the end of the last.
+    """
+    samples: Dict[str, List[float]] = {phase: [] for phase in PHASES}
+    blender = [(r["time"] - r["wall"], r["time"]) for r in records if r.get("tool") in ("exec", "investigator") and "wall" in r]
+    rounds = [r for r in records if r.get("tool") == "generator" and r.get("kind") == "round"]
+    for record in records:
+        tool, kind = record.get("tool"), record.get("kind")
+        if tool in ("exec", "investigator") and "wall" in record:
+            samples["blender"].append(record["wall"])
+        elif tool == "generator" and kind == "round":
+            samples["round"].append(record["wall"])
+        elif tool == "tool_client" and kind == "tool_call":
+            samples["tool_call"].append(record["wall"])
+            start, end = record["start"], record["time"]
+            inside = sum(max(0.0, min(end, b_end) - max(start, b_start)) for b_start, b_end in blender)
+            samples["mcp"].append(max(0.0, record["wall"] - inside))
+        elif kind in samples:
+            samples[kind].append(record["wall"])
+    loop = max(r["time"] for r in rounds) - min(r["start"] for r in rounds) if rounds else 0.0
+    return samples, len(rounds), loop
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Return the q-th percentile of values with linear interpolation."""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Aggregate the runs into the report."""
+    samples: Dict[str, List[float]] = {phase: [] for phase in PHASES}
+    rates = []
+    total_rounds = 0
+    for run in runs:
+        run_samples, rounds, loop = phase_samples(run["records"])
+        for phase, values in run_samples.items():
+            samples[phase].extend(values)
+        total_rounds += rounds
+        if loop > 0:
+            rates.append(rounds / loop)
+    phases = {}
+    for phase, values in samples.items():
+        if values:
+            phases[phase] = {
+                "count": len(values),
+                "mean": statistics.fmean(values),
+                "p50": percentile(values, 50),
+                "p90": percentile(values, 90),
+                "p99": percentile(values, 99),
+                "max": max(values),
+            }
+    rss = [run["peak_rss_mb"] for run in runs if run["peak_rss_mb"]]
+    return {
+        "runs": len(runs),
+        "failed_runs": sum(1 for run in runs if run["returncode"] != 0),
+        "rounds": total_rounds,
+        "rounds_per_sec": statistics.median(rates) if rates else 0.0,
+        "wall_per_run": statistics.median(run["wall"] for run in runs),
+        "peak_rss_mb": max(rss) if rss else None,
+        "phases": phases,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Return the regressions of a report against a baseline report."""
+    regressions = []
+    if baseline.get("rounds_per_sec") and report["rounds_per_sec"] < baseline["rounds_per_sec"] * (1 - tolerance):
+        regressions.append(f"rounds/sec {report['rounds_per_sec']:.3f} < baseline {baseline['rounds_per_sec']:.3f}")
+    for phase, stats in report["phases"].items():
+        base = baseline.get("phases", {}).get(phase)
+        if base and stats["p50"] > base["p50"] * (1 + tolerance) + _SLACK_SECONDS:
+            regressions.append(f"{phase} p50 {stats['p50'] * 1000:.1f}ms > baseline {base['p50'] * 1000:.1f}ms")
+    return regressions
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Print the report as a table."""
+    print(f"\nRuns: {report['runs']} ({report['failed_runs']} failed), rounds: {report['rounds']}")
+    print(f"Rounds/sec: {report['rounds_per_sec']:.3f}   wall per run: {report['wall_per_run']:.2f}s", end="")
+    print(f"   peak RSS: {report['peak_rss_mb']:.0f} MB" if report["peak_rss_mb"] else "")
+    print(f"\n{'phase':<12}{'count':>7}{'mean':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}  (ms)")
+    for phase in PHASES:
+        stats = report["phases"].get(phase)
+        if stats:
+            values = "".join(f"{stats[k] * 1000:>10.1f}" for k in ("mean", "p50", "p90", "p99", "max"))
+            print(f"{phase:<12}{stats['count']:>7}{values}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline benchmark of the agent loop; unknown arguments are passed to main.py")
+    parser.add_argument("--rounds", type=int, default=5, help="Generator rounds per run")
+    parser.add_argument("--repeat", type=int, default=1, help="Number of runs")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds the scripted LLM takes per request")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="Up to this many seconds are added to the LLM latency at random")
+    parser.add_argument("--blender-latency", type=float, default=0.0, help="Seconds the stub Blender takes per execution")
+    parser.add_argument("--images", type=int, default=1, help="Renders per execution")
+    parser.add_argument("--image-size", type=int, default=512, help="Side of the renders in pixels")
+    parser.add_argument("--generator-tools", default="tools/blender/exec.py,tools/generator_base.py", help="Generator tool servers")
+    parser.add_argument("--verifier-tools", default="tools/verifier_base.py", help="Verifier tool servers")
+    parser.add_argument("--work-dir", default=None, help="Directory of the task and run outputs (default: a new temporary directory)")
+    parser.add_argument("--report", default=None, help="Write the report as JSON to this file (default: <work-dir>/report.json)")
+    parser.add_argument("--baseline", default=None, help="Report to compare against; exit with status 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Relative slowdown against the baseline that counts as a regression")
+    args, extra_args = parser.parse_known_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="viga_benchmark_")
+    task = prepare_task(work_dir, args.image_size)
+    server = FakeLLMServer(latency=args.llm_latency, jitter=args.llm_jitter).start()
+    runs = []
+    try:
+        for i in range(args.repeat):
+            output_dir = os.path.join(work_dir, f"run{i}")
+            print(f"Run {i + 1}/{args.repeat}: {output_dir}")
+            run = run_once(task, server, output_dir, args, extra_args)
+            if run["returncode"] != 0:
+                print(f"  main.py exited with status {run['returncode']}, see {output_dir}/benchmark.log")
+            runs.append(run)
+    finally:
+        server.stop()
+
+    report = summarize(runs)
+    report["config"] = {k: v for k, v in vars(args).items() if k not in ("work_dir", "report", "baseline")}
+    report["config"]["main_args"] = extra_args
+    print_report(report)
+    report_path = args.report or os.path.join(work_dir, "report.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"\nReport written to {report_path}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+    if report["failed_runs"] or not report["rounds"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,30 @@
 """Blender script for BlenderBench verifier to execute code and save blend."""
 import bpy
+import contextlib
 import os
 import sys
 
 if __name__ == "__main__":
-    code_fpath = sys.argv[6]  # Path to the code file
-    if len(sys.argv) > 7:
-        rendering_dir = sys.argv[7] # Path to save the rendering from camera1
+    script_args = sys.argv[sys.argv.index("--") + 1:]  # Arguments after '--'
+    code_fpath = script_args[0]  # Path to the code file
+    if len(script_args) > 1:
+        rendering_dir = script_args[1] # Path to save the rendering from camera1
     else:
         rendering_dir = None
-    if len(sys.argv) > 8:
-        save_blend = sys.argv[8] # Path to save the blend file
+    if len(script_args) > 2:
+        save_blend = script_args[2] # Path to save the blend file
     else:
         save_blend = None
 
     with open(code_fpath, "r") as f:
         code = f.read()
-    try:
-        exec(code)
-    except:
-        raise ValueError
+    # Time the user code if the executor records timings (see tools/blender/blender_timing.py)
+    timing = sys.modules.get("blender_timing")
+    with timing.phase("exec") if timing else contextlib.nullcontext():
+        try:
+            exec(code)
+        except:
+            raise ValueError
 
     # Save the blend file
     if save_blend:
@@ -1,5 +1,6 @@
 """Blender script to render all camera views (Camera1-5) after executing scene code."""
 import bpy
+import contextlib
 import os
 import sys
 
@@ -16,8 +17,9 @@ except Exception:
 
 if __name__ == "__main__":
 
-    code_fpath = sys.argv[6]  # Path to the code file
-    rendering_dir = sys.argv[7] # Path to save the rendering from camera1
+    script_args = sys.argv[sys.argv.index("--") + 1:]  # Arguments after '--'
+    code_fpath = script_args[0]  # Path to the code file
+    rendering_dir = script_args[1] # Path to save the rendering from camera1
 
     # Enable GPU rendering
     bpy.context.scene.render.engine = 'CYCLES'
@@ -45,10 +47,22 @@ if __name__ == "__main__":
     # Read and execute the code from the specified file
     with open(code_fpath, "r") as f:
         code = f.read()
-    try:
-        exec(code)
-    except:
-        raise ValueError
+    # Time the user code if the executor records timings (see tools/blender/blender_timing.py);
+    # a resident worker may run its live code here instead (see tools/blender/blender_wrapper.py)
+    timing = sys.modules.get("blender_timing")
+    wrapper = sys.modules.get("blender_wrapper")
+    with timing.phase("exec") if timing else contextlib.nullcontext():
+        try:
+            if wrapper:
+                wrapper.exec_code(code, globals())
+            else:
+                exec(code)
+        except:
+            raise ValueError
+
+    # Apply the render profile chosen by the executor, if any (see tools/blender/blender_wrapper.py)
+    if wrapper:
+        wrapper.apply_render_profile(bpy.context.scene)
 
     # Render from camera1
     if 'Camera1' in bpy.data.objects:
@@ -1,17 +1,19 @@
 """Blender script for pipeline to execute code and render Camera1-2 views."""
 import bpy
+import contextlib
 import os
 import sys
 
 if __name__ == "__main__":
 
-    code_fpath = sys.argv[6]  # Path to the code file
-    if len(sys.argv) > 7:
-        rendering_dir = sys.argv[7] # Path to save the rendering from camera1
+    script_args = sys.argv[sys.argv.index("--") + 1:]  # Arguments after '--'
+    code_fpath = script_args[0]  # Path to the code file
+    if len(script_args) > 1:
+        rendering_dir = script_args[1] # Path to save the rendering from camera1
     else:
         rendering_dir = None
-    if len(sys.argv) > 8:
-        save_blend = sys.argv[8] # Path to save the blend file
+    if len(script_args) > 2:
+        save_blend = script_args[2] # Path to save the blend file
     else:
         save_blend = None
     
@@ -41,10 +43,22 @@ if __name__ == "__main__":
     # Read and execute the code from the specified file
     with open(code_fpath, "r") as f:
         code = f.read()
-    try:
-        exec(code)
-    except:
-        raise ValueError
+    # Time the user code if the executor records timings (see tools/blender/blender_timing.py);
+    # a resident worker may run its live code here instead (see tools/blender/blender_wrapper.py)
+    timing = sys.modules.get("blender_timing")
+    wrapper = sys.modules.get("blender_wrapper")
+    with timing.phase("exec") if timing else contextlib.nullcontext():
+        try:
+            if wrapper:
+                wrapper.exec_code(code, globals())
+            else:
+                exec(code)
+        except:
+            raise ValueError
+
+    # Apply the render profile chosen by the executor, if any (see tools/blender/blender_wrapper.py)
+    if wrapper:
+        wrapper.apply_render_profile(bpy.context.scene)
 
     # Render from camera1
     if 'Camera1' in bpy.data.objects and rendering_dir:
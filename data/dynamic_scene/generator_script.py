@@ -1,29 +1,39 @@
 """Blender script for dynamic scene generation with keyframe rendering."""
 import bpy
+import contextlib
 import os
 import sys
 
 if __name__ == "__main__":
 
     # ---- Command line arguments ----
-    code_fpath = sys.argv[6]  # Path to scene generation/editing code
+    script_args = sys.argv[sys.argv.index("--") + 1:]  # Arguments after '--'
+    code_fpath = script_args[0]  # Path to scene generation/editing code
     # "NONE" is used as placeholder for empty render_path on Windows
-    if len(sys.argv) > 7 and sys.argv[7] and sys.argv[7] != "NONE":
-        rendering_dir = sys.argv[7]  # Rendering output directory
+    if len(script_args) > 1 and script_args[1] and script_args[1] != "NONE":
+        rendering_dir = script_args[1]  # Rendering output directory
     else:
         rendering_dir = None
-    if len(sys.argv) > 8:
-        save_blend = sys.argv[8]  # Optional: path to save .blend file
+    if len(script_args) > 2:
+        save_blend = script_args[2]  # Optional: path to save .blend file
     else:
         save_blend = None
 
     # ---- Execute external code to build scene ----
     with open(code_fpath, "r", encoding="utf-8") as f:
         code = f.read()
-    try:
-        exec(code)
-    except Exception as e:
-        raise ValueError(f"Error executing scene code: {e}")
+    # Time the user code if the executor records timings (see tools/blender/blender_timing.py);
+    # a resident worker may run its live code here instead (see tools/blender/blender_wrapper.py)
+    timing = sys.modules.get("blender_timing")
+    wrapper = sys.modules.get("blender_wrapper")
+    with timing.phase("exec") if timing else contextlib.nullcontext():
+        try:
+            if wrapper:
+                wrapper.exec_code(code, globals())
+            else:
+                exec(code)
+        except Exception as e:
+            raise ValueError(f"Error executing scene code: {e}")
 
     if not rendering_dir:
         print("[INFO] No rendering directory provided, skipping rendering.")
@@ -41,6 +51,10 @@ if __name__ == "__main__":
     scene.render.image_settings.file_format = 'PNG'
     scene.render.use_file_extension = True
 
+    # ---- Apply the render profile chosen by the executor, if any (see tools/blender/blender_wrapper.py) ----
+    if wrapper:
+        wrapper.apply_render_profile(scene)
+
     # ---- Prepare output directory ----
     os.makedirs(rendering_dir, exist_ok=True)
 
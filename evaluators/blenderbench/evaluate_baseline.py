@@ -22,6 +22,8 @@ from openai import OpenAI
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from utils._api_keys import OPENAI_API_KEY
+from utils.llm_cache import cache_client
+from utils.rate_limit import rate_limit_client
 
 # Task instance counts for different task types
 TASK_INSTANCE_COUNT_DICT = {
@@ -167,7 +169,7 @@ def evaluate_image_with_gpt(image_path: str, target_image_path: str, task_descri
         dict: Evaluation result with score and justification
     """
     if client is None:
-        client = OpenAI(api_key=OPENAI_API_KEY)
+        client = cache_client(rate_limit_client(OpenAI(api_key=OPENAI_API_KEY), "low"))
     
     try:
         # Encode image
@@ -433,7 +435,7 @@ def main() -> None:
     # Initialize OpenAI client if needed
     client = None
     if args.eval_type in ['ref_free', 'both']:
-        client = OpenAI(api_key=OPENAI_API_KEY)
+        client = cache_client(rate_limit_client(OpenAI(api_key=OPENAI_API_KEY), "low"))
     
     # Ensure CLIP is loaded if needed
     if args.eval_type in ['ref_based', 'both']:
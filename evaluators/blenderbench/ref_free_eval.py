@@ -16,8 +16,10 @@ from tqdm import tqdm
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from utils._api_keys import OPENAI_API_KEY
+from utils.llm_cache import cache_client
+from utils.rate_limit import rate_limit_client
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+client = cache_client(rate_limit_client(OpenAI(api_key=OPENAI_API_KEY), "low"))
 
 # Task instance counts for different task types
 TASK_INSTANCE_COUNT_DICT = {
@@ -11,6 +11,8 @@ from PIL import Image
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from utils.common import get_model_info
+from utils.llm_cache import cache_client
+from utils.rate_limit import rate_limit_client
 
 INSTRUCTION = """Please evaluate the slide based on the following criteria:
 {}
@@ -40,7 +42,7 @@ def evaluate_slide(prompt: str, image_url: str) -> str:
             {"type": "image_url", "image_url": {"url": image_url}},
         ],
     }]
-    client = OpenAI(api_key=get_model_info(args.model_name)["api_key"])
+    client = cache_client(rate_limit_client(OpenAI(api_key=get_model_info(args.model_name)["api_key"]), "low"))
     response = client.chat.completions.create(
             model=args.model_name,
             messages=messages,
@@ -276,8 +276,8 @@ def make_flow_slide(prs):
         "  scripts/{N}.py           Blender Python per round",
         "  renders/{N}/Camera*.png  rendered frames",
         "  renders/{N}/state.blend  scene snapshot (undo)",
-        "  generator_memory.json    full LLM conversation",
-        "  verifier_memory.json     all feedback rounds",
+        "  generator_memory.jsonl   full LLM conversation",
+        "  verifier_memory.jsonl    all feedback rounds",
         "  blender_file.blend       final Blender scene",
         "",
         "data/{mode}/{task}/assets/   Meshy GLB cache",
@@ -8,9 +8,16 @@ import argparse
 import asyncio
 import logging
 import os
+from typing import Any, Dict, Optional, Tuple
+
+from openai import AsyncOpenAI, OpenAI
 
 from agents.generator import GeneratorAgent
+from agents.tool_client import ServerPool
 from agents.verifier import VerifierAgent
+from utils.common import configure_image_cache
+from utils.llm_cache import MODES, configure_llm_cache
+from utils.rate_limit import configure_rate_limits
 
 # Configure logging
 logging.basicConfig(
@@ -21,8 +28,8 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-async def main() -> None:
-    """Run the dual-agent interactive framework."""
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser of a task."""
     parser = argparse.ArgumentParser(description="Dual-agent interactive framework")
     parser.add_argument(
         "--mode",
@@ -35,6 +42,7 @@ async def main() -> None:
     parser.add_argument("--api-base-url", default=os.getenv("OPENAI_BASE_URL"), help="OpenAI-compatible API base URL")
     parser.add_argument("--max-rounds", type=int, default=10, help="Max interaction rounds")
     parser.add_argument("--memory-length", type=int, default=12, help="Memory length")
+    parser.add_argument("--memory-token-budget", type=int, default=0, help="Fill the memory window by estimated tokens up to this budget instead of by --memory-length messages (0 disables)")
     parser.add_argument("--init-code-path", default=None, help="Path to initial code file")
     parser.add_argument("--init-image-path", default=None, help="Path to initial images")
     parser.add_argument("--target-image-path", default=None, help="Path to target images")
@@ -45,17 +53,55 @@ async def main() -> None:
     parser.add_argument("--resource-dir", default=None, help="Task directory path for autopresent mode")
     parser.add_argument("--gpu-devices", default=os.getenv("CUDA_VISIBLE_DEVICES"), help="GPU devices for Blender")
     parser.add_argument("--clear-memory", action="store_true", help="Clear memory")
+    parser.add_argument("--pipeline", action="store_true", help="Prepare the next round (image encoding, memory window, Blender workers) while the LLM and the verifier run")
+    parser.add_argument("--early-stop-patience", type=int, default=0, help="Stop after this many rounds whose renders did not get closer to the target (0 disables)")
+    parser.add_argument("--early-stop-threshold", type=float, default=0.0, help="Stop once the render loss against the target is at most this (0 disables)")
+    parser.add_argument("--early-stop-min-delta", type=float, default=0.0, help="Decrease of the render loss that counts as an improvement for --early-stop-patience")
+    parser.add_argument("--early-stop-clip", action="store_true", help="Add the CLIP distance to the photometric render loss (needs torch and transformers)")
+    parser.add_argument("--resume", action="store_true", help="Continue the task from the checkpoint of its last complete round in --output-dir")
     parser.add_argument("--explicit-comp", action="store_true", help="Enable explicit completion")
     parser.add_argument("--no-tools", action="store_true", help="Use no tools mode")
     parser.add_argument("--init-setting", choices=["none", "minimal", "reasonable"], default="none", help="Setting for the static scene task")
     parser.add_argument("--prompt-setting", choices=["none", "procedural", "scene_graph", "get_asset", "init"], default="none", help="Setting for the prompt")
     parser.add_argument("--num-candidates", type=int, default=1, help="Number of candidates for the model")
+    parser.add_argument("--stream", action="store_true", help="Stream the generator's response and prepare its execution (code file, Blender workers) as soon as the code argument is complete; needs --num-candidates 1")
+    parser.add_argument("--tournament-margin", type=float, default=0.0, help="Score candidates locally against the target first: drop those whose distance is this much (relative) worse than the best, and compare with the VLM only matches closer than this (0 compares every match)")
+    parser.add_argument("--tournament-clip", action="store_true", help="Add the CLIP distance to the local candidate scores (needs torch and transformers)")
+    parser.add_argument("--llm-cache", default=os.getenv("LLM_CACHE"), help="SQLite file of the record/replay cache of LLM responses")
+    parser.add_argument("--llm-cache-mode", choices=list(MODES), default=os.getenv("LLM_CACHE_MODE") or "passthrough", help="passthrough: no cache; record: answer known requests from the cache and store new responses; replay: answer every request from the cache, without network")
+    parser.add_argument("--llm-rate-limits", default=os.getenv("LLM_RATE_LIMITS"), help="Shared per-provider budgets of LLM requests as provider=RPM/TPM,... (e.g. openai=500/200000); requests wait for their budget and all processes pause together on 429 responses")
+    parser.add_argument("--llm-concurrency", type=int, default=0, help="Maximum concurrent LLM requests when sampling candidates (0 sends all candidates at once)")
+    parser.add_argument("--image-cache-mb", type=float, default=256, help="Memory budget of the cache of base64-encoded images sent to the LLM in MB (0 disables)")
+    parser.add_argument("--image-max-side", type=int, default=0, help="Downscale images sent to the LLM to this longest side in pixels (0 keeps the size)")
+    parser.add_argument("--image-format", choices=["original", "jpeg", "webp"], default="original", help="Re-encode images sent to the LLM in this format")
+    parser.add_argument("--image-quality", type=int, default=85, help="JPEG/WebP quality of re-encoded images")
+    parser.add_argument("--image-mosaic", action="store_true", help="Tile the renders of one tool call into a single image")
+    parser.add_argument("--image-budget-kb", type=int, default=0, help="Budget of the images of one LLM request in KB; older images are shrunk, then dropped, to fit (0 disables)")
+    parser.add_argument("--image-token-budget", type=int, default=0, help="Budget of the images of one LLM request in estimated tokens (0 disables)")
 
     # Execution parameters
     parser.add_argument("--blender-command", default="utils/third_party/blender/infinigen/blender/blender", help="Blender command path")
     parser.add_argument("--blender-file", default=None, help="Blender template file")
     parser.add_argument("--blender-script", default="data/blendergym/pipeline_render_script.py", help="Blender execution script")
     parser.add_argument("--blender-save", default=None, help="Save blender file")
+    parser.add_argument("--blender-workers", type=int, default=0, help="Resident Blender worker processes per executor (0 launches a fresh Blender process per execution)")
+    parser.add_argument("--parallel-verifier-tools", action="store_true", help="Let the verifier return several investigation tool calls per turn, rendered in one Blender execution")
+    parser.add_argument("--resident-investigator", action="store_true", help="Keep one Blender session alive for the verifier's investigator tools")
+    parser.add_argument("--render-cache-dir", default=None, help="Directory of the content-addressed render cache (disabled if unset)")
+    parser.add_argument("--render-cache-size", type=int, default=2048, help="Render cache size budget in MB")
+    parser.add_argument("--render-profile", choices=["preview", "standard", "final"], default="standard", help="Render quality profile for every round")
+    parser.add_argument("--final-render-profile", choices=["preview", "standard", "final"], default=None, help="Re-render the last round with this profile when the run ends")
+    parser.add_argument("--snapshot-dir", default=None, help="Directory of the deduplicated state.blend snapshot store (default: <output_dir>/snapshots)")
+    parser.add_argument("--snapshot-compress", action="store_true", help="Store state.blend snapshots zstd compressed")
+    parser.add_argument("--incremental-exec", action="store_true", help="Keep the scene alive between rounds and apply only the statements that changed")
+    parser.add_argument("--fork-candidates", type=int, default=0, help="Evaluate --num-candidates candidates in children forked from one loaded Blender process, at most this many at a time (0 disables)")
+    parser.add_argument("--render-slots", type=int, default=0, help="Concurrent Blender renders per GPU (or for the CPU) shared by all tasks on the node (0 disables the render scheduler)")
+    parser.add_argument("--render-threads", type=int, default=0, help="CPU threads per render slot (0 divides the cores evenly among the slots)")
+    parser.add_argument("--render-lock-dir", default=None, help="Directory of the node-wide render slot locks")
+    parser.add_argument("--blender-memory-mb", type=int, default=0, help="Kill a Blender execution whose resident memory exceeds this many MB (0 disables)")
+    parser.add_argument("--blender-cpu-seconds", type=int, default=0, help="CPU time limit of a fresh Blender process in seconds, summed over threads (0 disables)")
+    parser.add_argument("--blender-output-mb", type=int, default=0, help="Kill a Blender execution whose stdout and stderr exceed this many MB (0 disables)")
+    parser.add_argument("--blender-timeout", type=int, default=0, help="Wall-clock timeout of a Blender execution in seconds (0 uses the default of 300)")
     parser.add_argument("--meshy_api_key", default=os.getenv("MESHY_API_KEY"), help="Meshy API key")
     parser.add_argument("--va_api_key", default=os.getenv("VA_API_KEY"), help="VA API key")
     parser.add_argument("--browser-command", default="google-chrome", help="Browser command for HTML screenshots")
@@ -64,14 +110,29 @@ async def main() -> None:
     parser.add_argument("--generator-tools", default="tools/generator_base.py", help="Comma-separated list of generator tool server scripts")
     parser.add_argument("--verifier-tools", default="tools/verifier_base.py", help="Comma-separated list of verifier tool server scripts")
 
-    args = parser.parse_args()
-    args = vars(args)
+    return parser
+
+
+async def run_task(
+    args: Dict[str, Any],
+    clients: Optional[Tuple[OpenAI, AsyncOpenAI]] = None,
+    server_pool: Optional[ServerPool] = None
+) -> bool:
+    """Run the generator and verifier on one task.
 
+    Args:
+        args: The task's arguments (see build_parser).
+        clients: Optional (sync, async) OpenAI clients shared by tasks.
+        server_pool: Optional pool of started MCP servers shared by tasks.
+
+    Returns:
+        Whether the task ran without an error.
+    """
     # Init agents
     logger.info("Initializing agents")
-    verifier = VerifierAgent(args)
+    verifier = VerifierAgent(args, clients=clients, server_pool=server_pool)
     await verifier.tool_client.connect_servers()
-    generator = GeneratorAgent(args, verifier)
+    generator = GeneratorAgent(args, verifier, clients=clients, server_pool=server_pool)
     logger.info("Agents initialized successfully")
     await generator.tool_client.connect_servers()
 
@@ -80,8 +141,10 @@ async def main() -> None:
         logger.info("Starting dual-agent interaction")
         await generator.run()
         logger.info("Dual-agent interaction finished")
+        return True
     except Exception as e:
         logger.error("Error during execution: %s", e)
+        return False
     finally:
         # Cleanup
         logger.info("Cleaning up")
@@ -90,6 +153,15 @@ async def main() -> None:
         logger.info("Cleanup finished")
 
 
+async def main() -> None:
+    """Run the dual-agent interactive framework."""
+    args = vars(build_parser().parse_args())
+    configure_image_cache(args["image_cache_mb"])
+    configure_llm_cache(args["llm_cache"], args["llm_cache_mode"])
+    configure_rate_limits(args["llm_rate_limits"])
+    await run_task(args)
+
+
 if __name__ == "__main__":
     try:
         asyncio.run(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""In-process orchestrator running many tasks as asyncio tasks.
+
+Running a task through ``main.py`` starts a Python process with its own MCP
+servers and OpenAI clients. The orchestrator runs many tasks in one process
+instead:
+
+- MCP servers are pooled: a task checks out started servers, initializes
+  them with its own arguments and returns them when it finishes, so servers
+  are started once per concurrent task rather than once per task, and no
+  two tasks use a server at the same time;
+- tasks with the same API key and base URL share one pair of OpenAI
+  clients, and with them one HTTP connection pool;
+- the image cache is shared by all tasks.
+
+Each line of the tasks file is the JSON list of main.py arguments of one
+task::
+
+    python orchestrator.py --tasks tasks.jsonl --max-concurrent 16
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, List, Tuple
+
+from openai import AsyncOpenAI, OpenAI
+
+from agents.tool_client import ServerPool
+from main import build_parser, run_task
+from utils.common import configure_image_cache
+from utils.llm_cache import MODES, cache_client, configure_llm_cache
+from utils.rate_limit import configure_rate_limits, rate_limit_client
+
+logger = logging.getLogger(__name__)
+
+
+async def run_tasks(task_args: List[List[str]], max_concurrent: int = 8) -> List[bool]:
+    """Run tasks concurrently in this process.
+
+    Args:
+        task_args: The main.py arguments of each task.
+        max_concurrent: Maximum number of tasks running at once.
+
+    Returns:
+        Whether each task ran without an error.
+    """
+    parser = build_parser()
+    server_pool = ServerPool()
+    clients: Dict[Tuple[str, str], Tuple[OpenAI, AsyncOpenAI]] = {}
+    semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def run_one(argv: List[str]) -> bool:
+        try:
+            args = vars(parser.parse_args(argv))
+        except SystemExit:
+            logger.error("Invalid task arguments: %s", " ".join(argv))
+            return False
+        base_url = args.get("api_base_url") or os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1"
+        key = (args.get("api_key"), base_url)
+        if key not in clients:
+            clients[key] = (
+                cache_client(rate_limit_client(OpenAI(api_key=key[0], base_url=base_url))),
+                cache_client(rate_limit_client(AsyncOpenAI(api_key=key[0], base_url=base_url))),
+            )
+        async with semaphore:
+            logger.info("Starting task %s", args.get("output_dir"))
+            try:
+                return await run_task(args, clients=clients[key], server_pool=server_pool)
+            except Exception as e:
+                logger.error("Task %s failed: %s", args.get("output_dir"), e)
+                return False
+
+    try:
+        return list(await asyncio.gather(*(run_one(argv) for argv in task_args)))
+    finally:
+        await server_pool.close()
+        for client, async_client in clients.values():
+            client.close()
+            await async_client.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run many tasks in one process")
+    parser.add_argument("--tasks", required=True, help="JSONL file with the main.py arguments of one task per line")
+    parser.add_argument("--max-concurrent", type=int, default=8, help="Maximum number of tasks running at once")
+    parser.add_argument("--image-cache-mb", type=float, default=1024, help="Memory budget of the image cache shared by all tasks in MB")
+    parser.add_argument("--llm-cache", default=os.getenv("LLM_CACHE"), help="SQLite file of the record/replay cache of LLM responses")
+    parser.add_argument("--llm-cache-mode", choices=list(MODES), default=os.getenv("LLM_CACHE_MODE") or "passthrough", help="passthrough: no cache; record: answer known requests from the cache and store new responses; replay: answer every request from the cache, without network")
+    parser.add_argument("--llm-rate-limits", default=os.getenv("LLM_RATE_LIMITS"), help="Shared per-provider budgets of LLM requests as provider=RPM/TPM,... (e.g. openai=500/200000); requests wait for their budget and all processes pause together on 429 responses")
+    args = parser.parse_args()
+
+    with open(args.tasks, "r") as f:
+        task_args = [json.loads(line) for line in f if line.strip()]
+    configure_image_cache(args.image_cache_mb)
+    configure_llm_cache(args.llm_cache, args.llm_cache_mode)
+    configure_rate_limits(args.llm_rate_limits)
+    results = asyncio.run(run_tasks(task_args, args.max_concurrent))
+    logger.info("%d of %d tasks finished without error", sum(results), len(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -224,6 +224,9 @@ def run_blendergym_task(task_config: Dict, args: argparse.Namespace) -> Tuple[st
     
     if args.no_tools:
         cmd.append("--no-tools")
+    if args.test_id is not None:
+        # Re-running a test continues each task from its last checkpoint
+        cmd.append("--resume")
     
     print(f"Command: {' '.join(cmd)}")
     
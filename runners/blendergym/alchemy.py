@@ -19,10 +19,12 @@ from tqdm import tqdm
 
 # Import shared utilities
 from runners.shared import (
+    execute_blender_candidates,
     execute_blender_code,
     generate_candidate_codes,
     tournament_select_best,
 )
+from tools.blender.resource_limits import ResourceLimits
 
 
 def load_blendergym_dataset(
@@ -161,6 +163,13 @@ def run_iterative_alchemy(task_config: Dict, args: argparse.Namespace) -> Dict:
     shutil.copy(task_config['blender_file'], output_dir / "blender_file.blend")
     blender_file = str(output_dir / "blender_file.blend")
 
+    limits = ResourceLimits(
+        memory_mb=args.blender_memory_mb,
+        cpu_seconds=args.blender_cpu_seconds,
+        output_mb=args.blender_output_mb,
+        timeout=args.blender_timeout
+    )
+
     # Iterative process
     for round_num in range(1, args.max_iterations + 1):
         print(f"\n--- Round {round_num}/{args.max_iterations} ---")
@@ -181,18 +190,37 @@ def run_iterative_alchemy(task_config: Dict, args: argparse.Namespace) -> Dict:
 
         # Execute all candidate codes
         candidate_results = []
-        for i, code in enumerate(candidate_codes):
-            print(f"  Executing candidate {i+1}/{len(candidate_codes)}...")
-            success, error_msg, render_dir = execute_blender_code(
+        if args.fork_candidates > 0:
+            print(f"  Executing {len(candidate_codes)} candidates in forked Blender processes...")
+            outcomes = execute_blender_candidates(
                 blender_command=args.blender_command,
                 blender_file=blender_file,
                 blender_script=args.blender_script,
-                code=code,
-                round_name=f"temp_{round_num}_{i}",
-                script_save_dir=None,
+                codes=candidate_codes,
+                round_names=[f"temp_{round_num}_{i}" for i in range(len(candidate_codes))],
                 render_save_dir=render_save_dir,
-                gpu_devices=args.gpu_devices
+                gpu_devices=args.gpu_devices,
+                max_parallel=args.fork_candidates,
+                limits=limits
             )
+        else:
+            outcomes = None
+        for i, code in enumerate(candidate_codes):
+            if outcomes is not None:
+                success, error_msg, render_dir = outcomes[i]
+            else:
+                print(f"  Executing candidate {i+1}/{len(candidate_codes)}...")
+                success, error_msg, render_dir = execute_blender_code(
+                    blender_command=args.blender_command,
+                    blender_file=blender_file,
+                    blender_script=args.blender_script,
+                    code=code,
+                    round_name=f"temp_{round_num}_{i}",
+                    script_save_dir=None,
+                    render_save_dir=render_save_dir,
+                    gpu_devices=args.gpu_devices,
+                    limits=limits
+                )
 
             if success and render_dir:
                 candidate_results.append({
@@ -221,7 +249,9 @@ def run_iterative_alchemy(task_config: Dict, args: argparse.Namespace) -> Dict:
         winner_idx = tournament_select_best(
             candidate_results=candidate_results,
             target_image_path=target_image_path,
-            model=args.model
+            model=args.model,
+            margin=args.tournament_margin,
+            use_clip=args.tournament_clip,
         )
 
         winner = candidate_results[winner_idx]
@@ -281,11 +311,18 @@ def main() -> None:
     # Iterative alchemy parameters
     parser.add_argument("--max-iterations", type=int, default=10, help="Maximum number of iterations (always 10 rounds)")
     parser.add_argument("--num-candidates", type=int, default=4, help="Number of candidate codes to generate per iteration")
+    parser.add_argument("--tournament-margin", type=float, default=0.0, help="Score candidates locally against the target first and compare with the VLM only matches closer than this relative distance gap (0 compares every match)")
+    parser.add_argument("--tournament-clip", action="store_true", help="Add the CLIP distance to the local candidate scores (needs torch and transformers)")
 
     # Blender parameters
     parser.add_argument("--blender-command", default="utils/third_party/infinigen/blender/blender", help="Blender command path")
     parser.add_argument("--blender-script", default="data/blenderstudio/generator_script.py", help="Blender execution script")
     parser.add_argument("--gpu-devices", default=None, help="GPU devices string (e.g., '0,1')")
+    parser.add_argument("--fork-candidates", type=int, default=0, help="Load the scene once per round and fork a Blender child per candidate, at most this many at a time (0 disables)")
+    parser.add_argument("--blender-memory-mb", type=int, default=0, help="Kill a candidate's Blender process whose resident memory exceeds this many MB (0 disables)")
+    parser.add_argument("--blender-cpu-seconds", type=int, default=0, help="CPU time limit of a candidate's Blender process in seconds (0 disables)")
+    parser.add_argument("--blender-output-mb", type=int, default=0, help="Kill a candidate's Blender process whose output exceeds this many MB (0 disables)")
+    parser.add_argument("--blender-timeout", type=int, default=300, help="Wall-clock timeout of a candidate's Blender process in seconds")
 
     # VLM parameters
     parser.add_argument("--model", default="gpt-4o", help="OpenAI vision model to use")
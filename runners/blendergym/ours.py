@@ -18,6 +18,8 @@ import threading
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils.common import get_model_info
+from utils.llm_cache import MODES, configure_llm_cache
+from utils.rate_limit import configure_rate_limits
 
 def load_blendergym_dataset(base_path: str, task_name: str, test_id: Optional[str] = None, task_id: Optional[int] = None) -> List[Dict]:
     """Load BlenderGym dataset structure.
@@ -91,21 +93,18 @@ def load_blendergym_dataset(base_path: str, task_name: str, test_id: Optional[st
     
     return tasks
 
-def run_blendergym_task(task_config: Dict, args: argparse.Namespace) -> Tuple[str, bool, str]:
+def build_blendergym_command(task_config: Dict, args: argparse.Namespace) -> List[str]:
     """
-    Run a single BlenderGym task using main.py
+    Build the main.py command line of a BlenderGym task and create its output directory
     
     Args:
         task_config: Task configuration dictionary
         args: Command line arguments
         
     Returns:
-        Tuple of (task_name, success: bool, error_message: str)
+        The command line, starting with the Python executable and main.py
     """
     task_name = task_config['task_dir'].split('/')[-1]
-    print(f"\n{'='*60}")
-    print(f"Running task: {task_name}")
-    print(f"{'='*60}")
     
     # Prepare output directories
     output_base = Path(args.output_dir + "/" + task_name)
@@ -141,7 +140,40 @@ def run_blendergym_task(task_config: Dict, args: argparse.Namespace) -> Tuple[st
     
     if args.no_tools:
         cmd.append("--no-tools")
+    if args.test_id is not None:
+        # Re-running a test continues each task from its last checkpoint
+        cmd.append("--resume")
+    if args.render_slots > 0:
+        cmd.extend(["--render-slots", str(args.render_slots), "--render-threads", str(args.render_threads)])
+    if args.early_stop_patience > 0 or args.early_stop_threshold > 0:
+        cmd.extend([
+            "--early-stop-patience", str(args.early_stop_patience),
+            "--early-stop-threshold", str(args.early_stop_threshold),
+            "--early-stop-min-delta", str(args.early_stop_min_delta),
+        ])
+    if args.tournament_margin > 0:
+        cmd.extend(["--tournament-margin", str(args.tournament_margin)])
+    if args.stream:
+        cmd.append("--stream")
+    return cmd
+
+def run_blendergym_task(task_config: Dict, args: argparse.Namespace) -> Tuple[str, bool, str]:
+    """
+    Run a single BlenderGym task using main.py
     
+    Args:
+        task_config: Task configuration dictionary
+        args: Command line arguments
+        
+    Returns:
+        Tuple of (task_name, success: bool, error_message: str)
+    """
+    task_name = task_config['task_dir'].split('/')[-1]
+    print(f"\n{'='*60}")
+    print(f"Running task: {task_name}")
+    print(f"{'='*60}")
+    
+    cmd = build_blendergym_command(task_config, args)
     print(f"Command: {' '.join(cmd)}")
     
     try:
@@ -215,6 +247,32 @@ def run_tasks_parallel(tasks: List[Dict], args: argparse.Namespace, max_workers:
     
     return successful_tasks, failed_tasks, failed_task_details
 
+def run_tasks_in_process(tasks: List[Dict], args: argparse.Namespace, max_workers: int = 10) -> Tuple[int, int, List[Dict]]:
+    """
+    Run tasks as asyncio tasks in this process, sharing MCP servers and LLM clients
+    
+    Args:
+        tasks: List of task configurations
+        args: Command line arguments
+        max_workers: Maximum number of concurrent tasks
+        
+    Returns:
+        Tuple of (successful_tasks: int, failed_tasks: int, failed_task_details: List)
+    """
+    from orchestrator import run_tasks
+    
+    print(f"\nStarting in-process execution with max {max_workers} concurrent tasks...")
+    print(f"Total tasks: {len(tasks)}")
+    
+    # Drop the interpreter and main.py from each command line
+    task_args = [build_blendergym_command(task_config, args)[2:] for task_config in tasks]
+    results = asyncio.run(run_tasks(task_args, max_concurrent=max_workers))
+    failed_task_details = [
+        {"task_name": task_config['task_dir'].split('/')[-1], "error": "Task failed, see the log"}
+        for task_config, success in zip(tasks, results) if not success
+    ]
+    return sum(results), len(failed_task_details), failed_task_details
+
 def main() -> None:
     """Entry point for the BlenderGym runner."""
     parser = argparse.ArgumentParser(description="BlenderGym Runner for AgenticVerifier")
@@ -245,6 +303,7 @@ def main() -> None:
     # Parallel execution parameters
     parser.add_argument("--max-workers", type=int, default=8, help="Maximum number of parallel workers")
     parser.add_argument("--sequential", action="store_true", help="Run tasks sequentially instead of in parallel")
+    parser.add_argument("--in-process", action="store_true", help="Run tasks as asyncio tasks in this process, sharing MCP servers and LLM clients, instead of one main.py process each")
     parser.add_argument("--no-tools", action="store_true", help="Use no tools mode")
     parser.add_argument("--num-candidates", type=int, default=1, help="Number of candidates for the model")
     
@@ -252,8 +311,21 @@ def main() -> None:
     if available_gpu_devices is None:
         available_gpu_devices = "0,1,2,3,4,5,6,7"
     parser.add_argument("--gpu-devices", default=available_gpu_devices, help="GPU devices for Blender")
+    parser.add_argument("--render-slots", type=int, default=0, help="Concurrent Blender renders per GPU shared by all tasks (0 disables the render scheduler)")
+    parser.add_argument("--render-threads", type=int, default=0, help="CPU threads per render slot (0 divides the cores evenly among the slots)")
+    parser.add_argument("--early-stop-patience", type=int, default=0, help="Stop a task after this many rounds whose renders did not get closer to the target (0 disables)")
+    parser.add_argument("--early-stop-threshold", type=float, default=0.0, help="Stop a task once the photometric loss of its renders is at most this (0 disables)")
+    parser.add_argument("--early-stop-min-delta", type=float, default=0.0, help="Decrease of the photometric loss that counts as an improvement")
+    parser.add_argument("--stream", action="store_true", help="Stream the generator's responses and prepare each execution while the response arrives")
+    parser.add_argument("--tournament-margin", type=float, default=0.0, help="Decide candidate matches whose local distances to the target differ by more than this (relative) without the VLM (0 compares every match)")
+    parser.add_argument("--llm-cache", default=os.getenv("LLM_CACHE"), help="SQLite file of the record/replay cache of LLM responses")
+    parser.add_argument("--llm-cache-mode", choices=list(MODES), default=os.getenv("LLM_CACHE_MODE") or "passthrough", help="passthrough: no cache; record: answer known requests from the cache and store new responses; replay: answer every request from the cache, without network")
+    parser.add_argument("--llm-rate-limits", default=os.getenv("LLM_RATE_LIMITS"), help="Shared per-provider budgets of LLM requests as provider=RPM/TPM,... (e.g. openai=500/200000); requests wait for their budget and all processes pause together on 429 responses")
     
     args = parser.parse_args()
+    # Inherited by the main.py processes (and used by the in-process tasks)
+    configure_llm_cache(args.llm_cache, args.llm_cache_mode)
+    configure_rate_limits(args.llm_rate_limits)
     
     # Handle test-id logic
     if args.test_id is not None:
@@ -310,6 +382,10 @@ def main() -> None:
                     "task_name": task_name,
                     "error": error_msg
                 })
+    elif args.in_process:
+        successful_tasks, failed_tasks, failed_task_details = run_tasks_in_process(
+            tasks, args, max_workers=args.max_workers
+        )
     else:
         # Parallel execution
         successful_tasks, failed_tasks, failed_task_details = run_tasks_parallel(
@@ -336,7 +412,7 @@ def main() -> None:
         "failed_tasks": failed_tasks,
         "execution_time_seconds": execution_time,
         "failed_task_details": failed_task_details,
-        "execution_mode": "sequential" if args.sequential else f"parallel_{args.max_workers}_workers"
+        "execution_mode": "sequential" if args.sequential else f"in_process_{args.max_workers}_tasks" if args.in_process else f"parallel_{args.max_workers}_workers"
     }
     
     with open(os.path.join(args.output_dir, "execution_results.json"), "w") as f:
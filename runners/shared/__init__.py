@@ -8,7 +8,7 @@ This module provides common functionality for alchemy runners:
 """
 
 from .image_utils import encode_image, vlm_compare_images
-from .blender_executor import execute_blender_code
+from .blender_executor import execute_blender_candidates, execute_blender_code
 from .code_generator import generate_candidate_codes
 from .tournament import tournament_select_best
 
@@ -16,6 +16,7 @@ __all__ = [
     "encode_image",
     "vlm_compare_images",
     "execute_blender_code",
+    "execute_blender_candidates",
     "generate_candidate_codes",
     "tournament_select_best",
 ]
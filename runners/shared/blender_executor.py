@@ -1,10 +1,12 @@
 """Blender code execution utilities for alchemy runners."""
 
 import os
-import subprocess
+import shutil
 import tempfile
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
+
+from tools.blender.resource_limits import ResourceLimits, run_limited
 
 
 def execute_blender_code(
@@ -15,7 +17,8 @@ def execute_blender_code(
     round_name: str,
     script_save_dir: Optional[Path],
     render_save_dir: Path,
-    gpu_devices: Optional[str] = None
+    gpu_devices: Optional[str] = None,
+    limits: Optional[ResourceLimits] = None
 ) -> Tuple[bool, str, str]:
     """Execute Blender Python code and render images.
 
@@ -28,10 +31,14 @@ def execute_blender_code(
         script_save_dir: Directory to save the code file (None to skip saving).
         render_save_dir: Directory to save rendered images.
         gpu_devices: GPU devices string (e.g., "0,1").
+        limits: Resource limits of the Blender process (defaults to a 5
+            minute timeout and no other limit).
 
     Returns:
         Tuple of (success, error_message, render_dir_path).
         render_dir_path is the path to the render directory if successful.
+        If a resource limit stopped Blender, error_message starts with an
+        explanation of which limit and how to stay within it.
     """
     # Save code to temporary file for execution
     with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as tmp_code:
@@ -60,14 +67,11 @@ def execute_blender_code(
         else:
             env = None
 
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=300,  # 5 minute timeout
-            env=env
-        )
+        result = run_limited(cmd, env, limits or ResourceLimits())
 
+        if result.exceeded:
+            os.unlink(tmp_code_path)
+            return False, result.exceeded.message() + "\n" + result.stderr, ""
         if result.returncode != 0:
             os.unlink(tmp_code_path)
             return False, result.stderr + result.stdout, ""
@@ -81,10 +85,75 @@ def execute_blender_code(
         os.unlink(tmp_code_path)
         return True, "", str(render_dir)
 
-    except subprocess.TimeoutExpired:
-        os.unlink(tmp_code_path)
-        return False, "Execution timeout", ""
     except Exception as e:
         if os.path.exists(tmp_code_path):
             os.unlink(tmp_code_path)
         return False, str(e), ""
+
+
+def execute_blender_candidates(
+    blender_command: str,
+    blender_file: str,
+    blender_script: str,
+    codes: List[str],
+    round_names: List[str],
+    render_save_dir: Path,
+    gpu_devices: Optional[str] = None,
+    max_parallel: Optional[int] = None,
+    limits: Optional[ResourceLimits] = None
+) -> List[Tuple[bool, str, str]]:
+    """Execute several candidate codes against one loaded Blender scene.
+
+    Blender loads blender_file once and forks a child per candidate, which
+    executes and renders that candidate on a copy-on-write image of the scene.
+    On platforms without fork the candidates run one after another in the
+    same Blender process.
+
+    Args:
+        blender_command: Path to Blender executable.
+        blender_file: Path to Blender file.
+        blender_script: Path to Blender execution script.
+        codes: Python code of each candidate.
+        round_names: Render directory name of each candidate.
+        render_save_dir: Directory to save rendered images.
+        gpu_devices: GPU devices string (e.g., "0,1").
+        max_parallel: Maximum number of candidates rendering at once
+            (defaults to all).
+        limits: Resource limits; the timeout applies per candidate.
+
+    Returns:
+        One (success, error_message, render_dir_path) tuple per candidate,
+        as returned by execute_blender_code.
+    """
+    from tools.blender.worker_pool import BlenderWorkerPool
+
+    tmp_dir = tempfile.mkdtemp(prefix="viga_candidates_")
+    arg_lists = []
+    render_dirs = []
+    for i, (code, round_name) in enumerate(zip(codes, round_names)):
+        code_path = os.path.join(tmp_dir, f"{i}.py")
+        with open(code_path, "w") as f:
+            f.write(code)
+        render_dir = render_save_dir / round_name
+        render_dir.mkdir(parents=True, exist_ok=True)
+        for img in render_dir.glob("*.png"):
+            img.unlink()
+        arg_lists.append([code_path, str(render_dir)])
+        render_dirs.append(render_dir)
+
+    pool = BlenderWorkerPool(blender_command, size=1, gpu_devices=gpu_devices, limits=limits)
+    try:
+        outcomes = pool.run_batch(blender_file, blender_script, arg_lists, max_parallel=max_parallel)
+    finally:
+        pool.close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    results = []
+    for render_dir, (success, stdout, stderr) in zip(render_dirs, outcomes):
+        if not success:
+            results.append((False, stderr + stdout, ""))
+        elif not list(render_dir.glob("*.png")):
+            results.append((False, "No render output generated", ""))
+        else:
+            results.append((True, "", str(render_dir)))
+    return results
@@ -3,6 +3,9 @@
 import base64
 import os
 import sys
+from typing import Optional
+
+from openai import OpenAI
 
 # Import from utils
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
@@ -22,7 +25,7 @@ def encode_image(image_path: str) -> str:
         return base64.b64encode(image_file.read()).decode('utf-8')
 
 
-def vlm_compare_images(image1_path: str, image2_path: str, target_path: str, model: str = "gpt-4o") -> int:
+def vlm_compare_images(image1_path: str, image2_path: str, target_path: str, model: str = "gpt-4o", client: Optional[OpenAI] = None) -> int:
     """Use VLM to compare two images and determine which is closer to target.
 
     Args:
@@ -30,6 +33,7 @@ def vlm_compare_images(image1_path: str, image2_path: str, target_path: str, mod
         image2_path: Path to second image.
         target_path: Path to target image.
         model: Vision model to use.
+        client: Client to reuse across comparisons (built per call if None).
 
     Returns:
         1 if image1 is closer to target, 2 if image2 is closer to target.
@@ -41,7 +45,8 @@ def vlm_compare_images(image1_path: str, image2_path: str, target_path: str, mod
         target_b64 = encode_image(target_path)
 
         # Initialize OpenAI client
-        client = build_client(model)
+        if client is None:
+            client = build_client(model)
 
         # Create messages
         messages = [
@@ -164,6 +164,8 @@ def run_static_scene_task(task_config: Dict, args: argparse.Namespace) -> Tuple[
         cmd.extend(["--explicit-comp"])
     if args.gpu_devices:
         cmd.extend(["--gpu-devices", args.gpu_devices])
+    if args.render_slots > 0:
+        cmd.extend(["--render-slots", str(args.render_slots), "--render-threads", str(args.render_threads)])
     if "target_description" in task_config:
         cmd.extend(["--target-description", task_config["target_description"]])
 
@@ -259,6 +261,8 @@ def main() -> None:
     # Execution parameters
     parser.add_argument("--max-workers", type=int, default=1, help="Maximum number of parallel workers")
     parser.add_argument("--gpu-devices", default=os.getenv("CUDA_VISIBLE_DEVICES"), help="GPU devices for Blender")
+    parser.add_argument("--render-slots", type=int, default=0, help="Concurrent Blender renders per GPU shared by all tasks (0 disables the render scheduler)")
+    parser.add_argument("--render-threads", type=int, default=0, help="CPU threads per render slot (0 divides the cores evenly among the slots)")
     
     # Additional parameters
     parser.add_argument("--explicit-comp", action="store_true", help="Enable explicit completion")
@@ -0,0 +1,166 @@
+"""Per-phase timing records of Blender executions.
+
+Runs inside Blender. A fresh Blender process loads this file before the
+scene (``blender --background --python blender_timing.py <file> --python
+<wrapper> -- ...``); resident workers import it and start a record per
+request. A record covers process start to bpy ready, .blend loading, the
+user code, every render (with its camera), .blend saving and peak RSS, and
+is appended as one JSON line to the file the executor passes in
+``VIGA_TIMINGS_FILE``.
+
+Loads, renders and saves are timed through Blender's app handlers, so
+renders issued by the executed code itself (e.g. the investigator scripts)
+are covered too. The prelude also imports ``blender_wrapper.py`` for the
+wrapper scripts. The wrapper scripts time the user code with ``phase``::
+
+    timing = sys.modules.get("blender_timing")
+    with timing.phase("exec") if timing else contextlib.nullcontext():
+        exec(code)
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import bpy
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Record of the current execution, or None when not recording
+_record: Optional[Dict[str, Any]] = None
+_timings_file: Optional[str] = None
+# Start times of the load, render and save in progress
+_marks: Dict[str, float] = {}
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Return the peak resident set size of this process in MB."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _add(name: str, seconds: float) -> None:
+    if _record is not None:
+        _record[name] = round(_record.get(name, 0.0) + seconds, 4)
+
+
+@bpy.app.handlers.persistent
+def _load_pre(*args: Any) -> None:
+    _marks["load"] = time.time()
+
+
+@bpy.app.handlers.persistent
+def _load_post(*args: Any) -> None:
+    if "load" in _marks:
+        _add("blend_load", time.time() - _marks.pop("load"))
+
+
+@bpy.app.handlers.persistent
+def _render_pre(*args: Any) -> None:
+    _marks["render"] = time.time()
+
+
+@bpy.app.handlers.persistent
+def _render_post(scene: Any, *args: Any) -> None:
+    if "render" in _marks and _record is not None:
+        camera = scene.camera.name if scene.camera else None
+        _record["renders"].append({"camera": camera, "seconds": round(time.time() - _marks.pop("render"), 4)})
+
+
+@bpy.app.handlers.persistent
+def _save_pre(*args: Any) -> None:
+    _marks["save"] = time.time()
+
+
+@bpy.app.handlers.persistent
+def _save_post(*args: Any) -> None:
+    if "save" in _marks:
+        _add("blend_save", time.time() - _marks.pop("save"))
+
+
+def install() -> None:
+    """Register the load, render and save handlers (once per process)."""
+    handlers = bpy.app.handlers
+    for hooks, handler in (
+        (handlers.load_pre, _load_pre), (handlers.load_post, _load_post),
+        (handlers.render_pre, _render_pre), (handlers.render_post, _render_post),
+        (handlers.save_pre, _save_pre), (handlers.save_post, _save_post),
+    ):
+        if handler not in hooks:
+            hooks.append(handler)
+
+
+def begin(timings_file: str, resident: bool = False) -> None:
+    """Start the record of one execution.
+
+    Args:
+        timings_file: JSONL file the record is appended to by finish.
+        resident: Whether Blender was already running; startup is then 0.
+    """
+    global _record, _timings_file
+    now = time.time()
+    launch = float(os.environ.get("VIGA_LAUNCH_TIME", now))
+    _record = {
+        "startup": 0.0 if resident else round(now - launch, 4),
+        "blend_load": 0.0,
+        "exec": 0.0,
+        "renders": [],
+        "blend_save": 0.0,
+        "resident": resident,
+    }
+    _timings_file = timings_file
+    _marks.clear()
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Add the time spent in the context to the named phase."""
+    start = time.time()
+    try:
+        yield
+    finally:
+        _add(name, time.time() - start)
+
+
+def finish(script_args: Optional[List[str]] = None) -> None:
+    """Append the current record to its timings file and stop recording.
+
+    Args:
+        script_args: Arguments of the wrapper script, which identify the
+            execution (defaults to the arguments after '--' in sys.argv).
+    """
+    global _record, _timings_file
+    if _record is None:
+        return
+    record, timings_file = _record, _timings_file
+    _record, _timings_file = None, None
+    if script_args is None and "--" in sys.argv:
+        script_args = sys.argv[sys.argv.index("--") + 1:]
+    record["script_args"] = [str(a) for a in script_args or []]
+    record["peak_rss_mb"] = _peak_rss_mb()
+    try:
+        with open(timings_file, "a") as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError as e:
+        print(f"Failed to write timings: {e}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    # Prelude of a fresh Blender process: bpy is ready, the scene is not loaded yet
+    import atexit
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import blender_timing
+    import blender_wrapper  # noqa: F401  (looked up by the wrapper scripts)
+    if os.environ.get("VIGA_TIMINGS_FILE"):
+        blender_timing.install()
+        blender_timing.begin(os.environ["VIGA_TIMINGS_FILE"])
+        atexit.register(blender_timing.finish)
@@ -0,0 +1,289 @@
+"""Resident Blender worker loop.
+
+Runs inside Blender (``blender --background <file> --python blender_worker.py
+-- <host> <port> <authkey>``) and serves execution requests from a
+BlenderWorkerPool over a local multiprocessing connection. Each request runs
+one of the existing wrapper scripts (e.g. ``pipeline_render_script.py``) with
+the same ``sys.argv`` layout a fresh Blender process would see, so the
+wrapper scripts do not need to know whether they run cold or warm.
+
+The ``apply`` op supports incremental execution: user code runs in a
+namespace that persists across requests, against the scene left by the
+previous request. The wrapper script is given an empty code file and runs
+the user code in its exec step, after its render setup (see
+``blender_wrapper.py``).
+
+The ``fork_batch`` op evaluates several candidates against one loaded scene:
+the worker loads the scene once and forks a child per candidate (Linux),
+which runs the wrapper script on a copy-on-write image of the scene and
+exits. The worker's own scene is left untouched. The worker never renders
+itself in this mode, so no GPU context exists at fork time.
+
+Requests whose environment sets ``VIGA_TIMINGS_FILE`` get a per-phase timing
+record (see ``blender_timing.py``); a fork batch gets one per candidate.
+"""
+
+import contextlib
+import ctypes
+import json
+import os
+import runpy
+import shutil
+import signal
+import sys
+import tempfile
+import time
+import traceback
+from multiprocessing.connection import Client
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import bpy
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import blender_timing
+import blender_wrapper
+
+# (abspath, ino, mtime_ns, size) of the .blend currently loaded, or None if unknown
+_loaded: Optional[Tuple[str, int, int, int]] = None
+# Whether code has run against the loaded scene since it was opened
+_dirty: bool = False
+# Globals of the user code applied to the live scene, or None if the scene
+# does not hold the result of applied code
+_namespace: Optional[Dict[str, Any]] = None
+
+
+def _file_stamp(path: str) -> Tuple[str, int, int, int]:
+    """Return an identity stamp for a .blend file on disk."""
+    st = os.stat(path)
+    return (os.path.abspath(path), st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _flush() -> None:
+    """Flush Python's and the C library's buffered stdout and stderr."""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    try:
+        ctypes.CDLL(None).fflush(None)
+    except (OSError, AttributeError, TypeError):  # no C library handle (Windows)
+        pass
+
+
+@contextlib.contextmanager
+def _capture_output() -> Iterator[Dict[str, str]]:
+    """Capture file descriptors 1 and 2 for the duration of the context.
+
+    Unlike contextlib.redirect_stdout this also captures Blender's native
+    output (Cycles, C-level errors), as a fresh Blender process would return
+    it. The yielded dictionary receives 'stdout' and 'stderr' on exit.
+    """
+    captured: Dict[str, str] = {}
+    files = [tempfile.TemporaryFile(), tempfile.TemporaryFile()]
+    _flush()
+    saved = [os.dup(1), os.dup(2)]
+    try:
+        os.dup2(files[0].fileno(), 1)
+        os.dup2(files[1].fileno(), 2)
+        yield captured
+    finally:
+        _flush()
+        os.dup2(saved[0], 1)
+        os.dup2(saved[1], 2)
+        for fd in saved:
+            os.close(fd)
+        for name, f in zip(("stdout", "stderr"), files):
+            f.seek(0)
+            captured[name] = f.read().decode("utf-8", errors="replace")
+            f.close()
+
+
+def _reset_scene(blend_file: str) -> None:
+    """Load the pristine scene unless it is already loaded and untouched."""
+    global _loaded, _dirty
+    stamp = _file_stamp(blend_file)
+    if _loaded == stamp and not _dirty:
+        return
+    bpy.ops.wm.open_mainfile(filepath=blend_file, load_ui=False)
+    _loaded = stamp
+    _dirty = False
+
+
+def _run_script(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a wrapper script against the (optionally reset) scene."""
+    global _dirty
+    blend_file = request.get("blend_file")
+    if blend_file:
+        _reset_scene(blend_file)
+
+    script = request["script"]
+    # Same layout as `blender --background <file> --python <script> -- <args>`
+    argv = [sys.argv[0], "--background", blend_file or bpy.data.filepath, "--python", script, "--"]
+    argv.extend(str(a) for a in request.get("args", []))
+
+    saved_argv = sys.argv
+    saved_env = {k: os.environ.get(k) for k in request.get("env", {})}
+    ok = True
+    try:
+        sys.argv = argv
+        os.environ.update({k: str(v) for k, v in request.get("env", {}).items()})
+        _dirty = True
+        with _capture_output() as output:
+            try:
+                runpy.run_path(script, run_name="__main__")
+            except SystemExit as e:
+                ok = e.code in (None, 0)
+            except BaseException:
+                ok = False
+                traceback.print_exc()
+    finally:
+        sys.argv = saved_argv
+        for k, v in saved_env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+    return {"ok": ok, **output}
+
+
+def _apply_code(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Render with the wrapper script, applying user code to the live scene in its exec step.
+
+    With 'blend_file' set the scene is reloaded and the namespace reset, so
+    'code' must be the complete script; otherwise 'code' is applied on top of
+    the scene and namespace left by the previous apply. The wrapper runs its
+    render setup before the code, as in a full replay (see
+    ``blender_wrapper.exec_code``).
+    """
+    global _namespace
+    blend_file = request.get("blend_file")
+    if blend_file:
+        _reset_scene(blend_file)
+        _namespace = {"__name__": "__main__", "bpy": bpy, "os": os, "sys": sys}
+    elif _namespace is None:
+        return {"ok": False, "stdout": "", "stderr": "No live scene to apply code to"}
+
+    blender_wrapper.set_live_code(request["code"], _namespace, delta=not blend_file)
+    result = _run_script({**request, "blend_file": None})
+    if not blender_wrapper.live_code_ran() and result["ok"]:
+        result = {
+            "ok": False,
+            "stdout": result["stdout"],
+            "stderr": result["stderr"] + "The wrapper script does not run its code through blender_wrapper.exec_code\n",
+        }
+    if not result["ok"]:
+        _namespace = None
+    return result
+
+
+def _fork_batch(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Run the wrapper script once per candidate in forked children.
+
+    Request keys: 'blend_file', 'script', 'arg_lists' (one argument list per
+    candidate), 'env', 'timeout' (seconds per candidate), 'max_parallel' and
+    optionally 'threads' (render threads per child).
+    Returns {'ok': True, 'results': [{'ok', 'stdout', 'stderr'}, ...]}.
+    """
+    arg_lists = request["arg_lists"]
+    if not hasattr(os, "fork"):
+        # No fork (Windows): evaluate the candidates one after another
+        results = []
+        for args in arg_lists:
+            results.append(_run_script({**request, "args": args}))
+        return {"ok": True, "results": results}
+
+    _reset_scene(request["blend_file"])
+    timeout = request.get("timeout") or 300
+    max_parallel = request.get("max_parallel") or len(arg_lists)
+    result_dir = tempfile.mkdtemp(prefix="viga_fork_")
+    results: List[Optional[Dict[str, Any]]] = [None] * len(arg_lists)
+    running: Dict[int, Tuple[int, float]] = {}
+    pending = list(range(len(arg_lists)))
+    try:
+        while pending or running:
+            while pending and len(running) < max_parallel:
+                i = pending.pop(0)
+                sys.stdout.flush()
+                sys.stderr.flush()
+                pid = os.fork()
+                if pid == 0:
+                    # Child: run the candidate on the inherited scene and exit
+                    # without running any of the parent's cleanup
+                    code = 1
+                    try:
+                        timings_file = request.get("env", {}).get("VIGA_TIMINGS_FILE")
+                        if timings_file:
+                            blender_timing.begin(timings_file, resident=True)
+                        if request.get("threads"):
+                            for scene in bpy.data.scenes:
+                                scene.render.threads_mode = 'FIXED'
+                                scene.render.threads = request["threads"]
+                        result = _run_script({**request, "blend_file": None, "args": arg_lists[i]})
+                        blender_timing.finish(arg_lists[i])
+                        with open(os.path.join(result_dir, f"{i}.json"), "w") as f:
+                            json.dump(result, f)
+                        code = 0
+                    finally:
+                        os._exit(code)
+                running[pid] = (i, time.time())
+            for pid, (i, started) in list(running.items()):
+                done, status = os.waitpid(pid, os.WNOHANG)
+                if done == 0 and time.time() - started > timeout:
+                    os.kill(pid, signal.SIGKILL)
+                    os.waitpid(pid, 0)
+                    results[i] = {"ok": False, "stdout": "", "stderr": f"Candidate timed out after {timeout}s"}
+                elif done == 0:
+                    continue
+                elif results[i] is None:
+                    try:
+                        with open(os.path.join(result_dir, f"{i}.json"), "r") as f:
+                            results[i] = json.load(f)
+                    except (OSError, ValueError):
+                        results[i] = {"ok": False, "stdout": "", "stderr": f"Candidate process exited with status {status}"}
+                del running[pid]
+            time.sleep(0.05)
+    finally:
+        for pid in running:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        shutil.rmtree(result_dir, ignore_errors=True)
+    return {"ok": True, "results": results}
+
+
+def serve(host: str, port: int, authkey: bytes) -> None:
+    """Serve requests until the pool closes the connection."""
+    global _loaded
+    if bpy.data.filepath:
+        _loaded = _file_stamp(bpy.data.filepath)
+    blender_timing.install()
+    conn = Client((host, port), authkey=authkey)
+    try:
+        while True:
+            try:
+                request = conn.recv()
+            except EOFError:
+                break
+            op = request.get("op")
+            if op == "shutdown":
+                break
+            if op == "ping":
+                conn.send({"ok": True})
+            elif op in ("run", "apply", "fork_batch"):
+                handler = {"run": _run_script, "apply": _apply_code, "fork_batch": _fork_batch}[op]
+                # Fork batches record one timing per candidate in the children
+                timings_file = request.get("env", {}).get("VIGA_TIMINGS_FILE")
+                if timings_file and op != "fork_batch":
+                    blender_timing.begin(timings_file, resident=True)
+                try:
+                    response = handler(request)
+                except Exception:
+                    response = {"ok": False, "stdout": "", "stderr": traceback.format_exc()}
+                blender_timing.finish(request.get("args"))
+                conn.send(response)
+            else:
+                conn.send({"ok": False, "stdout": "", "stderr": f"Unknown op: {op}"})
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    worker_args = sys.argv[sys.argv.index("--") + 1:]
+    serve(worker_args[0], int(worker_args[1]), bytes.fromhex(worker_args[2]))
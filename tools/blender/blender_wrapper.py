@@ -0,0 +1,140 @@
+"""Steps shared by the wrapper scripts (``data/*/*_script.py``).
+
+Runs inside Blender. The timing prelude of a fresh Blender process
+(``blender_timing.py``) and the resident workers import this module, and the
+wrapper scripts look it up in ``sys.modules``, so they still run unchanged
+when Blender is launched without the executor::
+
+    wrapper = sys.modules.get("blender_wrapper")
+    if wrapper:
+        wrapper.exec_code(code, globals())
+    else:
+        exec(code)
+    ...
+    if wrapper:
+        wrapper.apply_render_profile(bpy.context.scene)
+
+A resident worker applying code to its live scene (``set_live_code``) has
+the wrapper run that code in its exec step, after the wrapper's own render
+setup, exactly where a full replay runs the script.
+"""
+
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import bpy
+
+from render_profiles import RENDER_SETTINGS_ENV
+
+# Scene settings the wrappers' render setup and the render profiles
+# overwrite, as (path from the scene, attribute)
+_RENDER_SETTINGS = (
+    ("render", "engine"),
+    ("render", "resolution_x"),
+    ("render", "resolution_y"),
+    ("render", "use_file_extension"),
+    ("render.image_settings", "color_mode"),
+    ("render.image_settings", "file_format"),
+    ("cycles", "device"),
+    ("cycles", "samples"),
+    ("cycles", "use_denoising"),
+    ("cycles", "use_adaptive_sampling"),
+    ("eevee", "taa_render_samples"),
+)
+
+# Code and namespace the next exec_code runs instead of the wrapper's code
+_live_code: Optional[Tuple[str, Dict[str, Any]]] = None
+# Whether exec_code ran the live code
+_live_ran = False
+# Render settings, camera and frame the live code left, restored before the
+# next delta runs
+_live_state: Optional[Dict[str, Any]] = None
+
+
+def _owner(scene: Any, path: str) -> Any:
+    for name in path.split("."):
+        scene = getattr(scene, name)
+    return scene
+
+
+def _save_state(scene: Any) -> Dict[str, Any]:
+    settings = {}
+    for path, attr in _RENDER_SETTINGS:
+        try:
+            settings[(path, attr)] = getattr(_owner(scene, path), attr)
+        except AttributeError:
+            continue
+    camera = scene.camera.name if scene.camera else None
+    return {"settings": settings, "camera": camera, "frame": scene.frame_current}
+
+
+def _restore_state(scene: Any, state: Dict[str, Any]) -> None:
+    for (path, attr), value in state["settings"].items():
+        try:
+            setattr(_owner(scene, path), attr, value)
+        except (AttributeError, TypeError, ValueError):
+            continue
+    if state["camera"] in bpy.data.objects:
+        scene.camera = bpy.data.objects[state["camera"]]
+    scene.frame_set(state["frame"])
+
+
+def set_live_code(code: str, namespace: Dict[str, Any], delta: bool) -> None:
+    """Have the next wrapper run code in namespace in its exec step.
+
+    Args:
+        code: User code to apply to the live scene.
+        namespace: Globals persisting across applications.
+        delta: Whether code is applied on top of the previous application.
+            The render settings, camera and frame the previous code left are
+            then restored first, undoing the wrapper's setup, render profile
+            and camera switches since, as a full replay of both scripts
+            would see them.
+    """
+    global _live_code, _live_ran, _live_state
+    _live_code, _live_ran = (code, namespace), False
+    if not delta:
+        _live_state = None
+
+
+def live_code_ran() -> bool:
+    """Return whether the wrapper ran the code of set_live_code, and clear it."""
+    global _live_code, _live_ran
+    ran, _live_code, _live_ran = _live_ran, None, False
+    return ran
+
+
+def exec_code(code: str, namespace: Dict[str, Any]) -> None:
+    """Run a wrapper's user code, or the live code of set_live_code instead."""
+    global _live_code, _live_ran, _live_state
+    if _live_code is None:
+        exec(code, namespace)
+        return
+    live_code, live_namespace = _live_code
+    _live_code, _live_ran = None, True
+    if _live_state is not None:
+        _restore_state(bpy.context.scene, _live_state)
+    _live_state = None
+    exec(compile(live_code, "<code>", "exec"), live_namespace)
+    _live_state = _save_state(bpy.context.scene)
+
+
+def apply_render_profile(scene: Any) -> None:
+    """Apply the render profile chosen by the executor, if any, to a scene.
+
+    Only the keys present in the profile are applied, so a profile overrides
+    the wrapper defaults and the settings made by the user code, and an
+    empty profile ('standard') changes nothing.
+    """
+    settings = json.loads(os.environ.get(RENDER_SETTINGS_ENV, "{}"))
+    if "resolution" in settings:
+        scene.render.resolution_x, scene.render.resolution_y = settings["resolution"]
+    if "samples" in settings:
+        scene.cycles.samples = settings["samples"]
+    if "use_denoising" in settings:
+        scene.cycles.use_denoising = settings["use_denoising"]
+    if "use_adaptive_sampling" in settings:
+        scene.cycles.use_adaptive_sampling = settings["use_adaptive_sampling"]
+    if "eevee_samples" in settings:
+        scene.eevee.taa_render_samples = settings["eevee_samples"]
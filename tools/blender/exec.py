@@ -6,19 +6,30 @@ agent to execute code, get scene information, and undo operations.
 """
 
 import base64
+import contextlib
+import hashlib
 import io
 import json
 import logging
 import os
 import shutil
-import subprocess
+import sys
+import time
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
 from mcp.server.fastmcp import FastMCP
 from PIL import Image
 
+from incremental import plan_incremental
+from render_cache import RenderCache
+from render_profiles import render_profile_env
+from resource_limits import LimitExceeded, ResourceLimits, run_limited
+from render_scheduler import RenderScheduler
 from script_generators import generate_scene_info_script
+from snapshot_store import SnapshotStore, replace_file
+from timing_log import PRELUDE_SCRIPT, TimingLog
+from worker_pool import BlenderWorkerPool
 
 # Tool configuration dictionaries for the Generator agent
 execute_and_evaluate_tool: Dict[str, object] = {
@@ -92,7 +103,29 @@ class Executor:
         render_path: Directory to save rendered images.
         blender_save: Optional path to save the Blender state after execution.
         gpu_devices: Comma-separated GPU device IDs (e.g., "0,1").
+        worker_pool: Optional pool of resident Blender workers; when unset,
+            every execution launches a fresh Blender process.
+        render_cache: Optional content-addressed cache of execution results.
+        render_profile: Render profile used for every execution.
+        final_render_profile: Optional render profile used by render_final
+            to re-render the final round.
+        snapshots: Deduplicated store of the per-round saved states, set when
+            blender_save is.
+        live_session: Optional resident Blender session holding the scene of
+            the last successful execution, for incremental execution.
+        fork_pool: Optional resident Blender process that evaluates candidate
+            batches by forking a child per candidate.
+        fork_parallel: Maximum number of concurrent forked candidates.
+        scheduler: Optional node-wide render scheduler that every render
+            waits on for a GPU slot and CPU thread budget.
+        timings: Log of the per-phase timings of every Blender execution
+            ('<output_dir>/timings.jsonl').
+        limits: Memory, CPU time, output size and wall-clock limits of
+            every Blender execution.
+        last_exceeded: The limit that stopped the last execution, if any.
         count: Counter for executed scripts.
+        prepared: The round prepare() allocated ahead of its execution, as
+            (code as given, parsed code, code file, render directory).
     """
 
     def __init__(
@@ -103,7 +136,20 @@ class Executor:
         script_save: str,
         render_save: str,
         blender_save: Optional[str] = None,
-        gpu_devices: Optional[str] = None
+        gpu_devices: Optional[str] = None,
+        blender_workers: int = 0,
+        render_cache_dir: Optional[str] = None,
+        render_cache_size: int = 2048,
+        render_profile: str = "standard",
+        final_render_profile: Optional[str] = None,
+        snapshot_dir: Optional[str] = None,
+        snapshot_compress: bool = False,
+        incremental: bool = False,
+        fork_candidates: int = 0,
+        render_slots: int = 0,
+        render_threads: int = 0,
+        render_lock_dir: Optional[str] = None,
+        limits: Optional[ResourceLimits] = None
     ) -> None:
         """Initialize the Blender executor.
 
@@ -115,6 +161,31 @@ class Executor:
             render_save: Directory to save renders.
             blender_save: Optional path to save Blender state.
             gpu_devices: Optional GPU device IDs.
+            blender_workers: Number of resident Blender workers (0 launches
+                a fresh Blender process per execution).
+            render_cache_dir: Optional directory of the render cache.
+            render_cache_size: Render cache budget in MB.
+            render_profile: Render profile for every execution ('preview',
+                'standard' or 'final').
+            final_render_profile: Optional render profile for re-rendering
+                the final round.
+            snapshot_dir: Directory of the snapshot store (defaults to
+                '<output_dir>/snapshots'; may be shared by tasks).
+            snapshot_compress: Store snapshots zstd compressed.
+            incremental: Keep the scene alive between executions and apply
+                only the statements that changed since the last one.
+            fork_candidates: If positive, evaluate candidate batches in
+                children forked from one loaded Blender process, at most
+                this many at a time.
+            render_slots: If positive, concurrent renders allowed per GPU
+                (or for the CPU) across all tasks on the node.
+            render_threads: CPU threads per render slot (0 divides the
+                cores evenly among the slots).
+            render_lock_dir: Directory of the render slot locks shared by
+                all tasks on the node.
+            limits: Resource limits of every Blender execution, or None if
+                no limit is configured (fresh processes then still time out
+                after 300s).
         """
         self.blender_command = blender_command
         self.blender_file = blender_file
@@ -123,33 +194,114 @@ class Executor:
         self.render_path = Path(render_save)
         self.blender_save = blender_save
         self.gpu_devices = gpu_devices
+        self.render_profile = render_profile
+        self.final_render_profile = final_render_profile
         self.count = 0
+        self.prepared: Optional[Tuple[str, str, Path, Path]] = None
+        self.timings = TimingLog(str(self.render_path.parent), "exec")
+        self.limits = limits or ResourceLimits()
+        self.last_exceeded: Optional[LimitExceeded] = None
+        self.scheduler: Optional[RenderScheduler] = None
+        if render_slots and render_slots > 0:
+            self.scheduler = RenderScheduler(gpu_devices, render_slots, render_threads, render_lock_dir)
+        self.worker_pool: Optional[BlenderWorkerPool] = None
+        if blender_workers and blender_workers > 0:
+            self.worker_pool = BlenderWorkerPool(
+                blender_command,
+                size=blender_workers,
+                gpu_devices=gpu_devices,
+                log_dir=str(self.render_path.parent / "workers"),
+                scheduler=self.scheduler,
+                limits=limits
+            )
+        self.render_cache: Optional[RenderCache] = None
+        if render_cache_dir:
+            self.render_cache = RenderCache(render_cache_dir, render_cache_size * 1024 * 1024)
+        self.snapshots: Optional[SnapshotStore] = None
+        if blender_save:
+            self.snapshots = SnapshotStore(snapshot_dir or str(self.render_path.parent / "snapshots"), compress=snapshot_compress)
+        # Refs of this executor's rounds are namespaced by its render directory
+        self.snapshot_namespace = hashlib.sha1(str(self.render_path.resolve()).encode()).hexdigest()[:16]
+        self.live_session: Optional[BlenderWorkerPool] = None
+        # Code whose result the live session holds, or None if unknown
+        self.live_code: Optional[str] = None
+        if incremental:
+            self.live_session = BlenderWorkerPool(
+                blender_command,
+                size=1,
+                gpu_devices=gpu_devices,
+                log_dir=str(self.render_path.parent / "workers" / "live"),
+                scheduler=self.scheduler,
+                limits=limits
+            )
+        self.fork_pool: Optional[BlenderWorkerPool] = None
+        self.fork_parallel = fork_candidates
+        if fork_candidates and fork_candidates > 0:
+            self.fork_pool = BlenderWorkerPool(
+                blender_command,
+                size=1,
+                gpu_devices=gpu_devices,
+                log_dir=str(self.render_path.parent / "workers" / "fork"),
+                scheduler=self.scheduler,
+                limits=limits
+            )
 
         self.script_path.mkdir(parents=True, exist_ok=True)
         self.render_path.mkdir(parents=True, exist_ok=True)
 
+    def _collect_images(self, render_path: str) -> List[str]:
+        """Return the sorted rendered images in render_path."""
+        if render_path and os.path.isdir(render_path):
+            return sorted([str(p) for p in Path(render_path).glob("*") if p.suffix in ['.png','.jpg']])
+        return []
+
     def _execute_blender(
-        self, script_path: str, render_path: str = ''
+        self,
+        script_path: str,
+        render_path: str = '',
+        blend_file: Optional[str] = None,
+        save: bool = True,
+        render_profile: Optional[str] = None,
+        kind: str = "execute"
     ) -> Tuple[bool, List[str], str, str]:
         """Execute a Blender script in background mode.
 
         Args:
             script_path: Path to the Python script to execute.
             render_path: Directory to save rendered images.
+            blend_file: Scene to open instead of blender_file.
+            save: Whether to save the resulting state to blender_save.
+            render_profile: Render profile instead of the executor's default.
+            kind: What the execution is for, recorded in its timing record
+                ('execute', 'final' or 'scene_info').
 
         Returns:
             Tuple of (success, image_paths, stdout, stderr).
         """
+        blend_file = blend_file or self.blender_file
+        blender_save = self.blender_save if save else None
+        profile_env = render_profile_env(render_profile or self.render_profile)
+        timing_env = self.timings.capture_env()
+        if self.worker_pool:
+            args = [script_path, render_path if render_path else "NONE"]
+            if blender_save:
+                args.append(blender_save)
+            success, out, err = self.worker_pool.run(blend_file, self.blender_script, args, env={**profile_env, **timing_env})
+            self.last_exceeded = self.worker_pool.last_exceeded
+            self.timings.collect(timing_env, round=self.count, kind=kind, mode="worker", ok=success)
+            return success, self._collect_images(render_path) if success else [], out, err
+
         # Use list-based command (no shell=True) for reliable execution
         # Use "NONE" as placeholder for empty render_path (empty string gets dropped on Windows)
         cmd = [
             self.blender_command,
-            "--background", self.blender_file,
+            "--background",
+            "--python", PRELUDE_SCRIPT, blend_file,
             "--python", self.blender_script,
             "--", script_path, render_path if render_path else "NONE"
         ]
-        if self.blender_save:
-            cmd.append(self.blender_save)
+        if blender_save:
+            cmd.append(blender_save)
         logging.info(f"Blender command: {' '.join(cmd)}")
         
         # Set environment variables to control GPU devices
@@ -160,39 +312,203 @@ class Executor:
             
         # Ban blender audio error
         env['AL_LIB_LOGLEVEL'] = '0'
-        
-        try:
-            logging.info(f"Running Blender: {cmd}")
-            # Write output to temp files to avoid pipe deadlocks on Windows
-            import sys
-            import tempfile
-            with tempfile.NamedTemporaryFile(mode='w', suffix='_stdout.txt', delete=False) as f_out, \
-                 tempfile.NamedTemporaryFile(mode='w', suffix='_stderr.txt', delete=False) as f_err:
-                stdout_file, stderr_file = f_out.name, f_err.name
-            
-            with open(stdout_file, 'w') as f_out, open(stderr_file, 'w') as f_err:
-                if sys.platform == "win32":
-                    cmd_str = ' '.join(f'"{c}"' if ' ' in c else c for c in cmd)
-                    proc = subprocess.run(cmd_str, shell=True, check=True, stdin=subprocess.DEVNULL, stdout=f_out, stderr=f_err, env=env, timeout=300)
-                else:
-                    proc = subprocess.run(cmd, check=True, stdin=subprocess.DEVNULL, stdout=f_out, stderr=f_err, env=env, timeout=300)
-            
-            with open(stdout_file, 'r') as f:
-                out = f.read()
-            with open(stderr_file, 'r') as f:
-                err = f.read()
-            
-            # Cleanup temp files
-            os.unlink(stdout_file)
-            os.unlink(stderr_file)
-            if os.path.isdir(render_path):
-                imgs = sorted([str(p) for p in Path(render_path).glob("*") if p.suffix in ['.png','.jpg']])
-                if len(imgs) > 0:
-                    return True, imgs, out, err
-            return True, [], out, err
-        except subprocess.CalledProcessError as e:
-            logging.error(f"Blender failed: {e}")
-            return False, [], e.stdout, e.stderr
+        env.update(profile_env)
+
+        # Wait for a render slot and pin the render to its GPU and thread budget
+        with self.scheduler.slot() if self.scheduler else contextlib.nullcontext() as slot:
+            if slot:
+                cmd[1:1] = ["--threads", str(slot.threads)]
+                if slot.device is not None:
+                    env['CUDA_VISIBLE_DEVICES'] = slot.device
+            # Startup is measured from here, after the wait for a slot
+            launch = time.time()
+            slot_wait = launch - float(timing_env["VIGA_LAUNCH_TIME"])
+            timing_env["VIGA_LAUNCH_TIME"] = repr(launch)
+            env.update(timing_env)
+            success = False
+            try:
+                result = self._run_subprocess(cmd, env, render_path)
+                success = result[0]
+            finally:
+                self.timings.collect(timing_env, round=self.count, kind=kind, mode="subprocess", ok=success, slot_wait=round(slot_wait, 4))
+            return result
+
+    def _run_subprocess(self, cmd: List[str], env: Dict[str, str], render_path: str) -> Tuple[bool, List[str], str, str]:
+        """Run a Blender command line under the resource limits and collect its output and renders."""
+        logging.info(f"Running Blender: {cmd}")
+        if sys.platform == "win32":
+            cmd_str = ' '.join(f'"{c}"' if ' ' in c else c for c in cmd)
+            run = run_limited(cmd_str, env, self.limits, shell=True)
+        else:
+            run = run_limited(cmd, env, self.limits)
+        self.last_exceeded = run.exceeded
+        if run.exceeded:
+            return False, [], run.stdout, run.exceeded.message() + "\n" + run.stderr
+        if run.returncode != 0:
+            logging.error(f"Blender failed with exit status {run.returncode}")
+            return False, [], run.stdout, run.stderr
+        return True, self._collect_images(render_path), run.stdout, run.stderr
+
+    def _execute_live(self, code: str, render_path: str) -> Tuple[bool, List[str], str, str]:
+        """Execute user code in the live session, applying only what changed.
+
+        Falls back to replaying the whole script against blender_file when
+        the change cannot be applied incrementally or the incremental
+        application fails.
+
+        Args:
+            code: The complete user code for this round.
+            render_path: Directory to save rendered images.
+
+        Returns:
+            Tuple of (success, image_paths, stdout, stderr).
+        """
+        empty_code = self.render_path.parent / "tmp" / "empty.py"
+        empty_code.parent.mkdir(parents=True, exist_ok=True)
+        empty_code.write_text("")
+        args = [str(empty_code), render_path if render_path else "NONE"]
+        if self.blender_save:
+            args.append(self.blender_save)
+        profile_env = render_profile_env(self.render_profile)
+
+        delta = plan_incremental(self.live_code, code) if self.live_code is not None else None
+        if delta is not None:
+            logging.info(f"Applying {len(delta.splitlines())} changed lines incrementally")
+            timing_env = self.timings.capture_env()
+            success, out, err = self.live_session.run(None, self.blender_script, args, env={**profile_env, **timing_env}, code=delta)
+            self.last_exceeded = self.live_session.last_exceeded
+            self.timings.collect(timing_env, round=self.count, kind="execute", mode="live", incremental=True, ok=success)
+            if success:
+                self.live_code = code
+                return True, self._collect_images(render_path), out, err
+            logging.info("Incremental execution failed, replaying the whole script")
+            for img in self._collect_images(render_path):
+                os.remove(img)
+
+        timing_env = self.timings.capture_env()
+        success, out, err = self.live_session.run(self.blender_file, self.blender_script, args, env={**profile_env, **timing_env}, code=code)
+        self.last_exceeded = self.live_session.last_exceeded
+        self.timings.collect(timing_env, round=self.count, kind="execute", mode="live", incremental=False, ok=success)
+        self.live_code = code if success else None
+        return success, self._collect_images(render_path) if success else [], out, err
+
+    def _execute_code(self, code: str, script_path: str, render_path: str) -> Tuple[bool, List[str], str, str]:
+        """Execute user code, in the live session if incremental execution is enabled."""
+        if self.live_session:
+            return self._execute_live(code, render_path)
+        return self._execute_blender(script_path, render_path)
+
+    def _render_settings(self) -> Dict[str, object]:
+        """Inputs besides scene, code and wrapper script that change the result."""
+        return {"save_state": bool(self.blender_save), "render_profile": self.render_profile}
+
+    def _execute_cached(
+        self, code: str, script_path: str, render_path: str
+    ) -> Tuple[bool, List[str], str, str]:
+        """Execute user code, serving repeated submissions from the render cache.
+
+        Args:
+            code: The user code written to script_path.
+            script_path: Path to the Python script to execute.
+            render_path: Directory to save rendered images.
+
+        Returns:
+            Tuple of (success, image_paths, stdout, stderr).
+        """
+        if not self.render_cache:
+            return self._execute_code(code, script_path, render_path)
+
+        key = self.render_cache.make_key(self.blender_file, code, self.blender_script, self._render_settings())
+        timing_env = self.timings.capture_env()
+        cached = self.render_cache.get(key, render_path, self.blender_save) if key else None
+        if cached:
+            logging.info(f"Render cache hit: {key}")
+            # The live session did not see this execution
+            self.live_code = None
+            result = (True, sorted(cached["images"]), cached["stdout"], "")
+            self.timings.collect(timing_env, round=self.count, kind="execute", mode="cache", ok=True)
+        else:
+            result = self._execute_code(code, script_path, render_path)
+            if result[0] and key:
+                self.render_cache.put(key, result[1], self.blender_save, result[3] + result[2])
+
+        with open(self.render_path.parent / "render_cache_stats.json", "w") as f:
+            json.dump(self.render_cache.stats(), f, indent=4)
+        return result
+
+    def _snapshot_round(self, round_dir: Path, round_num: int, state_file: Optional[str] = None) -> str:
+        """Record the saved state of a round in the snapshot store.
+
+        Uncompressed snapshots are also linked to '<round_dir>/state.blend'.
+
+        Args:
+            round_dir: Render directory of the round.
+            round_num: Round number.
+            state_file: Saved state to record (defaults to blender_save).
+
+        Returns:
+            Content digest of the snapshot.
+        """
+        digest = self.snapshots.put(state_file or self.blender_save)
+        self.snapshots.set_ref(f"{self.snapshot_namespace}/{round_num}", digest)
+        if not self.snapshots.compress:
+            self.snapshots.materialize(digest, str(round_dir / "state.blend"))
+        elif (round_dir / "state.blend").exists():
+            (round_dir / "state.blend").unlink()
+        return digest
+
+    def _round_state(self, round_num: int) -> Optional[str]:
+        """Return a .blend file holding the saved state of a round, if any."""
+        state_file = self.render_path / str(round_num) / "state.blend"
+        if state_file.exists():
+            return str(state_file)
+        digest = self.snapshots.get_ref(f"{self.snapshot_namespace}/{round_num}") if self.snapshots else None
+        if digest is None:
+            return None
+        state_file = self.render_path.parent / "tmp" / "state.blend"
+        self.snapshots.materialize(digest, str(state_file))
+        return str(state_file)
+
+    def prepare(self, code: str) -> int:
+        """Allocate the next round for code and start the resident workers, ahead of execute(code).
+
+        Args:
+            code: Python code the next execution will run.
+
+        Returns:
+            The number of workers started.
+        """
+        self.prepared = (code,) + self._prepare_round(code)
+        return self.warm()
+
+    def _drop_prepared(self) -> None:
+        """Give back a round prepared but not executed."""
+        if self.prepared is not None:
+            self.prepared[2].unlink(missing_ok=True)
+            self.prepared = None
+            self.count -= 1
+
+    def undo(self) -> None:
+        """Drop the last round and restore the saved state of the one before it."""
+        self._drop_prepared()
+        render_path = self.render_path / f"{self.count}"
+        code_path = self.script_path / f"{self.count}.py"
+        if os.path.exists(code_path):
+            os.remove(code_path)
+        if os.path.exists(render_path):
+            shutil.rmtree(render_path)
+        self.live_code = None
+        if self.snapshots:
+            self.snapshots.delete_ref(f"{self.snapshot_namespace}/{self.count}")
+        self.count -= 1
+        # If there is no saved state, the last step was an error and there is nothing to restore
+        if self.blender_save:
+            digest = self.snapshots.get_ref(f"{self.snapshot_namespace}/{self.count}")
+            if digest:
+                self.snapshots.materialize(digest, self.blender_save)
+            elif os.path.exists(self.render_path / f"{self.count}" / "state.blend"):
+                replace_file(str(self.render_path / f"{self.count}" / "state.blend"), self.blender_save)
+            self.snapshots.gc()
 
     def _encode_image(self, img_path: str) -> str:
         """Encode an image file to base64 string."""
@@ -211,16 +527,25 @@ class Executor:
         """Generate a script to extract scene information."""
         return generate_scene_info_script(str(self.render_path.parent / "tmp" / "scene_info.json"))
 
-    def execute(self, code: str) -> Dict[str, object]:
-        """Execute Blender code and return results.
+    def _prepare_round(self, code: str) -> Tuple[str, Path, Path]:
+        """Allocate the next round and write its code file.
+
+        A round prepare() allocated for the same code is taken as is.
 
         Args:
-            code: Python code to execute in Blender.
+            code: Python code for the round, possibly fenced.
 
         Returns:
-            Dictionary with status and output (text, images, or errors).
+            Tuple of (parsed code, code file, empty render directory).
         """
+        if self.prepared is not None:
+            prepared, self.prepared = self.prepared, None
+            if prepared[0] == code:
+                return prepared[1:]
+            # Prepared for other code; the round number is reused
+            self.count -= 1
         self.count += 1
+        self.last_exceeded = None
         code_file = self.script_path / f"{self.count}.py"
         render_file = self.render_path / f"{self.count}"
         code = self._parse_code(code)
@@ -231,23 +556,186 @@ class Executor:
         os.makedirs(render_file, exist_ok=True)
         for img in os.listdir(render_file):
             os.remove(os.path.join(render_file, img))
-            
-        # Execute Blender
-        success, imgs, stdout, stderr = self._execute_blender(str(code_file), str(render_file))
-        # Check if render_file is empty or not exist
+        return code, code_file, render_file
+
+    def _round_result(
+        self, success: bool, imgs: List[str], stdout: str, stderr: str, render_file: Path
+    ) -> Dict[str, object]:
+        """Turn the outcome of a round's execution into the tool response."""
+        stdout, stderr = stdout or '', stderr or ''
         if not success:
-            os.rmdir(render_file)
-            return {"status": "error", "output": {"text": ['Error: ' + (stderr + stdout)]}}
-        elif len(os.listdir(render_file)) == 0:
-            # copy blender save under render file
-            if self.blender_save:
-                shutil.copy(self.blender_save, render_file / "state.blend")
+            shutil.rmtree(render_file, ignore_errors=True)
+            output = {"text": ['Error: ' + (stderr + stdout)]}
+            if self.last_exceeded:
+                output["limit"] = self.last_exceeded.to_dict()
+            return {"status": "error", "output": output}
+        elif not imgs:
             return {"status": "success", "output": {"text": ['The code was executed, but no image was generated. Please check and make sure that:\n(1) you have added the camera in the code (just modify the camera pose and other information, do not render the image in the code).\n(2) You may need to handle errors in the code. The following is the return message for reference. Please check if there are any errors and fix them: ' + (stderr + stdout)]}}
         else:
-            if self.blender_save:
-                shutil.copy(self.blender_save, render_file / "state.blend")
             return {"status": "success", "output": {"image": imgs, "text": [f"Render from camera {x}" for x in range(len(imgs))], 'require_verifier': True}}
 
+    def execute(self, code: str) -> Dict[str, object]:
+        """Execute Blender code and return results.
+
+        Args:
+            code: Python code to execute in Blender.
+
+        Returns:
+            Dictionary with status and output (text, images, or errors).
+        """
+        code, code_file, render_file = self._prepare_round(code)
+            
+        # Execute Blender
+        success, imgs, stdout, stderr = self._execute_cached(code, str(code_file), str(render_file))
+        # snapshot blender save under render file
+        if success and self.blender_save:
+            self._snapshot_round(render_file, self.count)
+        return self._round_result(success, imgs, stdout, stderr, render_file)
+
+    def execute_candidates(self, codes: List[str]) -> List[Dict[str, object]]:
+        """Execute several candidate codes, each as its own round.
+
+        With a fork pool, the scene is loaded once and every candidate runs in
+        a forked child of that Blender process; otherwise the candidates are
+        executed one after another. Every candidate starts from blender_file,
+        and blender_save ends up holding the state of the last successful
+        candidate.
+
+        Args:
+            codes: Python code of each candidate.
+
+        Returns:
+            One tool response per candidate, in order.
+        """
+        if not self.fork_pool:
+            return [self.execute(code) for code in codes]
+
+        self._drop_prepared()
+        rounds = []
+        for code in codes:
+            rounds.append((self.count + 1,) + self._prepare_round(code))
+        arg_lists = []
+        for _, _, code_file, render_file in rounds:
+            args = [str(code_file), str(render_file)]
+            if self.blender_save:
+                args.append(str(render_file / "state.blend"))
+            arg_lists.append(args)
+        timing_env = self.timings.capture_env()
+        outcomes = self.fork_pool.run_batch(
+            self.blender_file,
+            self.blender_script,
+            arg_lists,
+            env={**render_profile_env(self.render_profile), **timing_env},
+            max_parallel=self.fork_parallel
+        )
+        # Each forked child reports its own record; match them to rounds by code file
+        by_code = {str(code_file): (round_num, success) for (round_num, _, code_file, _), (success, _, _) in zip(rounds, outcomes)}
+        records = self.timings.read(timing_env)
+        for record in records:
+            round_num, success = by_code.get((record.get("script_args") or [None])[0], (None, False))
+            record.update({"round": round_num, "ok": success})
+        self.timings.write(timing_env, records, kind="candidate", mode="fork")
+
+        # A limit that stopped the whole batch applies to every candidate
+        self.last_exceeded = self.fork_pool.last_exceeded
+        results = []
+        last_state = None
+        for (round_num, _, _, render_file), (success, stdout, stderr) in zip(rounds, outcomes):
+            imgs = self._collect_images(str(render_file)) if success else []
+            if success and self.blender_save and (render_file / "state.blend").exists():
+                last_state = self._snapshot_round(render_file, round_num, str(render_file / "state.blend"))
+            results.append(self._round_result(success, imgs, stdout, stderr, render_file))
+        if last_state:
+            self.snapshots.materialize(last_state, self.blender_save)
+            # The live session did not see these executions
+            self.live_code = None
+        return results
+
+    def render_final(self) -> Dict[str, object]:
+        """Re-render the latest successful round with the final render profile.
+
+        The saved state of the round is rendered as-is when available;
+        otherwise the round's script is replayed against the original scene.
+        The round's images are replaced only if the re-render succeeds.
+
+        Returns:
+            Dictionary with status and the re-rendered images.
+        """
+        if not self.final_render_profile:
+            return {"status": "error", "output": {"text": ["No final render profile configured"]}}
+        rounds = sorted(
+            (int(p.name) for p in self.render_path.iterdir() if p.name.isdigit() and self._collect_images(str(p))),
+            reverse=True
+        )
+        if not rounds:
+            return {"status": "error", "output": {"text": ["No rendered round to re-render"]}}
+        round_dir = self.render_path / str(rounds[0])
+        tmp_dir = self.render_path.parent / "tmp" / "final"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+
+        state_file = self._round_state(rounds[0])
+        if state_file:
+            code_file = tmp_dir.parent / "final.py"
+            code_file.write_text("")
+            blend_file = state_file
+        else:
+            code_file = self.script_path / f"{rounds[0]}.py"
+            blend_file = self.blender_file
+        success, imgs, stdout, stderr = self._execute_blender(
+            str(code_file), str(tmp_dir), blend_file=blend_file, save=False, render_profile=self.final_render_profile, kind="final"
+        )
+        if not success or not imgs:
+            return {"status": "error", "output": {"text": ['Error: ' + ((stderr or '') + (stdout or ''))]}}
+        final_imgs = []
+        for img in imgs:
+            target = round_dir / os.path.basename(img)
+            os.replace(img, target)
+            final_imgs.append(str(target))
+        return {"status": "success", "output": {"image": final_imgs, "text": [f"Final render of round {rounds[0]}"]}}
+
+    def close(self) -> None:
+        """Stop the resident Blender workers."""
+        for pool in (self.worker_pool, self.live_session, self.fork_pool):
+            if pool:
+                pool.close()
+
+    def warm(self) -> int:
+        """Start the resident Blender workers that are not running.
+
+        Returns:
+            The number of workers started (0 without resident workers).
+        """
+        return sum(pool.warm(self.blender_file) for pool in (self.worker_pool, self.live_session, self.fork_pool) if pool)
+
+    def checkpoint_state(self) -> Dict[str, object]:
+        """Return the state needed to resume the task after the current round.
+
+        The saved scene is put in the snapshot store under a checkpoint ref,
+        so it survives later rounds and undo.
+        """
+        self._drop_prepared()
+        state: Dict[str, object] = {"count": self.count}
+        if self.snapshots and os.path.exists(self.blender_save):
+            digest = self.snapshots.put(self.blender_save)
+            self.snapshots.set_ref(f"{self.snapshot_namespace}/checkpoint", digest)
+            state["blender_save"] = digest
+        return state
+
+    def restore_state(self, state: Dict[str, object]) -> None:
+        """Continue from a state returned by checkpoint_state.
+
+        Args:
+            state: The checkpointed state.
+        """
+        self.count = int(state.get("count", 0))
+        self.prepared = None
+        digest = state.get("blender_save")
+        if digest and self.snapshots:
+            self.snapshots.materialize(str(digest), self.blender_save)
+        # The resident session does not hold the restored scene
+        self.live_code = None
+
     def get_scene_info(self) -> Dict[str, object]:
         """Get scene information by executing a Blender script."""
         try:
@@ -264,7 +752,7 @@ class Executor:
                 f.write(scene_info_script)
             
             # Execute Blender script
-            success, imgs, stdout, stderr = self._execute_blender(str(code_file))
+            success, imgs, stdout, stderr = self._execute_blender(str(code_file), kind="scene_info")
             
             if not success:
                 return {"status": "error", "output": {"text": ['Error: ' + (stderr or stdout)]}}
@@ -293,6 +781,9 @@ def initialize(args: Dict[str, object]) -> Dict[str, object]:
     """
     global _executor
     try:
+        # A pooled server is initialized again for every task
+        if _executor is not None:
+            _executor.close()
         _executor = Executor(
             blender_command=args.get("blender_command"),
             blender_file=args.get("blender_file"),
@@ -300,7 +791,20 @@ def initialize(args: Dict[str, object]) -> Dict[str, object]:
             script_save=args.get("output_dir") + "/scripts",
             render_save=args.get("output_dir") + "/renders",
             blender_save=args.get("blender_save"),
-            gpu_devices=args.get("gpu_devices")
+            gpu_devices=args.get("gpu_devices"),
+            blender_workers=args.get("blender_workers") or 0,
+            render_cache_dir=args.get("render_cache_dir"),
+            render_cache_size=args.get("render_cache_size") or 2048,
+            render_profile=args.get("render_profile") or "standard",
+            final_render_profile=args.get("final_render_profile"),
+            snapshot_dir=args.get("snapshot_dir"),
+            snapshot_compress=bool(args.get("snapshot_compress")),
+            incremental=bool(args.get("incremental_exec")),
+            fork_candidates=args.get("fork_candidates") or 0,
+            render_slots=args.get("render_slots") or 0,
+            render_threads=args.get("render_threads") or 0,
+            render_lock_dir=args.get("render_lock_dir"),
+            limits=ResourceLimits.from_args(args)
         )
         if 'blender' in args.get("mode"):
             tool_configs = [execute_and_evaluate_tool]
@@ -322,25 +826,90 @@ def execute_and_evaluate(thought: str = '', code_diff: str = '', code: str = '')
     except Exception as e:
         return {"status": "error", "output": {"text": [str(e)]}}
 
+@mcp.tool()
+def execute_candidates(codes: List[str] = []) -> Dict[str, object]:
+    """Execute several candidate codes, each as its own round."""
+    global _executor
+    if _executor is None:
+        return {"status": "error", "output": {"text": ["Executor not initialized. Call initialize_executor first."]}}
+    try:
+        results = _executor.execute_candidates(codes)
+        return {"status": "success", "output": {"candidates": [r["output"] for r in results]}}
+    except Exception as e:
+        return {"status": "error", "output": {"text": [str(e)]}}
+
 @mcp.tool()
 def undo_last_step() -> Dict[str, object]:
     """Undo the last executed step by reverting to previous state."""
     global _executor
     if _executor is None:
         return {"status": "error", "output": {"text": ["Executor not initialized. Call initialize_executor first."]}}
-    render_path = _executor.render_path / f"{_executor.count}"
-    code_path = _executor.script_path / f"{_executor.count}.py"
-    if os.path.exists(code_path):
-        os.remove(code_path)
-    if os.path.exists(render_path):
-        shutil.rmtree(render_path)
-    _executor.count -= 1
-    render_path = _executor.render_path / f"{_executor.count}"
-    if os.path.exists(render_path / "state.blend") and _executor.blender_save:
-        shutil.copy(render_path / "state.blend", _executor.blender_save)
-    # If the path do not exist, then last step is error, no need to undo
+    try:
+        _executor.undo()
+    except Exception as e:
+        return {"status": "error", "output": {"text": [str(e)]}}
     return {"status": "success", "output": {"text": ["Last step undone successfully"]}}
 
+@mcp.tool()
+def warm() -> Dict[str, object]:
+    """Start the resident Blender workers ahead of the next execution."""
+    global _executor
+    if _executor is None:
+        return {"status": "error", "output": {"text": ["Executor not initialized. Call initialize_executor first."]}}
+    try:
+        return {"status": "success", "output": {"text": [f"Started {_executor.warm()} Blender workers"]}}
+    except Exception as e:
+        return {"status": "error", "output": {"text": [str(e)]}}
+
+@mcp.tool()
+def prepare_execution(code: str = '') -> Dict[str, object]:
+    """Write the code file of the next execution and start the Blender workers ahead of execute_and_evaluate."""
+    global _executor
+    if _executor is None:
+        return {"status": "error", "output": {"text": ["Executor not initialized. Call initialize_executor first."]}}
+    try:
+        return {"status": "success", "output": {"text": [f"Prepared round {_executor.count}, started {_executor.prepare(code)} Blender workers"]}}
+    except Exception as e:
+        return {"status": "error", "output": {"text": [str(e)]}}
+
+@mcp.tool()
+def checkpoint() -> Dict[str, object]:
+    """Return the executor state to store in the task checkpoint."""
+    global _executor
+    if _executor is None:
+        return {"status": "error", "output": {"text": ["Executor not initialized. Call initialize_executor first."]}}
+    try:
+        return {"status": "success", "output": {"text": ["Checkpoint taken"], "state": _executor.checkpoint_state()}}
+    except Exception as e:
+        return {"status": "error", "output": {"text": [str(e)]}}
+
+@mcp.tool()
+def restore(state: Dict[str, object] = {}) -> Dict[str, object]:
+    """Restore the executor state of a task checkpoint.
+
+    Args:
+        state: State returned by checkpoint.
+    """
+    global _executor
+    if _executor is None:
+        return {"status": "error", "output": {"text": ["Executor not initialized. Call initialize_executor first."]}}
+    try:
+        _executor.restore_state(state)
+        return {"status": "success", "output": {"text": [f"Restored to round {_executor.count}"]}}
+    except Exception as e:
+        return {"status": "error", "output": {"text": [str(e)]}}
+
+@mcp.tool()
+def render_final() -> Dict[str, object]:
+    """Re-render the latest round with the final render profile."""
+    global _executor
+    if _executor is None:
+        return {"status": "error", "output": {"text": ["Executor not initialized. Call initialize_executor first."]}}
+    try:
+        return _executor.render_final()
+    except Exception as e:
+        return {"status": "error", "output": {"text": [str(e)]}}
+
 @mcp.tool()
 def get_scene_info() -> Dict[str, object]:
     """Get scene information including objects, materials, lights, and cameras."""
@@ -355,7 +924,6 @@ def get_scene_info() -> Dict[str, object]:
     
 def main() -> None:
     """Run MCP server or execute test mode."""
-    import sys
     if len(sys.argv) > 1 and sys.argv[1] == "--test":
         print("Running blender-executor tools test...")
         # Read args from environment for convenience
@@ -487,7 +1055,11 @@ print("Scene ready: press Play to watch the ball roll down the slope.")"""
         
     else:
         # Run MCP service normally
-        mcp.run()
+        try:
+            mcp.run()
+        finally:
+            if _executor is not None:
+                _executor.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
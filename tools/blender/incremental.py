@@ -0,0 +1,169 @@
+"""Statement-level diff of generator scripts for incremental execution.
+
+The generator resubmits its complete script every round. When a live Blender
+session still holds the scene produced by the previous script, only the
+top-level statements that changed need to be applied. ``plan_incremental``
+decides whether that is safe and returns the code to apply; it returns None
+whenever the change could make the live scene differ from a full replay, in
+which case the caller replays the whole script.
+
+Two kinds of change are applied incrementally:
+
+* Appends: the new script is the previous script followed by new statements.
+  Only the new statements run.
+* Tail edits: the scripts diverge at some statement and every previous
+  statement from there on is an idempotent assignment (e.g. setting a
+  location, a material color or a light energy) whose target is assigned
+  again in the new tail, and the new tail does not read any of those
+  targets before it assigns them. The new tail runs and overwrites those
+  values.
+
+Anything else, e.g. edits to imports, function definitions, loops, object
+creation or scene resets, falls back to a full replay.
+"""
+
+import ast
+from typing import List, Optional, Set
+
+# Calls allowed on the right-hand side of an idempotent assignment
+_PURE_CALLS = {
+    "abs", "float", "int", "len", "list", "max", "min", "round", "str", "tuple",
+    "radians", "degrees", "sin", "cos", "tan", "sqrt",
+    "Vector", "Euler", "Color", "Matrix", "Quaternion",
+    "get",
+}
+
+# Calls that reset or reload the scene
+_RESET_CALLS = {"read_factory_settings", "read_homefile", "open_mainfile", "revert_mainfile"}
+
+
+def _call_name(node: ast.Call) -> str:
+    func = node.func
+    if isinstance(func, ast.Attribute):
+        return func.attr
+    if isinstance(func, ast.Name):
+        return func.id
+    return ""
+
+
+def _is_pure_expr(node: ast.AST) -> bool:
+    """Whether evaluating node has no side effects on the scene."""
+    for sub in ast.walk(node):
+        if isinstance(sub, ast.Call) and _call_name(sub) not in _PURE_CALLS:
+            return False
+        if isinstance(sub, (ast.Lambda, ast.NamedExpr, ast.Await, ast.Yield, ast.YieldFrom)):
+            return False
+    return True
+
+
+def _is_idempotent(stmt: ast.stmt) -> bool:
+    """Whether running stmt again after it already ran leaves the same state."""
+    if isinstance(stmt, ast.Pass):
+        return True
+    if isinstance(stmt, ast.Expr):
+        # Bare prints and docstrings
+        value = stmt.value
+        if isinstance(value, ast.Constant):
+            return True
+        return (
+            isinstance(value, ast.Call) and _call_name(value) == "print"
+            and all(_is_pure_expr(arg) for arg in value.args)
+        )
+    if isinstance(stmt, (ast.Assign, ast.AnnAssign)):
+        targets = stmt.targets if isinstance(stmt, ast.Assign) else [stmt.target]
+        return stmt.value is not None and _is_pure_expr(stmt.value) and all(_is_pure_expr(t) for t in targets)
+    return False
+
+
+def _assigned_targets(stmts: List[ast.stmt]) -> Set[str]:
+    """Return the assignment targets of the top-level statements stmts, as source."""
+    targets = set()
+    for stmt in stmts:
+        if isinstance(stmt, ast.Assign):
+            targets.update(ast.unparse(t) for t in stmt.targets)
+        elif isinstance(stmt, ast.AnnAssign):
+            targets.add(ast.unparse(stmt.target))
+    return targets
+
+
+def _loaded_chains(stmt: ast.stmt) -> Set[str]:
+    """Return the names, attributes and subscripts stmt reads, as source.
+
+    Only whole chains count (``c.location.x`` rather than ``c`` and
+    ``c.location``), plus the receiver of every method call, and the target
+    of an augmented assignment, which is read before it is written.
+    """
+    parents = {}
+    for node in ast.walk(stmt):
+        for child in ast.iter_child_nodes(node):
+            parents[child] = node
+    chains = set()
+    for node in ast.walk(stmt):
+        if not isinstance(node, (ast.Name, ast.Attribute, ast.Subscript)):
+            continue
+        parent = parents.get(node)
+        if isinstance(parent, (ast.Attribute, ast.Subscript)) and parent.value is node:
+            # Part of a longer chain; the receiver of a method call is read
+            grandparent = parents.get(parent)
+            if not (isinstance(grandparent, ast.Call) and grandparent.func is parent):
+                continue
+        elif not isinstance(node.ctx, ast.Load):
+            if not (isinstance(parent, ast.AugAssign) and parent.target is node):
+                continue
+        chains.add(ast.unparse(node))
+    return chains
+
+
+def _reads_before_assigning(stmts: List[ast.stmt], targets: Set[str]) -> bool:
+    """Whether stmts read any of targets (as source) before assigning it at top level."""
+    pending = set(targets)
+    for stmt in stmts:
+        for chain in _loaded_chains(stmt):
+            for target in pending:
+                if chain == target or chain.startswith((target + ".", target + "[")) or target.startswith((chain + ".", chain + "[")):
+                    return True
+        pending -= _assigned_targets([stmt])
+    return False
+
+
+def _resets_scene(stmts: List[ast.stmt]) -> bool:
+    for stmt in stmts:
+        for sub in ast.walk(stmt):
+            if isinstance(sub, ast.Call) and _call_name(sub) in _RESET_CALLS:
+                return True
+    return False
+
+
+def plan_incremental(prev_code: str, new_code: str) -> Optional[str]:
+    """Return the code that turns the live scene of prev_code into that of new_code.
+
+    Args:
+        prev_code: Script whose result the live scene currently holds.
+        new_code: Script submitted for this round.
+
+    Returns:
+        Source of the statements to apply (possibly empty when nothing
+        changed), or None if the whole script must be replayed.
+    """
+    try:
+        prev = ast.parse(prev_code).body
+        new = ast.parse(new_code).body
+    except (SyntaxError, ValueError):
+        return None
+
+    k = 0
+    while k < len(prev) and k < len(new) and ast.dump(prev[k]) == ast.dump(new[k]):
+        k += 1
+    old_tail, new_tail = prev[k:], new[k:]
+    if _resets_scene(new_tail):
+        return None
+    if old_tail:
+        if not all(_is_idempotent(stmt) for stmt in old_tail):
+            return None
+        if not _assigned_targets(old_tail) <= _assigned_targets(new_tail):
+            return None
+        # A tail that reads values before reassigning them would observe the old ones
+        if _reads_before_assigning(new_tail, _assigned_targets(old_tail)):
+            return None
+
+    return "\n".join(ast.unparse(stmt) for stmt in new_tail)
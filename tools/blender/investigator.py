@@ -12,6 +12,7 @@ from typing import Dict, List, Optional
 from mcp.server.fastmcp import FastMCP
 
 from investigator_core import Investigator3D
+from resource_limits import ResourceLimits
 
 # Tool configuration for agent
 tool_configs: List[Dict[str, object]] = [
@@ -146,13 +147,17 @@ def initialize(args: Dict[str, object]) -> Dict[str, object]:
 
     Args:
         args: Configuration dictionary with 'output_dir', 'blender_file',
-            'blender_command', 'blender_script', and 'gpu_devices' keys.
+            'blender_command', 'blender_script', 'gpu_devices' and optional
+            'resident_investigator' and render scheduler keys.
 
     Returns:
         Dictionary with status and tool configurations on success.
     """
     global _investigator
     try:
+        # A pooled server is initialized again for every task
+        if _investigator is not None:
+            _investigator.close()
         save_dir = args.get("output_dir") + "/investigator/"
         blender_script = os.path.dirname(args.get("blender_script")) + "/verifier_script.py"
         _investigator = Investigator3D(
@@ -160,7 +165,12 @@ def initialize(args: Dict[str, object]) -> Dict[str, object]:
             str(args.get("blender_file")),
             str(args.get("blender_command")),
             blender_script,
-            str(args.get("gpu_devices"))
+            str(args.get("gpu_devices")),
+            resident=bool(args.get("resident_investigator")),
+            render_slots=args.get("render_slots") or 0,
+            render_threads=args.get("render_threads") or 0,
+            render_lock_dir=args.get("render_lock_dir"),
+            limits=ResourceLimits.from_args(args)
         )
         return {
             "status": "success",
@@ -335,6 +345,26 @@ def set_camera(
     return _investigator.set_camera(location, rotation_euler)
 
 
+@mcp.tool()
+def investigate_batch(calls: List[Dict[str, object]] = []) -> Dict[str, object]:
+    """Run several investigator calls, rendering them in one Blender execution.
+
+    Args:
+        calls: Calls in order, each {"name": tool name, "arguments": {...}}.
+
+    Returns:
+        Dictionary with status and the output of each call under 'results'.
+    """
+    global _investigator
+    if _investigator is None:
+        return {"status": "error", "output": {"text": ["Not initialized. Call initialize first."]}}
+    try:
+        results = _investigator.run_batch(calls)
+    except Exception as e:
+        return {"status": "error", "output": {"text": [str(e)]}}
+    return {"status": "success", "output": {"text": [f"Ran {len(calls)} calls"], "results": [r["output"] for r in results]}}
+
+
 @mcp.tool()
 def reload_scene() -> Dict[str, object]:
     """Reload the original Blender scene file.
@@ -345,17 +375,47 @@ def reload_scene() -> Dict[str, object]:
     global _investigator
     if _investigator is None:
         return {"status": "error", "output": {"text": ["Not initialized. Call initialize first."]}}
-    _investigator.executor.blender_file = _investigator.blender_file
+    _investigator.reload_scene()
     return {"status": "success", "output": {"text": ["Scene reloaded successfully"]}}
 
 
+@mcp.tool()
+def checkpoint() -> Dict[str, object]:
+    """Return the investigator state to store in the task checkpoint."""
+    global _investigator
+    if _investigator is None:
+        return {"status": "error", "output": {"text": ["Not initialized. Call initialize first."]}}
+    return {"status": "success", "output": {"text": ["Checkpoint taken"], "state": _investigator.checkpoint_state()}}
+
+
+@mcp.tool()
+def restore(state: Dict[str, object] = {}) -> Dict[str, object]:
+    """Restore the investigator state of a task checkpoint.
+
+    Args:
+        state: State returned by checkpoint.
+    """
+    global _investigator
+    if _investigator is None:
+        return {"status": "error", "output": {"text": ["Not initialized. Call initialize first."]}}
+    try:
+        _investigator.restore_state(state)
+    except Exception as e:
+        return {"status": "error", "output": {"text": [str(e)]}}
+    return {"status": "success", "output": {"text": ["Investigator state restored"]}}
+
+
 def main() -> None:
     """Run the MCP server or execute test mode."""
     if len(sys.argv) > 1 and sys.argv[1] == "--test":
         print("Running investigator tools test...")
         test_tools()
     else:
-        mcp.run()
+        try:
+            mcp.run()
+        finally:
+            if _investigator is not None:
+                _investigator.close()
 
 
 def test_tools() -> None:
@@ -4,16 +4,18 @@ Provides the Executor and Investigator3D classes for camera manipulation,
 scene inspection, and viewpoint management in Blender scenes.
 """
 
+import contextlib
 import json
 import logging
 import math
 import os
 import shutil
-import subprocess
+import time
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from script_generators import (
+    generate_batch_script,
     generate_scene_info_script,
     generate_render_script,
     generate_camera_focus_script,
@@ -23,6 +25,13 @@ from script_generators import (
     generate_keyframe_script,
     generate_viewpoint_script
 )
+from render_scheduler import RenderScheduler
+from resource_limits import LimitExceeded, ResourceLimits, run_limited
+from timing_log import PRELUDE_SCRIPT, TimingLog
+from worker_pool import BlenderWorkerPool
+
+# Investigator calls that render and can share one Blender execution in run_batch
+BATCHABLE_CALLS = ("initialize_viewpoint", "set_camera", "investigate", "set_visibility", "set_keyframe")
 
 
 class Executor:
@@ -40,6 +49,14 @@ class Executor:
         render_path: Directory for rendered images.
         blender_save: Path to save modified Blender files.
         gpu_devices: CUDA device specification.
+        session: Optional resident Blender session; when set, scripts are
+            applied in place to the scene it holds instead of launching
+            Blender and saving/reloading a .blend file per call.
+        scene_loaded: Whether the session already holds the scene.
+        scheduler: Optional node-wide render scheduler.
+        limits: Resource limits of every Blender execution.
+        timings: Log of the per-phase timings of every Blender execution,
+            shared with the task's other tools.
         count: Execution counter.
     """
     def __init__(
@@ -50,7 +67,10 @@ class Executor:
         script_save: str,
         render_save: str,
         blender_save: Optional[str] = None,
-        gpu_devices: Optional[str] = None
+        gpu_devices: Optional[str] = None,
+        session: Optional[BlenderWorkerPool] = None,
+        scheduler: Optional[RenderScheduler] = None,
+        limits: Optional[ResourceLimits] = None
     ) -> None:
         """Initialize the executor.
 
@@ -62,6 +82,11 @@ class Executor:
             render_save: Directory for rendered images.
             blender_save: Optional path to save modified Blender files.
             gpu_devices: Optional CUDA device specification.
+            session: Optional resident Blender session.
+            scheduler: Optional node-wide render scheduler; renders wait
+                for a slot and use its GPU and thread budget.
+            limits: Resource limits of every Blender execution, or None if
+                no limit is configured (a 300s timeout and no other limit).
         """
         self.blender_command = blender_command
         self.blender_file = blender_file
@@ -71,7 +96,13 @@ class Executor:
         self.render_path = Path(render_save)
         self.blender_save = blender_save
         self.gpu_devices = gpu_devices
+        self.session = session
+        self.scheduler = scheduler
+        self.limits = limits or ResourceLimits()
+        self.scene_loaded = False
         self.count = 0
+        # The task's output directory is the parent of the investigator's
+        self.timings = TimingLog(os.path.dirname(self.base), "investigator")
 
         self.script_path.mkdir(parents=True, exist_ok=True)
         self.render_path.mkdir(parents=True, exist_ok=True)
@@ -103,9 +134,13 @@ class Executor:
         Returns:
             Dictionary with status and output (images or error text).
         """
+        if self.session:
+            return self._execute_in_session(code_file, run_dir)
+
         cmd = [
             self.blender_command,
-            "--background", self.blender_file,
+            "--background",
+            "--python", PRELUDE_SCRIPT, self.blender_file,
             "--python", self.blender_script,
             "--", str(code_file), str(run_dir)
         ]
@@ -119,24 +154,77 @@ class Executor:
         # Ban blender audio error
         env['AL_LIB_LOGLEVEL'] = '0'
 
-        try:
-            # Propagate render directory to scripts
-            env["RENDER_DIR"] = str(run_dir)
-            proc = subprocess.run(" ".join(cmd), shell=True, check=True, capture_output=True, text=True, env=env)
-            imgs = sorted([str(p) for p in run_dir.glob("*") if p.suffix.lower() in [".png", ".jpg", ".jpeg"]])
-            # If no image output
-            if not os.path.exists(f"{self.base}/tmp/camera_info.json"):
-                return {"status": "success", "output": {"text": [proc.stdout]}}
-            # If image output
-            with open(f"{self.base}/tmp/camera_info.json", "r") as f:
-                camera_info = json.load(f)
-                for camera in camera_info:
-                    camera['location'] = [round(x, 2) for x in camera['location']]
-                    camera['rotation'] = [round(x, 2) for x in camera['rotation']]
-            return {"status": "success", "output": {"image": imgs, "text": ["Camera parameters: " + str(camera) for camera in camera_info]}}
-        except subprocess.CalledProcessError as e:
-            logging.error(f"Blender failed: {e.stderr}")
-            return {"status": "error", "output": {"text": [e.stderr or e.stdout]}}
+        # Propagate render directory to scripts
+        env["RENDER_DIR"] = str(run_dir)
+        timing_env = self.timings.capture_env()
+        with self.scheduler.slot() if self.scheduler else contextlib.nullcontext() as slot:
+            if slot:
+                cmd[1:1] = ["--threads", str(slot.threads)]
+                if slot.device is not None:
+                    env["CUDA_VISIBLE_DEVICES"] = slot.device
+            # Startup is measured from here, after the wait for a slot
+            launch = time.time()
+            slot_wait = launch - float(timing_env["VIGA_LAUNCH_TIME"])
+            timing_env["VIGA_LAUNCH_TIME"] = repr(launch)
+            env.update(timing_env)
+            ok = False
+            try:
+                run = run_limited(" ".join(cmd), env, self.limits, shell=True)
+                ok = run.returncode == 0
+            finally:
+                self.timings.collect(timing_env, round=self.count, mode="subprocess", ok=ok, slot_wait=round(slot_wait, 4))
+        if run.exceeded:
+            return self._limit_error(run.exceeded, run.stderr)
+        if run.returncode != 0:
+            logging.error(f"Blender failed: {run.stderr}")
+            return {"status": "error", "output": {"text": [run.stderr or run.stdout]}}
+        return self._collect_result(run_dir, run.stdout)
+
+    def _limit_error(self, exceeded: LimitExceeded, stderr: str) -> Dict[str, Any]:
+        """Return the structured error of an execution stopped by a resource limit."""
+        logging.error(f"Blender stopped: {exceeded.message()}")
+        return {"status": "error", "output": {"text": [exceeded.message() + "\n" + stderr], "limit": exceeded.to_dict()}}
+
+    def _execute_in_session(self, code_file: Path, run_dir: Path) -> Dict[str, Any]:
+        """Apply a script to the scene held by the resident session.
+
+        The scene is loaded from blender_file on first use (or after a
+        reload) and modified in place afterwards; nothing is saved to disk.
+
+        Args:
+            code_file: Path to the Python script to execute.
+            run_dir: Directory for output files.
+
+        Returns:
+            Dictionary with status and output (images or error text).
+        """
+        blend_file = None if self.scene_loaded else self.blender_file
+        timing_env = self.timings.capture_env()
+        success, stdout, stderr = self.session.run(
+            blend_file, self.blender_script, [str(code_file), str(run_dir)], env={"RENDER_DIR": str(run_dir), **timing_env}, timeout=None
+        )
+        self.timings.collect(timing_env, round=self.count, mode="worker", ok=success)
+        if self.session.last_exceeded:
+            return self._limit_error(self.session.last_exceeded, stderr)
+        if not success:
+            logging.error(f"Blender failed: {stderr}")
+            return {"status": "error", "output": {"text": [stderr or stdout]}}
+        self.scene_loaded = True
+        return self._collect_result(run_dir, stdout)
+
+    def _collect_result(self, run_dir: Path, stdout: str) -> Dict[str, Any]:
+        """Collect rendered images and camera parameters after a run."""
+        imgs = sorted([str(p) for p in run_dir.glob("*") if p.suffix.lower() in [".png", ".jpg", ".jpeg"]])
+        # If no image output
+        if not os.path.exists(f"{self.base}/tmp/camera_info.json"):
+            return {"status": "success", "output": {"text": [stdout]}}
+        # If image output
+        with open(f"{self.base}/tmp/camera_info.json", "r") as f:
+            camera_info = json.load(f)
+            for camera in camera_info:
+                camera['location'] = [round(x, 2) for x in camera['location']]
+                camera['rotation'] = [round(x, 2) for x in camera['rotation']]
+        return {"status": "success", "output": {"image": imgs, "text": ["Camera parameters: " + str(camera) for camera in camera_info]}}
 
     def execute(self, full_code: str) -> Dict[str, Any]:
         """Execute Blender code and return results.
@@ -177,6 +265,7 @@ class Investigator3D:
         phi: Camera elevation angle.
         count: Operation counter.
         scene_info_cache: Cached scene information.
+        session: Resident Blender session, if running in resident mode.
     """
 
     def __init__(
@@ -185,7 +274,12 @@ class Investigator3D:
         blender_path: str,
         blender_command: str,
         blender_script: str,
-        gpu_devices: str
+        gpu_devices: str,
+        resident: bool = False,
+        render_slots: int = 0,
+        render_threads: int = 0,
+        render_lock_dir: Optional[str] = None,
+        limits: Optional[ResourceLimits] = None
     ) -> None:
         """Initialize the 3D investigator.
 
@@ -195,6 +289,14 @@ class Investigator3D:
             blender_command: Command to invoke Blender.
             blender_script: Path to the execution script.
             gpu_devices: CUDA device specification.
+            resident: Keep one Blender session alive and apply camera,
+                visibility and frame changes in place instead of launching
+                Blender and round-tripping current_scene.blend per call.
+            render_slots: If positive, concurrent renders allowed per GPU
+                across all tasks on the node.
+            render_threads: CPU threads per render slot (0 for automatic).
+            render_lock_dir: Directory of the render slot locks.
+            limits: Resource limits of every Blender execution.
         """
         self.blender_file = blender_path
         self.blender_command = blender_command
@@ -203,14 +305,32 @@ class Investigator3D:
         self.tmp_dir = self.base / "tmp"
         self.tmp_dir.mkdir(parents=True, exist_ok=True)
 
+        scheduler = None
+        if render_slots and render_slots > 0:
+            scheduler = RenderScheduler(gpu_devices, render_slots, render_threads, render_lock_dir)
+
+        self.session: Optional[BlenderWorkerPool] = None
+        if resident:
+            self.session = BlenderWorkerPool(
+                blender_command,
+                size=1,
+                gpu_devices=gpu_devices,
+                log_dir=str(self.base / "workers"),
+                scheduler=scheduler,
+                limits=limits
+            )
+
         self.executor = Executor(
             blender_command=blender_command,
             blender_file=blender_path,
             blender_script=blender_script,
             script_save=str(self.base / "scripts"),
             render_save=str(self.base / "renders"),
-            blender_save=str(self.base / "current_scene.blend"),
-            gpu_devices=gpu_devices
+            blender_save=None if resident else str(self.base / "current_scene.blend"),
+            gpu_devices=gpu_devices,
+            session=self.session,
+            scheduler=scheduler,
+            limits=limits
         )
 
         # Camera state variables
@@ -269,6 +389,158 @@ class Investigator3D:
             logging.error(f"Script execution failed: {e}")
             return {"status": "error", "output": {"text": [str(e)]}}
 
+    def reload_scene(self) -> None:
+        """Discard in-scene changes and start again from the original file."""
+        self.executor.blender_file = self.blender_file
+        self.executor.scene_loaded = False
+
+    def run_batch(self, calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Run several investigator calls, rendering them in one Blender execution.
+
+        Calls run in order against the same scene, each rendering into its
+        own directory. A zoom or move after a focus in the same batch needs
+        the orbit the focus measures, so the batch is split there; calls
+        that do not render (get_scene_info) run on their own.
+
+        Args:
+            calls: Calls in order, each {"name": tool name, "arguments": {...}}.
+
+        Returns:
+            The result of each call, as the single call would return it.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(calls)
+        pending: List[Tuple[int, str, bool]] = []
+        for i, call in enumerate(calls):
+            name, arguments = call.get("name"), call.get("arguments") or {}
+            orbit_change = name == "investigate" and arguments.get("operation") in ("zoom", "move")
+            if name not in BATCHABLE_CALLS or (orbit_change and any(focus for _, _, focus in pending)):
+                self._run_steps(pending, results)
+                pending = []
+            if name == "get_scene_info":
+                results[i] = self.get_info()
+                continue
+            if name not in BATCHABLE_CALLS:
+                results[i] = {"status": "error", "output": {"text": [f"Tool {name} cannot be called together with other tools"]}}
+                continue
+            try:
+                script = self._batch_script(name, arguments)
+            except ValueError as e:
+                results[i] = {"status": "error", "output": {"text": [str(e)]}}
+                continue
+            pending.append((i, script, name == "investigate" and arguments.get("operation") == "focus"))
+        self._run_steps(pending, results)
+        return results
+
+    def _batch_script(self, name: str, arguments: Dict[str, Any]) -> str:
+        """Return the script of one call of a batch, updating the camera state like the call does.
+
+        Raises:
+            ValueError: If the arguments are invalid.
+        """
+        if name == "initialize_viewpoint":
+            return self._generate_viewpoint_script(arguments.get("object_names") or [])
+        if name == "set_camera":
+            return self._generate_camera_set_script(arguments.get("location", [0, 0, 0]), arguments.get("rotation_euler", [0, 0, 0]))
+        if name == "set_visibility":
+            return self._generate_visibility_script(arguments.get("show_objects") or [], arguments.get("hide_objects") or [])
+        if name == "set_keyframe":
+            return self._generate_keyframe_script(int(arguments.get("frame_number", 1)))
+        operation, direction = arguments.get("operation", ""), arguments.get("direction", "")
+        if operation == "focus":
+            if not arguments.get("object_name"):
+                raise ValueError("object_name is required for focus")
+            self.target = arguments["object_name"]
+            return self._generate_camera_focus_script(self.target)
+        if operation not in ("zoom", "move"):
+            raise ValueError(f"Unknown operation: {operation}")
+        if operation == "zoom" and direction not in ("in", "out"):
+            raise ValueError("direction must be 'in' or 'out' for zoom")
+        if operation == "move" and direction not in ("up", "down", "left", "right"):
+            raise ValueError("direction must be up/down/left/right for move")
+        if not self.target:
+            raise ValueError("No target object set. Call focus first.")
+        if operation == "zoom":
+            self._zoom_orbit(direction)
+        else:
+            self._move_orbit(direction)
+        return self._generate_camera_move_script(self.target, self.radius, self.theta, self.phi)
+
+    def _run_steps(self, steps: List[Tuple[int, str, bool]], results: List[Optional[Dict[str, Any]]]) -> None:
+        """Execute the scripts of a batch in one Blender run and fill in their results.
+
+        Args:
+            steps: (call index, script, whether it is a focus) of each step.
+            results: Results of the batch's calls, filled in place.
+        """
+        if not steps:
+            return
+        script = generate_batch_script([(str(i + 1), code) for i, code, _ in steps], str(self.base))
+        result = self._execute_script(script, f"Run {len(steps)} investigation steps")
+        if result.get("status") != "success":
+            for i, _, _ in steps:
+                results[i] = result
+            return
+        run_dir = self.executor.render_path / str(self.executor.count)
+        for i, _, focus in steps:
+            results[i] = self._step_result(run_dir / str(i + 1), focus)
+
+    def _step_result(self, step_dir: Path, focus: bool) -> Dict[str, Any]:
+        """Collect the images and camera parameters of one batch step."""
+        error_file = step_dir / "error.txt"
+        if error_file.exists():
+            return {"status": "error", "output": {"text": [error_file.read_text()]}}
+        if focus and (step_dir / "rotate_info.json").exists():
+            rotate_info = json.loads((step_dir / "rotate_info.json").read_text())
+            self.radius = rotate_info['radius']
+            self.theta = rotate_info['theta']
+            self.phi = rotate_info['phi']
+        imgs = sorted(str(p) for p in step_dir.glob("*") if p.suffix.lower() in [".png", ".jpg", ".jpeg"])
+        if not (step_dir / "camera_info.json").exists():
+            return {"status": "success", "output": {"text": ["Done"]}}
+        camera_info = json.loads((step_dir / "camera_info.json").read_text())
+        for camera in camera_info:
+            camera['location'] = [round(x, 2) for x in camera['location']]
+            camera['rotation'] = [round(x, 2) for x in camera['rotation']]
+        return {"status": "success", "output": {"image": imgs, "text": ["Camera parameters: " + str(camera) for camera in camera_info]}}
+
+    def checkpoint_state(self) -> Dict[str, Any]:
+        """Return the camera and counter state to store in the task checkpoint."""
+        return {
+            "target": self.target,
+            "radius": self.radius,
+            "theta": self.theta,
+            "phi": self.phi,
+            "count": self.count,
+            "run_count": self.executor.count,
+            "scene_file": self.executor.blender_file,
+            "scene_info_cache": self.scene_info_cache,
+        }
+
+    def restore_state(self, state: Dict[str, Any]) -> None:
+        """Continue from a state returned by checkpoint_state.
+
+        Run directories continue after the checkpointed ones, so renders
+        referenced by the restored agent memory are not overwritten.
+
+        Args:
+            state: The checkpointed state.
+        """
+        self.target = state.get("target")
+        self.radius = float(state.get("radius", 5.0))
+        self.theta = float(state.get("theta", 0.0))
+        self.phi = float(state.get("phi", 0.0))
+        self.count = int(state.get("count", 0))
+        self.scene_info_cache = state.get("scene_info_cache")
+        self.executor.count = int(state.get("run_count", 0))
+        scene_file = state.get("scene_file")
+        self.executor.blender_file = scene_file if scene_file and os.path.exists(scene_file) else self.blender_file
+        self.executor.scene_loaded = False
+
+    def close(self) -> None:
+        """Stop the resident session, if any."""
+        if self.session:
+            self.session.close()
+
     def _render(self) -> dict:
         """Render current scene and return image path and camera parameters."""
         render_script = self._generate_render_script()
@@ -310,16 +582,25 @@ class Investigator3D:
         """Zoom camera in or out."""
         if not self.target:
             return {"status": "error", "output": {"text": ["No target object set. Call focus first."]}}
-        if direction == 'in':
-            self.radius = max(1, self.radius-3)
-        elif direction == 'out':
-            self.radius += 3
+        self._zoom_orbit(direction)
         return self._update_and_render()
 
     def move_camera(self, direction: str) -> dict:
         """Move camera around target object."""
         if not self.target:
             return {"status": "error", "output": {"text": ["No target object set. Call focus first."]}}
+        self._move_orbit(direction)
+        return self._update_and_render()
+
+    def _zoom_orbit(self, direction: str) -> None:
+        """Change the orbit radius for a zoom."""
+        if direction == 'in':
+            self.radius = max(1, self.radius-3)
+        elif direction == 'out':
+            self.radius += 3
+
+    def _move_orbit(self, direction: str) -> None:
+        """Change the orbit angles for a camera move."""
         step = self.radius
         theta_step = step / (self.radius*math.cos(self.phi)) if math.cos(self.phi) != 0 else 0.1
         phi_step = step / self.radius
@@ -331,7 +612,6 @@ class Investigator3D:
             self.theta -= theta_step
         elif direction=='right':
             self.theta += theta_step
-        return self._update_and_render()
 
     def _update_and_render(self) -> dict:
         """Update camera position and render."""
@@ -0,0 +1,279 @@
+"""Content-addressed cache of Blender execution results.
+
+A cache entry is keyed by the hash of the input .blend bytes, the normalized
+user code, the wrapper script, the render settings and the files the code
+names (e.g. imported assets), and stores the rendered images, the saved
+state.blend and the Blender output. Code that loads files through paths
+computed at run time is not cached, since its inputs cannot be keyed.
+Entries live on disk under ``<cache_dir>/<key[:2]>/<key>/`` and are evicted
+least recently used first once the cache exceeds its size budget.
+"""
+
+import ast
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from .snapshot_store import replace_file
+except ImportError:  # imported as a flat module next to exec.py
+    from snapshot_store import replace_file
+
+# Calls that read the file given as their first argument (open,
+# bpy.data.images.load, bpy.data.libraries.load, ...)
+_LOADERS = {"open", "load"}
+# Keyword arguments that name a file in any call (bpy.ops.import_scene.gltf,
+# bpy.ops.wm.append, ...)
+_PATH_KEYWORDS = {"filepath", "filename", "directory", "file", "path"}
+# Most files a directory named by the code may hold to be keyed
+_MAX_DIR_FILES = 10000
+
+
+def normalize_code(code: str) -> str:
+    """Normalize user code so formatting-only edits map to the same key.
+
+    Comments, blank lines and whitespace are dropped by comparing the AST;
+    code that does not parse falls back to whitespace normalization.
+    """
+    try:
+        return ast.dump(ast.parse(code), include_attributes=False)
+    except (SyntaxError, ValueError):
+        lines = [line.rstrip() for line in code.replace("\r\n", "\n").split("\n")]
+        return "\n".join(lines).strip()
+
+
+def referenced_paths(code: str) -> Optional[List[str]]:
+    """Return the existing files and directories named by string literals in code.
+
+    Only literals containing a path separator are considered, so names such
+    as "Cube" never match a file in the working directory.
+
+    Returns:
+        The paths, or None if the code passes a computed path to a file
+        loader or path keyword (see _LOADERS and _PATH_KEYWORDS) or does
+        not parse, so its inputs are unknown.
+    """
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return None
+    paths = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            if ("/" in node.value or "\\" in node.value) and len(node.value) < 4096 and os.path.exists(node.value):
+                paths.add(node.value)
+        elif isinstance(node, ast.Call):
+            func = node.func
+            name = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", None)
+            args = node.args[:1] if name in _LOADERS else []
+            args += [kw.value for kw in node.keywords if kw.arg in _PATH_KEYWORDS]
+            if any(not (isinstance(arg, ast.Constant) and isinstance(arg.value, str)) for arg in args):
+                return None
+    return sorted(paths)
+
+
+class RenderCache:
+    """Size-bounded LRU cache of render results on disk.
+
+    Attributes:
+        cache_dir: Root directory of the cache.
+        max_bytes: Size budget; least recently used entries are evicted
+            when it is exceeded.
+        hits: Number of lookups served from the cache.
+        misses: Number of lookups that had to render.
+        uncacheable: Number of executions whose inputs could not be keyed.
+        evictions: Number of entries evicted.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int) -> None:
+        """Initialize the render cache.
+
+        Args:
+            cache_dir: Root directory of the cache (may be shared by tasks).
+            max_bytes: Size budget in bytes.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+        self.evictions = 0
+        self._file_digests: Dict[Tuple[str, int, int], str] = {}
+        # Running size of the cache, from the last scan plus this instance's
+        # puts; entries stored by other tasks are counted at the next scan
+        self._size: Optional[int] = None
+
+    def _file_digest(self, path: str) -> str:
+        """Hash a file's bytes, memoized on (path, mtime, size)."""
+        st = os.stat(path)
+        stamp = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+        if stamp not in self._file_digests:
+            h = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+            self._file_digests[stamp] = h.hexdigest()
+        return self._file_digests[stamp]
+
+    def _path_stamp(self, path: str) -> Optional[str]:
+        """Identify the content of a file, or of every file under a directory.
+
+        Returns None for a directory holding more than _MAX_DIR_FILES files.
+        """
+        if os.path.isfile(path):
+            return self._file_digest(path)
+        stamps = []
+        for root, _, files in os.walk(path):
+            for name in files:
+                st = os.stat(os.path.join(root, name))
+                stamps.append((os.path.relpath(os.path.join(root, name), path), st.st_mtime_ns, st.st_size))
+            if len(stamps) > _MAX_DIR_FILES:
+                return None
+        return hashlib.sha256(json.dumps(sorted(stamps)).encode()).hexdigest()
+
+    def make_key(self, blend_file: str, code: str, script: str, settings: Dict[str, Any]) -> Optional[str]:
+        """Build the cache key for one execution.
+
+        Args:
+            blend_file: Input .blend file.
+            code: User code to execute.
+            script: Wrapper script that executes the code and renders.
+            settings: Render settings and any other inputs that change the output.
+
+        Returns:
+            Hex digest identifying the execution, or None if the code reads
+            files the key cannot cover (see referenced_paths).
+        """
+        paths = referenced_paths(code)
+        if paths is None:
+            self.uncacheable += 1
+            return None
+        h = hashlib.sha256()
+        h.update(self._file_digest(blend_file).encode())
+        h.update(self._file_digest(script).encode())
+        h.update(hashlib.sha256(normalize_code(code).encode()).hexdigest().encode())
+        h.update(json.dumps(settings, sort_keys=True).encode())
+        try:
+            stamps = [self._path_stamp(path) for path in paths]
+        except OSError:
+            stamps = [None]
+        if None in stamps:
+            self.uncacheable += 1
+            return None
+        for path, stamp in zip(paths, stamps):
+            h.update(f"{os.path.abspath(path)}:{stamp}".encode())
+        return h.hexdigest()
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def get(self, key: str, render_dir: str, state_file: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Look up an entry, copy it into place and mark it as recently used.
+
+        An entry evicted (e.g. by another task) while it is copied counts as
+        a miss.
+
+        Args:
+            key: Cache key from make_key.
+            render_dir: Directory the cached images are copied into.
+            state_file: Path replaced by the cached state.blend, if any.
+
+        Returns:
+            Dictionary with 'images' (the copied image paths) and 'stdout',
+            or None on a miss.
+        """
+        entry = self._entry_dir(key)
+        meta_file = entry / "meta.json"
+        try:
+            with open(meta_file, "r") as f:
+                meta = json.load(f)
+            os.utime(meta_file)
+            images = []
+            for name in meta["images"]:
+                shutil.copy(entry / name, render_dir)
+                images.append(os.path.join(render_dir, name))
+            if meta.get("state") and state_file:
+                replace_file(str(entry / "state.blend"), state_file)
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {"images": images, "stdout": meta.get("stdout", "")}
+
+    def put(self, key: str, images: List[str], state_file: Optional[str], stdout: str) -> None:
+        """Store the result of an execution.
+
+        Args:
+            key: Cache key from make_key.
+            images: Rendered image paths.
+            state_file: Saved .blend path, if any.
+            stdout: Blender output to replay on a hit.
+        """
+        entry = self._entry_dir(key)
+        if entry.exists():
+            return
+        tmp = self.cache_dir / f"tmp-{uuid.uuid4().hex}"
+        try:
+            tmp.mkdir(parents=True)
+            names = []
+            for img in images:
+                shutil.copy(img, tmp / os.path.basename(img))
+                names.append(os.path.basename(img))
+            if state_file and os.path.exists(state_file):
+                shutil.copy(state_file, tmp / "state.blend")
+            size = sum(p.stat().st_size for p in tmp.iterdir())
+            with open(tmp / "meta.json", "w") as f:
+                json.dump({"images": names, "state": (tmp / "state.blend").exists(), "stdout": stdout, "size": size}, f)
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp, entry)
+        except OSError as e:
+            # Another task may have stored the same entry concurrently
+            logging.warning(f"Render cache put failed for {key}: {e}")
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        if self._size is None:
+            self._evict()
+        else:
+            self._size += size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Scan the cache and evict least recently used entries until it fits its budget."""
+        entries = []
+        total = 0
+        for meta_file in self.cache_dir.glob("*/*/meta.json"):
+            try:
+                with open(meta_file, "r") as f:
+                    size = json.load(f).get("size", 0)
+                entries.append((meta_file.stat().st_mtime, size, meta_file.parent))
+            except (OSError, ValueError):
+                continue
+            total += size
+        entries.sort()
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            self.evictions += 1
+        self._size = total
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss statistics for this cache instance."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "uncacheable": self.uncacheable,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
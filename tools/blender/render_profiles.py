@@ -0,0 +1,56 @@
+"""Render quality profiles for Blender executions.
+
+The executor passes the selected profile to the wrapper scripts through the
+``VIGA_RENDER_SETTINGS`` environment variable (JSON). Wrapper scripts apply
+it with ``blender_wrapper.apply_render_profile`` after the user code has
+run, so a profile overrides both the wrapper defaults and any settings made
+by the user code.
+"""
+
+import json
+from typing import Any, Dict
+
+RENDER_SETTINGS_ENV = "VIGA_RENDER_SETTINGS"
+
+RENDER_PROFILES: Dict[str, Dict[str, Any]] = {
+    # Fast feedback for intermediate rounds: few samples, cleaned up by the denoiser
+    "preview": {
+        "resolution": [512, 512],
+        "samples": 32,
+        "use_denoising": True,
+        "use_adaptive_sampling": True,
+        "eevee_samples": 16,
+    },
+    # Wrapper script defaults (512 samples at 512x512)
+    "standard": {},
+    # Full quality for the final output
+    "final": {
+        "resolution": [512, 512],
+        "samples": 1024,
+        "use_denoising": True,
+        "use_adaptive_sampling": True,
+        "eevee_samples": 64,
+    },
+}
+
+
+def get_render_profile(name: str) -> Dict[str, Any]:
+    """Return the settings of a render profile.
+
+    Args:
+        name: Profile name ('preview', 'standard' or 'final').
+
+    Returns:
+        Dictionary of render settings.
+
+    Raises:
+        ValueError: If the profile does not exist.
+    """
+    if name not in RENDER_PROFILES:
+        raise ValueError(f"Unknown render profile: {name}")
+    return RENDER_PROFILES[name]
+
+
+def render_profile_env(name: str) -> Dict[str, str]:
+    """Return the environment variables that select a render profile."""
+    return {RENDER_SETTINGS_ENV: json.dumps(get_render_profile(name))}
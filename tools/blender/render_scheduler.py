@@ -0,0 +1,136 @@
+"""Node-wide render slot scheduler for concurrent tasks.
+
+Runners launch many ``main.py`` processes at once, and each executor and
+investigator starts its own Blender renders. Without coordination every
+render sees all GPUs and uses all CPU cores. A RenderScheduler hands out a
+fixed number of render slots per GPU (or for the CPU when no GPU is given),
+each with a CPU thread budget. The slots are lock files in a directory shared
+by every process on the node, so all tasks draw from the same slots without
+a separate daemon, and a crashed process releases its slot with its file
+descriptors.
+"""
+
+import logging
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+DEFAULT_LOCK_DIR = os.path.join(tempfile.gettempdir(), "viga_render_slots")
+
+
+class RenderSlot:
+    """A reserved render slot.
+
+    Attributes:
+        device: GPU device ID the render must use, or None for CPU renders.
+        threads: CPU threads the render may use.
+        index: Slot index on its device.
+    """
+
+    def __init__(self, device: Optional[str], threads: int, index: int) -> None:
+        self.device = device
+        self.threads = threads
+        self.index = index
+
+
+class RenderScheduler:
+    """Hands out render slots shared by all processes using the same lock_dir.
+
+    Attributes:
+        devices: GPU device IDs, or [None] for CPU-only rendering.
+        slots_per_device: Concurrent renders allowed per device.
+        threads: CPU threads per slot.
+        lock_dir: Directory holding the slot lock files.
+    """
+
+    def __init__(
+        self,
+        gpu_devices: Optional[str] = None,
+        slots_per_device: int = 1,
+        threads: int = 0,
+        lock_dir: Optional[str] = None
+    ) -> None:
+        """Initialize the scheduler.
+
+        Args:
+            gpu_devices: Comma-separated GPU device IDs (e.g., "0,1"); None
+                schedules CPU renders.
+            slots_per_device: Concurrent renders allowed per device.
+            threads: CPU threads per slot; 0 divides the cores evenly among
+                all slots.
+            lock_dir: Directory holding the slot lock files (defaults to a
+                node-wide directory under the system temp dir).
+        """
+        self.devices: List[Optional[str]] = [d.strip() for d in gpu_devices.split(",") if d.strip()] if gpu_devices else [None]
+        self.slots_per_device = max(1, slots_per_device)
+        total_slots = len(self.devices) * self.slots_per_device
+        self.threads = threads if threads > 0 else max(1, (os.cpu_count() or 1) // total_slots)
+        self.lock_dir = Path(lock_dir or DEFAULT_LOCK_DIR)
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+
+    def _try_lock(self, device: Optional[str], index: int) -> Optional[int]:
+        """Try to take a slot's lock; return the lock file descriptor or None."""
+        path = self.lock_dir / f"{device if device is not None else 'cpu'}-{index}.lock"
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        if fcntl is None:
+            return fd
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except OSError:
+            os.close(fd)
+            return None
+
+    @contextmanager
+    def slot(self, device: Optional[str] = None, timeout: Optional[float] = None) -> Iterator[RenderSlot]:
+        """Reserve a render slot for the duration of the context.
+
+        Args:
+            device: Only consider slots of this device (for processes whose
+                GPU is already fixed); by default any device.
+            timeout: Seconds to wait for a free slot; None waits forever.
+
+        Raises:
+            TimeoutError: If no slot becomes free within the timeout.
+        """
+        devices = [device] if device is not None and device in self.devices else list(self.devices)
+        candidates = [(d, i) for d in devices for i in range(self.slots_per_device)]
+        deadline = None if timeout is None else time.time() + timeout
+        waited = False
+        while True:
+            # Start at a random slot so waiting processes spread over devices
+            start = random.randrange(len(candidates))
+            for d, i in candidates[start:] + candidates[:start]:
+                fd = self._try_lock(d, i)
+                if fd is None:
+                    continue
+                if waited:
+                    logging.info(f"Acquired render slot {d if d is not None else 'cpu'}-{i}")
+                try:
+                    yield RenderSlot(device=d, threads=self.threads, index=i)
+                finally:
+                    os.close(fd)
+                return
+            if deadline is not None and time.time() > deadline:
+                raise TimeoutError(f"No render slot became free within {timeout}s")
+            if not waited:
+                logging.info("Waiting for a free render slot")
+                waited = True
+            time.sleep(0.2)
+
+    def device_for(self, index: int) -> Optional[str]:
+        """Pick the device a long-lived worker should be pinned to.
+
+        Workers of different processes are spread over the devices by
+        process ID.
+        """
+        return self.devices[(os.getpid() + index) % len(self.devices)]
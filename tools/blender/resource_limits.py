@@ -0,0 +1,280 @@
+"""Per-execution resource limits for Blender processes.
+
+A generated script can allocate far more than a shared node can give (e.g.
+an accidental 10M-vertex subdivision), spin forever, or print without end.
+``run_limited`` runs a Blender command line under a ResourceLimits:
+
+* memory: resident memory of the whole process group (proportional set
+  size where the kernel reports it), checked by a watchdog. An address-space rlimit is not used because CUDA reserves far
+  more virtual memory than it ever touches.
+* cpu: CPU time over all threads, enforced by ``RLIMIT_CPU``.
+* output: combined size of stdout and stderr, checked by the watchdog;
+  returned output is also truncated to it.
+* timeout: wall-clock time.
+
+When a limit trips the process group is killed and the result carries a
+LimitExceeded describing which limit and by how much, so the caller can
+return a structured error the generator can act on.
+
+Memory and CPU limits need Linux (``/proc`` and ``resource``); elsewhere
+only the output and wall-clock limits are enforced.
+"""
+
+import logging
+import os
+import signal
+import subprocess
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Union
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Seconds between two watchdog checks
+_POLL_INTERVAL = 0.25
+
+# What the generator can do about each limit
+_ADVICE = {
+    "memory": "Reduce the scene's memory use, e.g. fewer subdivision levels, lower particle or instance counts, or smaller textures.",
+    "cpu": "Reduce the computation in the code, e.g. fewer objects created in loops, fewer simulation frames, or fewer modifier levels.",
+    "output": "Print less, e.g. do not print inside large loops.",
+    "timeout": "Make the code finish faster, e.g. avoid heavy loops, simulations or bakes, and keep geometry and render settings simple.",
+}
+
+
+class ResourceLimits:
+    """Limits applied to every Blender execution; 0 disables a limit.
+
+    Attributes:
+        memory_mb: Resident memory cap of the Blender process group in MB.
+        cpu_seconds: CPU time cap in seconds, summed over threads.
+        output_mb: Cap on the combined stdout and stderr size in MB.
+        timeout: Wall-clock timeout in seconds.
+    """
+
+    def __init__(self, memory_mb: int = 0, cpu_seconds: int = 0, output_mb: int = 0, timeout: float = 300) -> None:
+        self.memory_mb = memory_mb
+        self.cpu_seconds = cpu_seconds
+        self.output_mb = output_mb
+        self.timeout = timeout
+
+    @classmethod
+    def from_args(cls, args: Dict[str, Any]) -> Optional["ResourceLimits"]:
+        """Build limits from a tool's initialize arguments (main.py flags).
+
+        Returns:
+            The limits, or None if no limit flag is given.
+        """
+        memory_mb = args.get("blender_memory_mb") or 0
+        cpu_seconds = args.get("blender_cpu_seconds") or 0
+        output_mb = args.get("blender_output_mb") or 0
+        timeout = args.get("blender_timeout") or 0
+        if not (memory_mb or cpu_seconds or output_mb or timeout):
+            return None
+        return cls(memory_mb=memory_mb, cpu_seconds=cpu_seconds, output_mb=output_mb, timeout=timeout or 300)
+
+    def preexec(self) -> None:
+        """Apply the rlimits in the child process before Blender starts."""
+        if self.cpu_seconds and resource is not None:
+            # SIGXCPU at the soft limit, SIGKILL shortly after
+            resource.setrlimit(resource.RLIMIT_CPU, (int(self.cpu_seconds), int(self.cpu_seconds) + 5))
+
+    def check_memory(self, pgid: int) -> Optional["LimitExceeded"]:
+        """Return the exceeded memory limit if the process group uses too much memory."""
+        if not self.memory_mb:
+            return None
+        rss_mb = group_rss_mb(pgid)
+        if rss_mb is not None and rss_mb > self.memory_mb:
+            return LimitExceeded("memory", self.memory_mb, round(rss_mb), "MB")
+        return None
+
+    def truncate(self, text: str) -> str:
+        """Shorten output to the output limit, keeping its head and tail."""
+        limit = int(self.output_mb * 1024 * 1024)
+        if not limit or len(text) <= limit:
+            return text
+        return f"{text[:limit // 2]}\n... [output truncated] ...\n{text[-(limit // 2):]}"
+
+
+class LimitExceeded:
+    """A resource limit that stopped an execution.
+
+    Attributes:
+        name: 'memory', 'cpu', 'output' or 'timeout'.
+        limit: The configured limit.
+        value: The measured value when the process was stopped.
+        unit: Unit of limit and value ('MB' or 's').
+    """
+
+    def __init__(self, name: str, limit: float, value: float, unit: str) -> None:
+        self.name = name
+        self.limit = limit
+        self.value = value
+        self.unit = unit
+
+    def message(self) -> str:
+        """Return an explanation the generator can act on."""
+        what = {"memory": "memory", "cpu": "CPU time", "output": "output size", "timeout": "time"}[self.name]
+        return (
+            f"Blender was stopped because the code exceeded the {what} limit "
+            f"({self.value:g} {self.unit} used, limit {self.limit:g} {self.unit}). {_ADVICE[self.name]}"
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the structured form included in tool responses."""
+        return {"name": self.name, "limit": self.limit, "value": self.value, "unit": self.unit}
+
+
+class LimitedRun:
+    """Outcome of run_limited.
+
+    Attributes:
+        returncode: Exit status of the process (negative for signals).
+        stdout: Captured stdout, truncated to the output limit.
+        stderr: Captured stderr, truncated to the output limit.
+        exceeded: The limit that stopped the process, if any.
+    """
+
+    def __init__(self, returncode: int, stdout: str, stderr: str, exceeded: Optional[LimitExceeded]) -> None:
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.exceeded = exceeded
+
+
+def _pss_mb(pid: str) -> Optional[float]:
+    """Return a process's proportional set size in MB, or None if the kernel does not report it."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def group_rss_mb(pgid: int) -> Optional[float]:
+    """Return the summed resident memory of a process group in MB, or None without /proc.
+
+    Each process counts its proportional set size where the kernel reports
+    it, so copy-on-write pages shared by forked children (see the fork
+    batches of blender_worker.py) are counted once; otherwise its RSS.
+    """
+    if not os.path.isdir("/proc"):
+        return None
+    page_mb = os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    total = 0.0
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # Fields after the parenthesized command name; pgrp is the 3rd, rss the 22nd
+        fields = stat[stat.rfind(")") + 2:].split()
+        if len(fields) > 21 and int(fields[2]) == pgid:
+            pss = _pss_mb(entry)
+            total += pss if pss is not None else int(fields[21]) * page_mb
+    return total
+
+
+def _read_limited(path: str, limit_bytes: int) -> str:
+    """Read a captured output file, keeping its head and tail if it is too long."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if limit_bytes and len(data) > limit_bytes:
+        data = data[:limit_bytes // 2] + b"\n... [output truncated] ...\n" + data[-(limit_bytes // 2):]
+    return data.decode(errors="replace")
+
+
+def _kill_group(proc: subprocess.Popen) -> None:
+    """Kill the process and everything it started."""
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+    proc.wait()
+
+
+def run_limited(
+    cmd: Union[List[str], str],
+    env: Optional[Dict[str, str]],
+    limits: ResourceLimits,
+    shell: bool = False
+) -> LimitedRun:
+    """Run a command line under resource limits.
+
+    Output goes to temporary files rather than pipes, so a chatty process
+    cannot block on a full pipe.
+
+    Args:
+        cmd: Command line (a string with shell=True).
+        env: Environment of the process (None inherits).
+        limits: Limits to enforce.
+        shell: Run the command through the shell.
+
+    Returns:
+        The LimitedRun; returncode is non-zero and exceeded set if a limit
+        tripped.
+    """
+    posix = os.name == "posix"
+    with tempfile.NamedTemporaryFile(mode="w", suffix="_stdout.txt", delete=False) as f_out, \
+         tempfile.NamedTemporaryFile(mode="w", suffix="_stderr.txt", delete=False) as f_err:
+        stdout_file, stderr_file = f_out.name, f_err.name
+    output_bytes = int(limits.output_mb * 1024 * 1024)
+    exceeded: Optional[LimitExceeded] = None
+    try:
+        with open(stdout_file, "w") as f_out, open(stderr_file, "w") as f_err:
+            proc = subprocess.Popen(
+                cmd,
+                shell=shell,
+                stdin=subprocess.DEVNULL,
+                stdout=f_out,
+                stderr=f_err,
+                env=env,
+                # Own process group, so the watchdog can measure and kill Blender with its children
+                start_new_session=posix,
+                preexec_fn=limits.preexec if posix and limits.cpu_seconds else None,
+            )
+            start = time.time()
+            while True:
+                try:
+                    proc.wait(timeout=_POLL_INTERVAL)
+                    break
+                except subprocess.TimeoutExpired:
+                    pass
+                elapsed = time.time() - start
+                if limits.timeout and elapsed > limits.timeout:
+                    exceeded = LimitExceeded("timeout", limits.timeout, round(elapsed, 1), "s")
+                elif output_bytes and os.path.getsize(stdout_file) + os.path.getsize(stderr_file) > output_bytes:
+                    size_mb = (os.path.getsize(stdout_file) + os.path.getsize(stderr_file)) / (1024 * 1024)
+                    exceeded = LimitExceeded("output", limits.output_mb, round(size_mb, 1), "MB")
+                elif posix:
+                    exceeded = limits.check_memory(proc.pid)
+                if exceeded:
+                    logging.warning(f"Killing Blender: {exceeded.message()}")
+                    _kill_group(proc)
+                    break
+            returncode = proc.returncode
+        # RLIMIT_CPU stops the process with SIGXCPU (the shell reports 128 + signal)
+        if exceeded is None and limits.cpu_seconds and posix:
+            if returncode in (-signal.SIGXCPU, 128 + signal.SIGXCPU):
+                exceeded = LimitExceeded("cpu", limits.cpu_seconds, limits.cpu_seconds, "s")
+        return LimitedRun(
+            returncode,
+            _read_limited(stdout_file, output_bytes),
+            _read_limited(stderr_file, output_bytes),
+            exceeded,
+        )
+    finally:
+        os.unlink(stdout_file)
+        os.unlink(stderr_file)
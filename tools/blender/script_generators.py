@@ -5,7 +5,7 @@ exec_blender tools. Contains reusable script generation methods for scene
 inspection, rendering, and camera manipulation.
 """
 
-from typing import List
+from typing import List, Tuple
 
 
 def generate_scene_info_script(output_path: str) -> str:
@@ -546,3 +546,46 @@ camera.rotation_euler = original_rotation
 print("Viewpoints initialized and rendered for", len(objects), "objects")
 '''
 
+
+def generate_batch_script(steps: List[Tuple[str, str]], base_path: str) -> str:
+    """Generate script to run several investigator scripts in one Blender session.
+
+    Each step renders into its own subdirectory of RENDER_DIR and gets a copy
+    of the camera info it wrote. A failing step writes its traceback to
+    error.txt in its directory and the next step still runs.
+
+    Args:
+        steps: (subdirectory name, script) of each step, in order.
+        base_path: Base path of the camera info JSON files.
+
+    Returns:
+        Blender Python script as a string.
+    """
+    base_path = base_path.replace('\\', '/')
+    return f'''import os
+import shutil
+import traceback
+
+render_dir = os.environ.get("RENDER_DIR", "/tmp")
+info_dir = os.path.join({base_path!r}, "tmp")
+steps = {steps!r}
+
+for step_name, step_code in steps:
+    step_dir = os.path.join(render_dir, step_name)
+    os.makedirs(step_dir, exist_ok=True)
+    for info in ("camera_info.json", "rotate_info.json"):
+        if os.path.exists(os.path.join(info_dir, info)):
+            os.remove(os.path.join(info_dir, info))
+    os.environ["RENDER_DIR"] = step_dir
+    try:
+        exec(step_code, {{"__name__": "__main__"}})
+        for info in ("camera_info.json", "rotate_info.json"):
+            if os.path.exists(os.path.join(info_dir, info)):
+                shutil.copy(os.path.join(info_dir, info), os.path.join(step_dir, info))
+    except Exception:
+        with open(os.path.join(step_dir, "error.txt"), "w") as f:
+            f.write(traceback.format_exc())
+os.environ["RENDER_DIR"] = render_dir
+
+print("Ran", len(steps), "investigation steps")
+'''
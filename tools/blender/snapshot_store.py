@@ -0,0 +1,290 @@
+"""Content-addressed, deduplicated storage for .blend snapshots.
+
+Snapshots are stored once per content hash under ``<root>/objects/`` and are
+referenced by name through small files under ``<root>/refs/``. Uncompressed
+objects are shared with their users through hardlinks (falling back to
+reflinks, then copies), so taking a snapshot of an unchanged scene or
+restoring one costs no data I/O. Objects can optionally be stored zstd
+compressed, in which case they are decompressed on restore. Objects no longer
+referenced are removed by ``gc``.
+
+Objects are read-only and every write into a user path goes through a
+temporary file and ``os.replace``, so a later write to a restored file can
+never modify the stored snapshot. Blender itself saves .blend files the same
+way (temporary file and rename). A hardlinked user path, such as the live
+Blender save after ``put`` or ``materialize``, is therefore read-only as
+well: replace it, never write into it in place.
+"""
+
+import errno
+import hashlib
+import logging
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# ioctl request number of FICLONE (Linux reflink)
+_FICLONE = 0x40049409
+
+
+def _file_sha256(path: str) -> str:
+    """Hash a file's bytes."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _reflink(src: str, dst: str) -> None:
+    """Create dst as a copy-on-write clone of src (btrfs, XFS)."""
+    if fcntl is None:
+        raise OSError(errno.ENOTSUP, "reflink is not supported on this platform")
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.unlink(dst)
+            raise
+
+
+def link_or_copy(src: str, dst: str) -> str:
+    """Create dst with the contents of src as cheaply as the filesystem allows.
+
+    Args:
+        src: Existing file.
+        dst: Path to create; must not exist.
+
+    Returns:
+        The method used: 'hardlink', 'reflink' or 'copy'.
+    """
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EOPNOTSUPP):
+            raise
+    try:
+        _reflink(src, dst)
+        return "reflink"
+    except OSError:
+        pass
+    shutil.copyfile(src, dst)
+    return "copy"
+
+
+def replace_file(src: str, dst: str) -> str:
+    """Atomically replace dst with the contents of src without writing into dst's inode.
+
+    Args:
+        src: Existing file.
+        dst: Path to replace.
+
+    Returns:
+        The method used: 'hardlink', 'reflink' or 'copy'.
+    """
+    tmp = os.path.join(os.path.dirname(os.path.abspath(dst)), f".tmp-{uuid.uuid4().hex}")
+    try:
+        method = link_or_copy(src, tmp)
+        os.replace(tmp, dst)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+    return method
+
+
+class SnapshotStore:
+    """Deduplicated snapshot store with named references.
+
+    Attributes:
+        root: Root directory of the store (may be shared by tasks).
+        compress: Whether new objects are stored zstd compressed.
+        level: zstd compression level.
+    """
+
+    def __init__(self, root: str, compress: bool = False, level: int = 3) -> None:
+        """Initialize the snapshot store.
+
+        Args:
+            root: Root directory of the store.
+            compress: Store new objects zstd compressed (requires the
+                ``zstandard`` package).
+            level: zstd compression level.
+        """
+        self.root = Path(root)
+        self.compress = compress
+        self.level = level
+        if compress:
+            import zstandard  # noqa: F401  (fail early if unavailable)
+        (self.root / "objects").mkdir(parents=True, exist_ok=True)
+        (self.root / "refs").mkdir(parents=True, exist_ok=True)
+        # Digests of files put or materialized by this instance, by
+        # (device, inode, mtime, size), so an unchanged file is not hashed again
+        self._digests: Dict[Tuple[int, int, int, int], str] = {}
+
+    def _stamp(self, path: str) -> Tuple[int, int, int, int]:
+        st = os.stat(path)
+        return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _object_path(self, digest: str) -> Optional[Path]:
+        """Return the stored object for digest, compressed or not, if any."""
+        base = self.root / "objects" / digest[:2] / digest
+        for path in (base, base.with_suffix(".zst")):
+            if path.exists():
+                return path
+        return None
+
+    def _tmp_path(self, directory: Path) -> Path:
+        return directory / f".tmp-{uuid.uuid4().hex}"
+
+    def put(self, path: str) -> str:
+        """Add a file to the store.
+
+        Identical content is stored once. An uncompressed object shares the
+        inode of ``path`` when the filesystem allows it, so ``path`` becomes
+        read-only. A file this store already put or materialized and that has
+        not been replaced since is not hashed again.
+
+        Args:
+            path: File to snapshot.
+
+        Returns:
+            Content digest of the snapshot.
+        """
+        stamp = self._stamp(path)
+        digest = self._digests.get(stamp) or _file_sha256(path)
+        self._digests[stamp] = digest
+        if self._object_path(digest):
+            return digest
+        obj_dir = self.root / "objects" / digest[:2]
+        obj_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self._tmp_path(obj_dir)
+        try:
+            if self.compress:
+                import zstandard
+                with open(path, "rb") as fin, open(tmp, "wb") as fout:
+                    zstandard.ZstdCompressor(level=self.level).copy_stream(fin, fout)
+                target = obj_dir / f"{digest}.zst"
+            else:
+                link_or_copy(path, str(tmp))
+                target = obj_dir / digest
+            os.chmod(tmp, 0o444)
+            os.replace(tmp, target)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        return digest
+
+    def materialize(self, digest: str, dest: str) -> str:
+        """Atomically replace dest with the snapshot's content.
+
+        Args:
+            digest: Content digest from put.
+            dest: Destination path; replaced if it exists.
+
+        Returns:
+            The method used: 'hardlink', 'reflink', 'copy' or 'decompress'.
+
+        Raises:
+            FileNotFoundError: If the snapshot is not in the store.
+        """
+        obj = self._object_path(digest)
+        if obj is None:
+            raise FileNotFoundError(f"Snapshot not found: {digest}")
+        dest_dir = Path(dest).parent
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self._tmp_path(dest_dir)
+        try:
+            if obj.suffix == ".zst":
+                import zstandard
+                with open(obj, "rb") as fin, open(tmp, "wb") as fout:
+                    zstandard.ZstdDecompressor().copy_stream(fin, fout)
+                method = "decompress"
+            else:
+                method = link_or_copy(str(obj), str(tmp))
+            os.replace(tmp, dest)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        self._digests[self._stamp(dest)] = digest
+        return method
+
+    def _ref_path(self, name: str) -> Path:
+        return self.root / "refs" / name
+
+    def set_ref(self, name: str, digest: str) -> None:
+        """Point a named reference at a snapshot.
+
+        Args:
+            name: Reference name; may contain '/' to form namespaces.
+            digest: Content digest from put.
+        """
+        ref = self._ref_path(name)
+        ref.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._tmp_path(ref.parent)
+        tmp.write_text(digest)
+        os.replace(tmp, ref)
+
+    def get_ref(self, name: str) -> Optional[str]:
+        """Return the digest a reference points at, or None."""
+        try:
+            return self._ref_path(name).read_text().strip()
+        except OSError:
+            return None
+
+    def delete_ref(self, name: str) -> None:
+        """Remove a named reference; its snapshot is reclaimed by gc."""
+        try:
+            self._ref_path(name).unlink()
+        except FileNotFoundError:
+            pass
+
+    def gc(self, grace_seconds: float = 600) -> Tuple[int, int]:
+        """Remove objects that no reference points at.
+
+        Args:
+            grace_seconds: Objects added (or linked) more recently than this
+                are kept, so a task sharing the store can still reference a
+                snapshot it has just put.
+
+        Returns:
+            Tuple of (objects removed, bytes freed).
+        """
+        live = set()
+        for ref in (self.root / "refs").rglob("*"):
+            if ref.is_file() and not ref.name.startswith(".tmp-"):
+                try:
+                    live.add(ref.read_text().strip())
+                except OSError:
+                    continue
+        removed, freed = 0, 0
+        cutoff = time.time() - grace_seconds
+        for obj in (self.root / "objects").glob("*/*"):
+            if obj.name.startswith(".tmp-") or obj.name.split(".")[0] in live:
+                continue
+            try:
+                st = obj.stat()
+                if st.st_ctime > cutoff:
+                    continue
+                size = st.st_size
+                obj.unlink()
+            except OSError as e:
+                logging.warning(f"Snapshot gc failed for {obj}: {e}")
+                continue
+            removed += 1
+            freed += size
+        return removed, freed
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number and total size of stored objects."""
+        objects = [p for p in (self.root / "objects").glob("*/*") if not p.name.startswith(".tmp-")]
+        return {"objects": len(objects), "bytes": sum(p.stat().st_size for p in objects)}
@@ -0,0 +1,91 @@
+"""Per-task log of Blender execution timings.
+
+Executors give every Blender execution a capture file through the
+``VIGA_TIMINGS_FILE`` environment variable. The Blender side
+(``blender_timing.py``) appends one record per execution to it; the executor
+then annotates the records (tool, round, how Blender was run, success,
+wall time) and appends them to ``<output_dir>/timings.jsonl``, which is
+shared by all tools of a task.
+"""
+
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Prelude that starts the timing record of a fresh Blender process; pass it
+# with --python before the scene file
+PRELUDE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "blender_timing.py")
+
+
+class TimingLog:
+    """Collects timing records into a task's timings.jsonl.
+
+    Attributes:
+        path: The task's timings.jsonl.
+        tool: Name of the tool writing records (e.g. 'exec', 'investigator').
+        capture_dir: Directory of the per-execution capture files.
+    """
+
+    def __init__(self, output_dir: str, tool: str) -> None:
+        """Initialize the timing log.
+
+        Args:
+            output_dir: Task output directory holding timings.jsonl.
+            tool: Name of the tool writing records.
+        """
+        self.path = Path(output_dir) / "timings.jsonl"
+        self.tool = tool
+        self.capture_dir = Path(output_dir) / "tmp" / "timings"
+        self.capture_dir.mkdir(parents=True, exist_ok=True)
+
+    def capture_env(self) -> Dict[str, str]:
+        """Return the environment that makes Blender record timings to a new capture file."""
+        capture = self.capture_dir / f"{uuid.uuid4().hex}.jsonl"
+        return {"VIGA_TIMINGS_FILE": str(capture), "VIGA_LAUNCH_TIME": repr(time.time())}
+
+    def read(self, env: Dict[str, str]) -> List[Dict[str, Any]]:
+        """Return and remove the records of a capture.
+
+        Args:
+            env: Environment returned by capture_env.
+
+        Returns:
+            The records in capture order; a single empty record if Blender
+            did not report (e.g. it crashed), so the wall time is still
+            logged.
+        """
+        capture = env["VIGA_TIMINGS_FILE"]
+        records = []
+        try:
+            with open(capture, "r") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+            os.unlink(capture)
+        except OSError:
+            pass
+        return records or [{}]
+
+    def write(self, env: Dict[str, str], records: List[Dict[str, Any]], **fields: Any) -> None:
+        """Annotate records and append them to the log in one write.
+
+        Args:
+            env: Environment returned by capture_env.
+            records: Records from read.
+            **fields: Annotations added to every record (e.g. round, mode,
+                ok); 'wall' is measured from the launch time unless given.
+        """
+        fields.setdefault("wall", round(time.time() - float(env["VIGA_LAUNCH_TIME"]), 4))
+        now = time.time()
+        data = "".join(json.dumps({**record, "time": now, "tool": self.tool, **fields}) + "\n" for record in records)
+        with open(self.path, "a") as f:
+            f.write(data)
+
+    def collect(self, env: Dict[str, str], **fields: Any) -> None:
+        """Move the records of a capture into the log, see write."""
+        self.write(env, self.read(env), **fields)
@@ -0,0 +1,497 @@
+"""Pool of resident Blender worker processes.
+
+Instead of launching ``blender --background <file> --python <script>`` for
+every execution, a BlenderWorkerPool keeps long-lived Blender processes
+(running ``blender_worker.py``) that reset to the requested .blend file and
+run the wrapper script in-process. This saves Blender startup, add-on
+initialization and Cycles device enumeration on every round.
+"""
+
+import logging
+import os
+import queue
+import secrets
+import signal
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing.connection import Connection, Listener
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    from .resource_limits import LimitExceeded, ResourceLimits
+except ImportError:  # imported as a flat module next to exec.py
+    from resource_limits import LimitExceeded, ResourceLimits
+
+if TYPE_CHECKING:
+    from render_scheduler import RenderScheduler
+
+WORKER_SCRIPT = str(Path(__file__).resolve().parent / "blender_worker.py")
+
+
+class WorkerLimitExceeded(Exception):
+    """A request was stopped because the worker exceeded a resource limit.
+
+    Attributes:
+        exceeded: The limit that was exceeded.
+    """
+
+    def __init__(self, exceeded: LimitExceeded) -> None:
+        super().__init__(exceeded.message())
+        self.exceeded = exceeded
+
+
+class BlenderWorker:
+    """A single resident Blender process serving wrapper-script requests.
+
+    Attributes:
+        blender_command: Path to the Blender executable.
+        env: Environment for the Blender process.
+        log_path: Optional file receiving Blender's own stdout/stderr.
+        startup_timeout: Seconds to wait for the worker to connect.
+        device: GPU device the worker is pinned to, if any.
+        threads: CPU thread limit passed to Blender, if any.
+        limits: Optional resource limits; the memory limit is enforced per
+            request on the worker's process group.
+        proc: The running Blender process, if any.
+        conn: Connection to the worker, if connected.
+        startup_error: Why Blender exited during startup, if it did; the
+            worker is then not started again.
+    """
+
+    def __init__(
+        self,
+        blender_command: str,
+        env: Dict[str, str],
+        log_path: Optional[str] = None,
+        startup_timeout: float = 120,
+        device: Optional[str] = None,
+        threads: Optional[int] = None,
+        limits: Optional[ResourceLimits] = None
+    ) -> None:
+        self.blender_command = blender_command
+        self.env = env
+        self.log_path = log_path
+        self.startup_timeout = startup_timeout
+        self.device = device
+        self.threads = threads
+        self.limits = limits
+        self.proc: Optional[subprocess.Popen] = None
+        self.conn: Optional[Connection] = None
+        self.startup_error: Optional[str] = None
+
+    @property
+    def alive(self) -> bool:
+        """Whether the worker process is running and connected."""
+        return self.proc is not None and self.proc.poll() is None and self.conn is not None
+
+    def start(self, blend_file: Optional[str] = None) -> None:
+        """Launch Blender and wait for the worker loop to connect back.
+
+        Args:
+            blend_file: Optional .blend file to preload, so the first request
+                against it does not need to reload the scene.
+
+        Raises:
+            RuntimeError: If the worker does not connect within the timeout,
+                or Blender exits before it connects (now or on an earlier
+                start).
+        """
+        if self.startup_error:
+            raise RuntimeError(self.startup_error)
+        authkey = secrets.token_bytes(16)
+        listener = Listener(("127.0.0.1", 0), authkey=authkey)
+        host, port = listener.address
+        cmd = [self.blender_command, "--background"]
+        if self.threads:
+            cmd += ["--threads", str(self.threads)]
+        if blend_file:
+            cmd.append(blend_file)
+        cmd += ["--python", WORKER_SCRIPT, "--", host, str(port), authkey.hex()]
+        logging.info(f"Starting Blender worker: {' '.join(cmd[:-1])} <authkey>")
+
+        log = open(self.log_path, "a") if self.log_path else subprocess.DEVNULL
+        try:
+            # Own process group, so its memory can be measured and it can be killed with its children
+            self.proc = subprocess.Popen(
+                cmd, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, env=self.env,
+                start_new_session=os.name == "posix"
+            )
+        finally:
+            if self.log_path:
+                log.close()
+
+        accepted: List[Connection] = []
+        acceptor = threading.Thread(target=lambda: accepted.append(listener.accept()), daemon=True)
+        acceptor.start()
+        deadline = time.time() + self.startup_timeout
+        # Stop waiting as soon as Blender exits (e.g. a wrong --blender-command)
+        while acceptor.is_alive() and self.proc.poll() is None and time.time() < deadline:
+            acceptor.join(0.25)
+        listener.close()
+        if not accepted:
+            status = self.proc.poll()
+            self.stop()
+            if status is None:
+                raise RuntimeError(f"Blender worker did not connect within {self.startup_timeout}s")
+            self.startup_error = f"Blender exited with status {status} during startup"
+            tail = self._log_tail()
+            if tail:
+                self.startup_error += f":\n{tail}"
+            raise RuntimeError(self.startup_error)
+        self.conn = accepted[0]
+
+    def _log_tail(self, lines: int = 20) -> str:
+        """Return the last lines of the worker's log, if it has one."""
+        if not self.log_path:
+            return ""
+        try:
+            with open(self.log_path, "r", errors="replace") as f:
+                return "".join(f.readlines()[-lines:]).rstrip()
+        except OSError:
+            return ""
+
+    def request(self, message: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Send a request and wait for the response.
+
+        Args:
+            message: Request dictionary understood by ``blender_worker.py``.
+            timeout: Seconds to wait for the response; the worker is killed
+                on timeout.
+
+        Returns:
+            Response dictionary from the worker.
+
+        Raises:
+            TimeoutError: If the worker does not respond in time.
+            WorkerLimitExceeded: If the worker exceeded the memory limit; it
+                is killed.
+            EOFError: If the worker died while handling the request.
+        """
+        self.conn.send(message)
+        deadline = None if timeout is None else time.time() + timeout
+        while not self.conn.poll(0.25):
+            if deadline is not None and time.time() > deadline:
+                self.kill()
+                raise TimeoutError(f"Blender worker timed out after {timeout}s")
+            exceeded = self.limits.check_memory(self.proc.pid) if self.limits and os.name == "posix" else None
+            if exceeded:
+                self.kill()
+                raise WorkerLimitExceeded(exceeded)
+        return self.conn.recv()
+
+    def kill(self) -> None:
+        """Kill the worker and everything it started."""
+        if self.proc is not None and self.proc.poll() is None:
+            try:
+                if os.name == "posix":
+                    os.killpg(self.proc.pid, signal.SIGKILL)
+                else:
+                    self.proc.kill()
+            except (ProcessLookupError, PermissionError):
+                pass
+        self.stop()
+
+    def stop(self) -> None:
+        """Shut the worker down, killing it if it does not exit promptly."""
+        if self.conn is not None:
+            try:
+                self.conn.send({"op": "shutdown"})
+            except (OSError, ValueError):
+                pass
+            self.conn.close()
+            self.conn = None
+        if self.proc is not None:
+            try:
+                self.proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+            self.proc = None
+
+
+class BlenderWorkerPool:
+    """Fixed-size pool of resident Blender workers.
+
+    Workers are started lazily on first use and restarted transparently if
+    they crash or time out. A worker whose Blender exits during startup is
+    not started again; its requests fail at once with the startup error.
+
+    Attributes:
+        blender_command: Path to the Blender executable.
+        size: Number of workers in the pool.
+        gpu_devices: Comma-separated GPU device IDs (e.g., "0,1").
+        log_dir: Optional directory for per-worker Blender logs.
+        scheduler: Optional node-wide render scheduler; when set, each
+            worker is pinned to one GPU and limited to the scheduler's thread
+            budget, and every request waits for a render slot on that GPU.
+        limits: Optional resource limits. Requests time out after
+            limits.timeout and are killed when the worker's process group,
+            including the children of a fork batch, exceeds
+            limits.memory_mb.
+        last_exceeded: The limit that stopped the most recent request, if
+            any.
+    """
+
+    def __init__(
+        self,
+        blender_command: str,
+        size: int = 1,
+        gpu_devices: Optional[str] = None,
+        log_dir: Optional[str] = None,
+        startup_timeout: float = 120,
+        scheduler: Optional["RenderScheduler"] = None,
+        limits: Optional[ResourceLimits] = None
+    ) -> None:
+        """Initialize the worker pool.
+
+        Args:
+            blender_command: Path to the Blender executable.
+            size: Number of resident workers.
+            gpu_devices: Optional GPU device IDs.
+            log_dir: Optional directory for per-worker Blender logs.
+            startup_timeout: Seconds to wait for each worker to connect.
+            scheduler: Optional node-wide render scheduler.
+            limits: Optional resource limits; their timeout replaces the
+                default request timeout.
+        """
+        self.blender_command = blender_command
+        self.size = size
+        self.gpu_devices = gpu_devices
+        self.log_dir = log_dir
+        self.scheduler = scheduler
+        self.limits = limits
+        self.last_exceeded: Optional[LimitExceeded] = None
+
+        env = os.environ.copy()
+        if gpu_devices:
+            env["CUDA_VISIBLE_DEVICES"] = gpu_devices
+        # Ban blender audio error
+        env["AL_LIB_LOGLEVEL"] = "0"
+        if log_dir:
+            Path(log_dir).mkdir(parents=True, exist_ok=True)
+
+        self._workers = []
+        for i in range(size):
+            worker_env, device, threads = env, None, None
+            if scheduler:
+                device = scheduler.device_for(i)
+                threads = scheduler.threads
+                if device is not None:
+                    worker_env = {**env, "CUDA_VISIBLE_DEVICES": device}
+            self._workers.append(BlenderWorker(
+                blender_command,
+                worker_env,
+                log_path=str(Path(log_dir) / f"worker_{i}.log") if log_dir else None,
+                startup_timeout=startup_timeout,
+                device=device,
+                threads=threads,
+                limits=limits
+            ))
+        self._idle: "queue.Queue[BlenderWorker]" = queue.Queue()
+        for worker in self._workers:
+            self._idle.put(worker)
+
+    @contextmanager
+    def worker(self) -> Iterator[BlenderWorker]:
+        """Check out an idle worker for the duration of the context."""
+        worker = self._idle.get()
+        try:
+            yield worker
+        finally:
+            self._idle.put(worker)
+
+    def run(
+        self,
+        blend_file: Optional[str],
+        script: str,
+        args: List[str],
+        env: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = 300,
+        code: Optional[str] = None
+    ) -> Tuple[bool, str, str]:
+        """Run a wrapper script on an idle worker.
+
+        Args:
+            blend_file: .blend file to reset to before running, or None to
+                run against whatever scene the worker currently holds.
+            script: Path to the wrapper script.
+            args: Arguments placed after ``--`` in ``sys.argv``.
+            env: Extra environment variables for the duration of the run.
+            timeout: Seconds to wait before killing the worker (the limits'
+                timeout takes precedence when set).
+            code: If set, user code the worker applies in its persistent
+                namespace in the wrapper's exec step, after the wrapper's
+                render setup (the wrapper should then be given an empty code
+                file). Without blend_file it is applied on top of the
+                previous apply.
+
+        Returns:
+            Tuple of (success, stdout, stderr).
+        """
+        with self.worker() as worker:
+            return self.run_on(worker, blend_file, script, args, env, timeout, code)
+
+    def run_on(
+        self,
+        worker: BlenderWorker,
+        blend_file: Optional[str],
+        script: str,
+        args: List[str],
+        env: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = 300,
+        code: Optional[str] = None
+    ) -> Tuple[bool, str, str]:
+        """Run a wrapper script on a specific, already checked-out worker.
+
+        See ``run`` for the argument semantics.
+        """
+        if not worker.alive:
+            worker.stop()
+            try:
+                worker.start(blend_file)
+            except (RuntimeError, OSError) as e:
+                return False, "", f"Failed to start Blender worker: {e}"
+        message = {"op": "run", "blend_file": blend_file, "script": script, "args": list(args), "env": env or {}}
+        if code is not None:
+            message.update(op="apply", code=code)
+        timeout = self._timeout(timeout)
+        self.last_exceeded = None
+        try:
+            with self._slot(worker):
+                response = worker.request(message, timeout)
+        except TimeoutError as e:
+            if not self.limits:
+                return False, "", str(e)
+            self.last_exceeded = LimitExceeded("timeout", timeout, timeout, "s")
+            return False, "", self.last_exceeded.message()
+        except WorkerLimitExceeded as e:
+            self.last_exceeded = e.exceeded
+            return False, "", str(e)
+        except (EOFError, OSError) as e:
+            worker.stop()
+            return False, "", f"Blender worker exited unexpectedly: {e}"
+        return response["ok"], self._truncate(response.get("stdout", "")), self._truncate(response.get("stderr", ""))
+
+    def run_batch(
+        self,
+        blend_file: str,
+        script: str,
+        arg_lists: List[List[str]],
+        env: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = 300,
+        max_parallel: Optional[int] = None
+    ) -> List[Tuple[bool, str, str]]:
+        """Evaluate several candidates against one loaded scene.
+
+        The worker loads blend_file once and forks a child per candidate
+        (see ``blender_worker.py``), running at most max_parallel at a time.
+
+        Args:
+            blend_file: .blend file every candidate starts from.
+            script: Path to the wrapper script.
+            arg_lists: Arguments placed after ``--`` in ``sys.argv``, one
+                list per candidate.
+            env: Extra environment variables for the duration of the runs.
+            timeout: Seconds each candidate may run before it is killed (the
+                limits' timeout takes precedence when set).
+            max_parallel: Maximum number of concurrent children (defaults to
+                all candidates at once).
+
+        Returns:
+            One (success, stdout, stderr) tuple per candidate.
+        """
+        with self.worker() as worker:
+            if not worker.alive:
+                worker.stop()
+                try:
+                    worker.start(blend_file)
+                except (RuntimeError, OSError) as e:
+                    return [(False, "", f"Failed to start Blender worker: {e}")] * len(arg_lists)
+            timeout = self._timeout(timeout)
+            message = {
+                "op": "fork_batch",
+                "blend_file": blend_file,
+                "script": script,
+                "arg_lists": [list(args) for args in arg_lists],
+                "env": env or {},
+                "timeout": timeout,
+                "max_parallel": max_parallel
+            }
+            self.last_exceeded = None
+            parallel = max_parallel or len(arg_lists) or 1
+            waves = -(-len(arg_lists) // parallel)
+            batch_timeout = timeout * waves + 60 if timeout else None
+            try:
+                with self._slot(worker) as slot:
+                    if slot:
+                        # The forked children share the slot's thread budget
+                        message["threads"] = max(1, slot.threads // min(parallel, len(arg_lists) or 1))
+                    response = worker.request(message, batch_timeout)
+            except TimeoutError as e:
+                if not self.limits:
+                    return [(False, "", str(e))] * len(arg_lists)
+                self.last_exceeded = LimitExceeded("timeout", timeout, batch_timeout, "s")
+                return [(False, "", self.last_exceeded.message())] * len(arg_lists)
+            except WorkerLimitExceeded as e:
+                self.last_exceeded = e.exceeded
+                return [(False, "", str(e))] * len(arg_lists)
+            except (EOFError, OSError) as e:
+                worker.stop()
+                return [(False, "", f"Blender worker exited unexpectedly: {e}")] * len(arg_lists)
+        if not response.get("ok"):
+            return [(False, response.get("stdout", ""), response.get("stderr", ""))] * len(arg_lists)
+        return [(r["ok"], self._truncate(r.get("stdout", "")), self._truncate(r.get("stderr", ""))) for r in response["results"]]
+
+    def warm(self, blend_file: Optional[str] = None) -> int:
+        """Start the idle workers that are not running, without waiting for busy ones.
+
+        Lets the caller pay Blender's startup while it waits on something
+        else (e.g. the LLM), instead of on the next request.
+
+        Args:
+            blend_file: Optional .blend file to preload.
+
+        Returns:
+            The number of workers started.
+        """
+        started = 0
+        for _ in range(self.size):
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                if not worker.alive:
+                    worker.stop()
+                    worker.start(blend_file)
+                    started += 1
+            except (RuntimeError, OSError) as e:
+                logging.warning(f"Failed to warm Blender worker: {e}")
+            finally:
+                self._idle.put(worker)
+        return started
+
+    def _timeout(self, timeout: Optional[float]) -> Optional[float]:
+        """Return the request timeout, preferring the limits' timeout."""
+        return self.limits.timeout if self.limits and self.limits.timeout else timeout
+
+    def _truncate(self, text: str) -> str:
+        """Shorten worker output to the output limit."""
+        return self.limits.truncate(text) if self.limits else text
+
+    @contextmanager
+    def _slot(self, worker: BlenderWorker) -> Iterator[Optional[Any]]:
+        """Hold a render slot on the worker's device if a scheduler is set."""
+        if not self.scheduler:
+            yield None
+            return
+        with self.scheduler.slot(device=worker.device) as slot:
+            yield slot
+
+    def close(self) -> None:
+        """Stop all workers."""
+        for worker in self._workers:
+            worker.stop()
@@ -1,14 +1,18 @@
 """Common utility functions for API clients, image encoding, and model response handling."""
+import asyncio
 import base64
 import io
 import json
 import logging
 import os
-import time
+import random
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from PIL import Image
 
 from utils._api_keys import (
@@ -24,6 +28,10 @@ from utils._api_keys import (
     QWEN_BASE_URL,
     VA_API_KEY,
 )
+from utils.image_similarity import local_distances, target_image
+from utils.llm_cache import LLMCacheMiss, cache_client
+from utils.rate_limit import provider_for, rate_limit_client
+from utils.streaming import ChunkAccumulator, ToolCallStream
 
 import re
 
@@ -66,85 +74,270 @@ def parse_groq_tool_call(content: str) -> Optional[Dict[str, Any]]:
     return None
 
 
-def get_model_response(client: OpenAI, chat_args: Dict, num_candidates: int) -> List[Any]:
-    """Get model responses with retry logic.
+# Providers whose OpenAI-compatible endpoint returns several choices for n > 1
+_N_PARAM_MODELS = ("gpt", "o1", "o3", "o4", "qwen")
+
+
+def _supports_n(model: str) -> bool:
+    """Return whether one request can sample several candidates with n=."""
+    model = (model or "").lower()
+    return any(model.startswith(prefix) or f"/{prefix}" in model for prefix in _N_PARAM_MODELS)
+
+
+def _split_choices(response: Any) -> List[Any]:
+    """Split a response with several choices into one response per choice."""
+    if len(response.choices) <= 1:
+        return [response]
+    return [response.model_copy(update={"choices": [choice]}) for choice in response.choices]
+
+
+async def _create_with_retry(
+    client: AsyncOpenAI,
+    chat_args: Dict,
+    semaphore: asyncio.Semaphore,
+    max_retries: int = 5,
+    base_delay: float = 30,
+    max_delay: float = 120,
+    consume: Optional[Callable[[Any], Awaitable[Any]]] = None
+) -> Any:
+    """Request one completion, retrying with jittered exponential backoff.
+
+    Only this request waits between attempts; other candidates keep going.
+    With consume, the response (a stream) is passed to it and its result is
+    returned; an error while consuming retries the whole request.
+
+    Raises:
+        Exception: The last error if all retries fail.
+    """
+    for attempt in range(max_retries):
+        try:
+            async with semaphore:
+                response = await client.chat.completions.create(**chat_args)
+                return await consume(response) if consume else response
+        except LLMCacheMiss:
+            raise
+        except Exception as e:
+            logging.error(f"API call failed: {e}")
+            logging.error(f"Chat args model: {chat_args.get('model')}")
+            if attempt == max_retries - 1:
+                raise
+            # Equal jitter, so candidates that failed together do not retry together
+            delay = min(base_delay * 1.5 ** attempt, max_delay)
+            delay = delay / 2 + random.uniform(0, delay / 2)
+            logging.info(f"Retrying in {delay:.1f}s... ({max_retries - attempt - 1} retries left)")
+            await asyncio.sleep(delay)
+
+
+async def get_model_response(
+    client: AsyncOpenAI,
+    chat_args: Dict,
+    num_candidates: int,
+    max_concurrency: int = 0
+) -> List[Any]:
+    """Get candidate model responses concurrently with retry logic.
+
+    Where the provider supports it, all candidates are sampled by one request
+    with n=; otherwise (or for candidates that request did not return) one
+    request per candidate is sent concurrently. Each request retries on its
+    own, and candidates that still fail are dropped.
 
     Args:
-        client: OpenAI client instance.
+        client: Async OpenAI client instance.
         chat_args: Chat completion arguments.
         num_candidates: Number of candidate responses to generate.
+        max_concurrency: Maximum requests in flight (0 sends all at once).
 
     Returns:
-        List of candidate responses.
+        List of candidate responses, each with a single choice.
 
     Raises:
-        Exception: If all retries fail.
+        LLMCacheMiss: If the LLM cache replays and a candidate is not in it.
+        Exception: If no candidate could be generated.
     """
-    # repeat multiple time to avoid network errors
-    # select the best candidate from the responses
-    candidate_responses = []
-    for idx in range(num_candidates):
-        max_retries = 5  # Increased retries for rate limiting
-        retry_delay = 30  # Start with 30 second delay
-        while max_retries > 0:
-            try:
-                response = client.chat.completions.create(**chat_args)
-                candidate_responses.append(response)
-                break
-            except Exception as e:
-                logging.error(f"API call failed: {e}")
-                logging.error(f"Chat args model: {chat_args.get('model')}")
-                max_retries -= 1
-                if max_retries > 0:
-                    logging.info(f"Retrying in {retry_delay}s... ({max_retries} retries left)")
-                    time.sleep(retry_delay)
-                    retry_delay = min(retry_delay * 1.5, 120)  # Exponential backoff, max 2 min
+    semaphore = asyncio.Semaphore(max_concurrency if max_concurrency > 0 else max(1, num_candidates))
+    candidate_responses: List[Any] = []
+    if num_candidates > 1 and _supports_n(chat_args.get("model")):
+        try:
+            response = await _create_with_retry(client, {**chat_args, "n": num_candidates}, semaphore, max_retries=1)
+            candidate_responses.extend(_split_choices(response)[:num_candidates])
+        except LLMCacheMiss:
+            # The recorded run may have fallen back as below; its per-candidate
+            # requests raise the miss if they were not recorded either
+            logging.info("Sampling with n= not in the LLM cache, replaying one request per candidate")
+        except Exception as e:
+            logging.warning(f"Sampling {num_candidates} candidates with n= failed, sending one request per candidate: {e}")
+
+    remaining = num_candidates - len(candidate_responses)
+    results = await asyncio.gather(
+        *(_create_with_retry(client, chat_args, semaphore) for _ in range(remaining)),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, LLMCacheMiss):
+            raise result
+    candidate_responses.extend(r for r in results if not isinstance(r, BaseException))
     if len(candidate_responses) == 0:
         raise Exception("Failed to get model response")
     return candidate_responses
 
-def build_client(model_name: str) -> OpenAI:
-    """Build an OpenAI client for the specified model."""
-    model_name = model_name.lower()
-    if "gpt" in model_name:
-        return OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
-    elif "claude" in model_name:
-        return OpenAI(api_key=CLAUDE_API_KEY, base_url=CLAUDE_BASE_URL)
-    elif "gemini" in model_name:
-        return OpenAI(api_key=GEMINI_API_KEY, base_url=GEMINI_BASE_URL)
-    elif "groq" in model_name or "llama" in model_name or "mixtral" in model_name or "meta-llama" in model_name:
-        return OpenAI(api_key=GROQ_API_KEY, base_url=GROQ_BASE_URL)
-    elif "qwen" in model_name:
-        return OpenAI(api_key='not_used', base_url=QWEN_BASE_URL)
-    else:
-        raise ValueError(f"Invalid model name: {model_name}")
+async def get_streamed_response(
+    client: AsyncOpenAI,
+    chat_args: Dict,
+    on_field: Callable[[str, Optional[str], Any], None],
+    no_tools: bool = False
+) -> Any:
+    """Get one model response by streaming it, reporting its tool call as it takes shape.
+
+    on_field is called with (tool name, None, None) once the name of the
+    response's first tool call is known, and with (tool name, argument,
+    value) whenever one of its string arguments is complete (see
+    utils.streaming.ToolCallStream). A retry after an error reports the new
+    response's tool call again.
+
+    Args:
+        client: Async OpenAI client instance.
+        chat_args: Chat completion arguments.
+        on_field: Called from the event loop; must not block.
+        no_tools: Parse the ```json block of the content as the tool call.
+
+    Returns:
+        The response, joined into a non-streamed ChatCompletion.
+    """
+    async def consume(stream: Any) -> Any:
+        accumulator = ChunkAccumulator()
+        tool_call = ToolCallStream(no_tools)
+        async for chunk in stream:
+            accumulator.add(chunk)
+            known = tool_call.name
+            completed = tool_call.feed(chunk)
+            if tool_call.name and not known:
+                on_field(tool_call.name, None, None)
+            for field, value in completed.items():
+                on_field(tool_call.name, field, value)
+        return accumulator.completion()
+
+    return await _create_with_retry(client, {**chat_args, "stream": True}, asyncio.Semaphore(1), consume=consume)
+
+def build_client(model_name: str, priority: str = "high") -> OpenAI:
+    """Build an OpenAI client for the specified model, routed through the rate-limit scheduler and the LLM cache."""
+    return cache_client(rate_limit_client(OpenAI(**get_model_info(model_name)), priority))
     
 def get_model_info(model_name: str) -> Dict[str, str]:
     """Get API key and base URL for the specified model."""
-    model_name = model_name.lower()
-    if "gpt" in model_name:
+    provider = provider_for(model_name)
+    if provider == "openai":
         return {"api_key": OPENAI_API_KEY, "base_url": OPENAI_BASE_URL}
-    elif "claude" in model_name:
+    elif provider == "claude":
         return {"api_key": CLAUDE_API_KEY, "base_url": CLAUDE_BASE_URL}
-    elif "gemini" in model_name:
+    elif provider == "gemini":
         return {"api_key": GEMINI_API_KEY, "base_url": GEMINI_BASE_URL}
-    elif "groq" in model_name or "llama" in model_name or "mixtral" in model_name or "meta-llama" in model_name:
+    elif provider == "groq":
         return {"api_key": GROQ_API_KEY, "base_url": GROQ_BASE_URL}
-    elif "qwen" in model_name:
+    elif provider == "qwen":
         return {"api_key": 'not_used', "base_url": QWEN_BASE_URL}
     else:
-        raise ValueError(f"Invalid model name: {model_name}")
+        raise ValueError(f"Invalid model name: {model_name.lower()}")
     
 def get_meshy_info() -> Dict[str, str]:
     """Get Meshy API key and VA API key."""
     return {"meshy_api_key": MESHY_API_KEY, "va_api_key": VA_API_KEY}
 
+class ImageCache:
+    """Process-wide LRU cache of image data URLs with a memory budget.
+
+    Entries are keyed by the file's path, modification time and size plus
+    the encode options, so an image rewritten in place (e.g. a render of the
+    next round) is encoded again.
+
+    Attributes:
+        max_bytes: Budget for the cached data URLs in bytes.
+    """
+
+    def __init__(self, max_mb: float = 256) -> None:
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._entries: "OrderedDict[Tuple[Any, ...], str]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, image_path: str, options: Tuple[Any, ...], encode: Callable[[], str]) -> str:
+        """Return the cached data URL of an image, encoding it on a miss.
+
+        Args:
+            image_path: Path to the image file.
+            options: Encode options that change the result.
+            encode: Produces the data URL on a miss.
+        """
+        stat = os.stat(image_path)
+        key = (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size, options)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        url = encode()
+        with self._lock:
+            if key not in self._entries and len(url) <= self.max_bytes:
+                self._entries[key] = url
+                self._size += len(url)
+                while self._size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= len(evicted)
+        return url
+
+    def resize(self, max_mb: float) -> None:
+        """Change the memory budget, evicting entries that no longer fit."""
+        with self._lock:
+            self.max_bytes = int(max_mb * 1024 * 1024)
+            while self._entries and self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self) -> None:
+        """Drop all cached entries."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+image_cache = ImageCache()
+
+
+def configure_image_cache(max_mb: float) -> None:
+    """Set the memory budget of the image cache (0 disables caching)."""
+    image_cache.resize(max_mb)
+
+
+# Modes each format can be sent in unchanged
+_PASSTHROUGH_MODES = {"PNG": ("RGB", "RGBA", "L", "LA"), "JPEG": ("RGB", "L"), "WEBP": ("RGB", "RGBA")}
+
+
 def get_image_base64(image_path: str) -> str:
-    """Return a full data URL for the image, preserving original jpg/png format."""
+    """Return a full data URL for the image, preserving original jpg/png format.
+
+    Results are cached by path, modification time and size.
+    """
+    return image_cache.get(image_path, (), lambda: _encode_image_base64(image_path))
+
+
+def _encode_image_base64(image_path: str) -> str:
+    """Encode an image file as a data URL, see get_image_base64."""
     image = Image.open(image_path)
-    img_byte_array = io.BytesIO()
     ext = os.path.splitext(image_path)[1].lower()
-    
+    if ext in ['.jpg', '.jpeg']:
+        target_format = 'JPEG'
+    elif ext == '.png':
+        target_format = 'PNG'
+    else:
+        target_format = image.format or 'PNG'
+
+    # Files already in the target format and a suitable mode are sent as-is,
+    # without a decode/encode round trip (Image.open only reads the header)
+    if image.format == target_format and image.mode in _PASSTHROUGH_MODES.get(target_format, ()):
+        with open(image_path, "rb") as f:
+            base64enc_image = base64.b64encode(f.read()).decode('utf-8')
+        image.close()
+        return f"data:image/{target_format.lower()};base64,{base64enc_image}"
+
+    img_byte_array = io.BytesIO()
     # Convert image to appropriate mode for saving
     if ext in ['.jpg', '.jpeg']:
         save_format = 'JPEG'
@@ -227,65 +420,112 @@ def extract_code_pieces(text: str, concat: bool = True) -> list[str]:
     if concat: return '\n\n'.join(code_pieces)
     return code_pieces
 
-def tournament_select_best(candidate_results: List[Dict], target_image_path: str, model: str = "gpt-4o") -> int:
+def run_tournament(
+    images: List[Optional[str]],
+    target_path: Optional[str],
+    compare: Callable[[str, str], int],
+    margin: float = 0.0,
+    use_clip: bool = False,
+) -> int:
+    """
+    Run a knockout tournament over candidate renders and return the winner's index.
+
+    With a positive margin all candidates are first scored locally against the
+    target (photometric loss + 1 - SSIM, plus the CLIP distance with use_clip,
+    see utils.image_similarity). Candidates whose distance is more than margin
+    (relative) above the best one are dropped, and matches whose distances
+    differ by more than margin are decided locally. Only close calls are sent
+    to compare. The compared matches of a bracket round run concurrently.
+
+    Args:
+        images: The render of each candidate, or None for a candidate without renders
+        target_path: Target image, or a task's target directory
+        compare: Returns 1 if its first image is closer to the target, else 2
+        margin: Relative distance gap decided without compare (0 compares every match)
+        use_clip: Add the CLIP distance to the local scores
+
+    Returns:
+        Index of the winning candidate
+    """
+    if len(images) <= 1:
+        return 0
+
+    distances: Dict[int, float] = {}
+    scored = [i for i, image in enumerate(images) if image]
+    if margin > 0 and target_path and scored:
+        try:
+            distances = dict(zip(scored, local_distances([images[i] for i in scored], target_path, use_clip)))
+        except Exception as e:
+            logging.warning(f"Local scoring of the candidates failed, comparing every match: {e}")
+
+    def clearly_worse(a: int, b: int) -> bool:
+        return a in distances and b in distances and distances[a] - distances[b] > margin * max(distances[b], 1e-6)
+
+    current = list(range(len(images)))
+    if distances:
+        best = min(distances, key=distances.get)
+        current = [i for i in scored if not clearly_worse(i, best)]
+
+    while len(current) > 1:
+        pairs = [(current[i], current[i + 1]) for i in range(0, len(current) - 1, 2)]
+        winners: Dict[Tuple[int, int], int] = {}
+        close_calls = []
+        for idx1, idx2 in pairs:
+            if not images[idx1] or not images[idx2]:
+                # A candidate without renders loses
+                winners[(idx1, idx2)] = idx2 if images[idx2] else idx1
+            elif clearly_worse(idx1, idx2) or clearly_worse(idx2, idx1):
+                winners[(idx1, idx2)] = idx1 if distances[idx1] < distances[idx2] else idx2
+            else:
+                close_calls.append((idx1, idx2))
+        if close_calls:
+            with ThreadPoolExecutor(max_workers=len(close_calls)) as pool:
+                results = pool.map(lambda pair: compare(images[pair[0]], images[pair[1]]), close_calls)
+                for (idx1, idx2), winner in zip(close_calls, results):
+                    winners[(idx1, idx2)] = idx1 if winner == 1 else idx2
+        next_round = [winners[pair] for pair in pairs]
+        if len(current) % 2:
+            # Odd number, last one gets bye
+            next_round.append(current[-1])
+        current = next_round
+
+    return current[0]
+
+def tournament_select_best(
+    candidate_results: List[Dict],
+    target_image_path: str,
+    model: str = "gpt-4o",
+    margin: float = 0.0,
+    use_clip: bool = False,
+) -> int:
     """
     Run tournament to select the best candidate using VLM comparison.
     
     Args:
-        candidate_results: List of dicts with keys 'render_dir' (path to render directory)
+        candidate_results: List of tool responses with key 'image' (paths of the candidate's renders)
         target_image_path: Path to target image
         model: Vision model name
+        margin: Relative local distance gap decided without the VLM, see run_tournament
+        use_clip: Add the CLIP distance to the local scores
         
     Returns:
         Index of the winning candidate
     """
-    if len(candidate_results) == 0:
-        return 0
-    
-    if len(candidate_results) == 1:
-        return 0
-    
-    # Tournament: keep pairing and comparing until one winner
-    current_candidates = list(range(len(candidate_results)))
-    
-    while len(current_candidates) > 1:
-        next_round = []
-        
-        # Pair up candidates
-        for i in range(0, len(current_candidates), 2):
-            if i + 1 < len(current_candidates):
-                idx1 = current_candidates[i]
-                idx2 = current_candidates[i + 1]
-                
-                render1_files = candidate_results[idx1].get('image', [])
-                render2_files = candidate_results[idx2].get('image', [])
-                
-                if not render1_files:
-                    # If no renders, default to first candidate
-                    next_round.append(idx2)
-                    continue
-                elif not render2_files:
-                    next_round.append(idx1)
-                    continue
-                
-                img1_path = str(render1_files[0])
-                img2_path = str(render2_files[0])
-                
-                # Compare which is closer to target
-                winner = vlm_compare_images(img1_path, img2_path, target_image_path, model)
-                
-                # Winner is 1 or 2, convert to index
-                winner_idx = idx1 if winner == 1 else idx2
-                next_round.append(winner_idx)
-            else:
-                # Odd number, last one gets bye
-                next_round.append(current_candidates[i])
-        
-        current_candidates = next_round
-    
-    return current_candidates[0]
+    images = [str(result['image'][0]) if result.get('image') else None for result in candidate_results]
+    # One client for all matches; on an invalid model every comparison fails and defaults to image 1, as before
+    try:
+        client = build_client(model) if len(images) > 1 else None
+    except ValueError:
+        client = None
+    return run_tournament(
+        images,
+        target_image_path,
+        lambda image1, image2: vlm_compare_images(image1, image2, target_image_path, model, client),
+        margin,
+        use_clip,
+    )
 
-def vlm_compare_images(image1_path: str, image2_path: str, target_path: str, model: str = "gpt-4o") -> int:
+def vlm_compare_images(image1_path: str, image2_path: str, target_path: str, model: str = "gpt-4o", client: Optional[OpenAI] = None) -> int:
     """
     Use VLM to compare two images and determine which is closer to target.
     
@@ -294,6 +534,7 @@ def vlm_compare_images(image1_path: str, image2_path: str, target_path: str, mod
         image2_path: Path to second image  
         target_path: Path to target image
         model: Vision model to use
+        client: Client to reuse across comparisons (built per call if None)
         
     Returns:
         1 if image1 is closer to target, 2 if image2 is closer to target
@@ -302,18 +543,11 @@ def vlm_compare_images(image1_path: str, image2_path: str, target_path: str, mod
         # Encode images
         image1_b64 = get_image_base64(image1_path)
         image2_b64 = get_image_base64(image2_path)
-        if os.path.isdir(target_path):
-            target_new_path = os.path.join(target_path, 'visprompt1.png')
-            if not os.path.exists(target_new_path):
-                target_new_path = os.path.join(target_path, 'style1.png')
-                if not os.path.exists(target_new_path):
-                    target_new_path = os.path.join(target_path, 'render1.png')
-        else:
-            target_new_path = target_path
-        target_b64 = get_image_base64(target_new_path)
+        target_b64 = get_image_base64(target_image(target_path))
         
         # Initialize OpenAI client
-        client = build_client(model)
+        if client is None:
+            client = build_client(model)
         
         # Create messages
         messages = [
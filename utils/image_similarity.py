@@ -0,0 +1,140 @@
+"""Local image similarity scores against a target image.
+
+Cheap CPU scores used where a VLM call or a full evaluation would be too
+slow: early stopping of trajectories and the pre-filter of the candidate
+tournament.
+
+- photometric_loss: mean squared error of RGB in [0, 1], as the evaluators
+  compute it;
+- ssim: structural similarity of the grayscale images (7x7 windows);
+- clip_similarity / ClipEncoder: cosine similarity of CLIP image features
+  (needs torch and transformers, loaded on first use).
+
+local_distances scores a batch of images against one target at a reduced
+resolution and combines the scores into one distance (lower is closer).
+"""
+
+import os
+import threading
+from typing import List, Optional, Sequence
+
+import numpy as np
+from PIL import Image
+
+# Longest side images are reduced to for local_distances
+_SCORE_SIDE = 256
+
+# SSIM window size and stabilizing constants for values in [0, 1]
+_SSIM_WINDOW = 7
+_SSIM_C1 = 0.01 ** 2
+_SSIM_C2 = 0.03 ** 2
+
+_CLIP_MODEL = "openai/clip-vit-base-patch32"
+
+
+def photometric_loss(image1: Image.Image, image2: Image.Image) -> float:
+    """Return the mean squared error of two images' RGB values in [0, 1], as the evaluators compute it."""
+    if image1.size != image2.size:
+        image2 = image2.resize(image1.size)
+    img1 = np.asarray(image1.convert("RGB"), dtype=np.float32) / 255.0
+    img2 = np.asarray(image2.convert("RGB"), dtype=np.float32) / 255.0
+    return float(np.mean(np.square(img1 - img2)))
+
+
+def _box_mean(x: np.ndarray, k: int) -> np.ndarray:
+    """Return the mean of every k x k window of x (valid windows only)."""
+    c = np.pad(x, ((1, 0), (1, 0))).cumsum(0).cumsum(1)
+    return (c[k:, k:] - c[:-k, k:] - c[k:, :-k] + c[:-k, :-k]) / (k * k)
+
+
+def ssim(image1: Image.Image, image2: Image.Image) -> float:
+    """Return the mean structural similarity of two images in grayscale."""
+    if image1.size != image2.size:
+        image2 = image2.resize(image1.size)
+    x = np.asarray(image1.convert("L"), dtype=np.float64) / 255.0
+    y = np.asarray(image2.convert("L"), dtype=np.float64) / 255.0
+    k = min(_SSIM_WINDOW, *x.shape)
+    mu_x, mu_y = _box_mean(x, k), _box_mean(y, k)
+    var_x = _box_mean(x * x, k) - mu_x ** 2
+    var_y = _box_mean(y * y, k) - mu_y ** 2
+    cov = _box_mean(x * y, k) - mu_x * mu_y
+    ssim_map = ((2 * mu_x * mu_y + _SSIM_C1) * (2 * cov + _SSIM_C2)) / ((mu_x ** 2 + mu_y ** 2 + _SSIM_C1) * (var_x + var_y + _SSIM_C2))
+    return float(ssim_map.mean())
+
+
+class ClipEncoder:
+    """CLIP image features, with the model loaded once per process."""
+
+    _instance: Optional["ClipEncoder"] = None
+    _lock = threading.Lock()
+
+    def __init__(self) -> None:
+        import torch
+        from transformers import CLIPModel, CLIPProcessor
+
+        self._torch = torch
+        self.model = CLIPModel.from_pretrained(_CLIP_MODEL)
+        self.processor = CLIPProcessor.from_pretrained(_CLIP_MODEL)
+        self._run_lock = threading.Lock()
+
+    @classmethod
+    def get(cls) -> "ClipEncoder":
+        """Return the process's encoder, loading CLIP on first use."""
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def features(self, images: Sequence[Image.Image]) -> np.ndarray:
+        """Return the L2-normalized features of a batch of images, one row each."""
+        inputs = self.processor(images=[image.convert("RGB") for image in images], return_tensors="pt")
+        with self._run_lock, self._torch.no_grad():
+            features = self.model.get_image_features(**inputs)
+        features = features / features.norm(dim=-1, keepdim=True)
+        return features.numpy()
+
+
+def clip_similarity(image1: Image.Image, image2: Image.Image) -> float:
+    """Return the cosine similarity of two images' CLIP features."""
+    features = ClipEncoder.get().features([image1, image2])
+    return float(features[0] @ features[1])
+
+
+def target_image(target_path: str) -> str:
+    """Return the target image file of a target path, which may be a task's target directory."""
+    if not os.path.isdir(target_path):
+        return target_path
+    for name in ("visprompt1.png", "style1.png", "render1.png"):
+        if os.path.exists(os.path.join(target_path, name)):
+            return os.path.join(target_path, name)
+    return os.path.join(target_path, "render1.png")
+
+
+def _reduced(path: str) -> Image.Image:
+    with Image.open(path) as image:
+        image = image.convert("RGB")
+    image.thumbnail((_SCORE_SIDE, _SCORE_SIDE), Image.BILINEAR)
+    return image
+
+
+def local_distances(image_paths: Sequence[str], target_path: str, use_clip: bool = False) -> List[float]:
+    """Score images against a target at a reduced resolution; lower is closer.
+
+    The distance is the photometric loss plus 1 - SSIM, plus the CLIP
+    distance 1 - cosine similarity with use_clip (one batched forward pass).
+
+    Args:
+        image_paths: The images to score.
+        target_path: The target image, or a task's target directory.
+        use_clip: Add the CLIP distance.
+
+    Returns:
+        The distance of each image.
+    """
+    target = _reduced(target_image(target_path))
+    images = [_reduced(path) for path in image_paths]
+    distances = [photometric_loss(target, image) + (1.0 - ssim(target, image)) for image in images]
+    if use_clip and images:
+        features = ClipEncoder.get().features([target, *images])
+        distances = [d + 1.0 - float(features[0] @ f) for d, f in zip(distances, features[1:])]
+    return distances
@@ -0,0 +1,293 @@
+"""Record/replay cache of LLM responses.
+
+Every chat completion of the agents, the candidate tournament, the candidate
+code generators and the GPT evaluators goes through an OpenAI client made
+by the code of this repository. ``cache_client`` wraps such a client so its
+``chat.completions.create`` goes through the process-wide LLMCache, which
+stores responses in a SQLite file keyed by the hash of the request:
+
+- passthrough: requests go to the API and nothing is stored (the default);
+- record: a request found in the store is answered from it, any other goes
+  to the API and its response is stored, so a rerun after a crash only pays
+  for the requests the crashed run never got an answer to;
+- replay: every request is answered from the store and a request that is
+  not in it raises LLMCacheMiss, so no request reaches the network.
+
+Identical requests are told apart by how often they were answered before in
+the process: the candidates of one round share their request, and the k-th
+of them is stored and replayed as occurrence k, so replaying a run with
+several candidates returns each candidate as recorded. An attempt that fails
+before its response is stored or served gives its occurrence back, so its
+retry is stored as the occurrence a replay asks for.
+
+Streamed requests of async clients share the entry of the same request not
+streamed: a recorded stream is stored once it is complete, and a stored
+response is replayed as a stream of one chunk.
+
+The cache is configured by the ``LLM_CACHE`` and ``LLM_CACHE_MODE``
+environment variables, which configure_llm_cache sets from main.py's flags
+so the tool servers and other processes started by the task use it too::
+
+    LLM_CACHE=output/llm_cache.sqlite LLM_CACHE_MODE=replay python evaluators/...
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, Optional, Set, Tuple
+
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+from utils.streaming import ChunkAccumulator, completion_chunks
+
+MODES = ("passthrough", "record", "replay")
+
+# Request arguments that do not change the response; a streamed request shares
+# its entry with the same request not streamed
+_IGNORED_ARGS = ("timeout", "extra_headers", "stream", "stream_options")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT NOT NULL,
+    occurrence INTEGER NOT NULL,
+    model TEXT,
+    response TEXT NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (key, occurrence)
+)
+"""
+
+
+class LLMCacheMiss(Exception):
+    """A request in replay mode that is not in the cache."""
+
+
+class LLMCache:
+    """SQLite store of chat completion responses keyed by request hash.
+
+    Attributes:
+        path: The SQLite file.
+        mode: 'record' or 'replay'.
+        hits: Requests answered from the store.
+        misses: Requests sent to the API (record) or refused (replay).
+    """
+
+    def __init__(self, path: str, mode: str = "record") -> None:
+        """Open or create the store.
+
+        Args:
+            path: The SQLite file.
+            mode: 'record' or 'replay'.
+
+        Raises:
+            ValueError: If mode is not 'record' or 'replay'.
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Invalid LLM cache mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Shared by the threads and event loop of the process; the lock serializes access
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        # Several processes of one run record into the same file
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+        self._lock = threading.Lock()
+        # Occurrences of each request answered or in flight in this process
+        self._occurrences: Dict[str, Set[int]] = defaultdict(set)
+
+    def next_key(self, request: Dict[str, Any]) -> Tuple[str, int]:
+        """Return the hash of a request and reserve its next occurrence.
+
+        The occurrence is the first one not answered or in flight; a request
+        that fails before its response is stored or served must release it.
+        """
+        request = {k: v for k, v in request.items() if k not in _IGNORED_ARGS}
+        key = hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode()).hexdigest()
+        with self._lock:
+            taken = self._occurrences[key]
+            occurrence = 0
+            while occurrence in taken:
+                occurrence += 1
+            taken.add(occurrence)
+        return key, occurrence
+
+    def release(self, key: str, occurrence: int) -> None:
+        """Give back an occurrence whose request failed, for its retry to reuse."""
+        with self._lock:
+            self._occurrences[key].discard(occurrence)
+
+    def lookup(self, key: str, occurrence: int, request: Dict[str, Any]) -> Optional[ChatCompletion]:
+        """Return the stored response of a request occurrence.
+
+        Returns:
+            The response, or None in record mode if it is not stored.
+
+        Raises:
+            LLMCacheMiss: In replay mode if it is not stored.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND occurrence = ?", (key, occurrence)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if row is not None:
+            return ChatCompletion.model_validate_json(row[0])
+        if self.mode == "replay":
+            raise LLMCacheMiss(f"No cached response for {request.get('model')} request {key[:12]} (occurrence {occurrence}) in {self.path}")
+        return None
+
+    def store(self, key: str, occurrence: int, request: Dict[str, Any], response: ChatCompletion) -> None:
+        """Store the response of a request occurrence."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, occurrence, model, response, created) VALUES (?, ?, ?, ?, ?)",
+                (key, occurrence, request.get("model"), response.model_dump_json(), time.time()),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Close the store."""
+        with self._lock:
+            self._conn.close()
+
+
+_cache: Optional[LLMCache] = None
+_cache_config: Optional[Tuple[str, str]] = None
+_cache_lock = threading.Lock()
+
+
+def configure_llm_cache(path: Optional[str], mode: str = "record") -> None:
+    """Configure the LLM cache of this process and the processes it starts.
+
+    Args:
+        path: The SQLite file (None or '' disables the cache).
+        mode: 'passthrough', 'record' or 'replay'.
+
+    Raises:
+        ValueError: If mode is not one of MODES.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Invalid LLM cache mode: {mode}")
+    if path and mode != "passthrough":
+        os.environ["LLM_CACHE"] = path
+        os.environ["LLM_CACHE_MODE"] = mode
+    else:
+        os.environ.pop("LLM_CACHE", None)
+        os.environ.pop("LLM_CACHE_MODE", None)
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Return the LLM cache configured by the environment, or None for passthrough."""
+    global _cache, _cache_config
+    path = os.getenv("LLM_CACHE")
+    mode = os.getenv("LLM_CACHE_MODE") or "record"
+    if not path or mode == "passthrough":
+        return None
+    with _cache_lock:
+        if _cache_config != (path, mode):
+            if _cache is not None:
+                _cache.close()
+            _cache = LLMCache(path, mode)
+            _cache_config = (path, mode)
+            logging.info(f"LLM cache: {mode} {path}")
+        return _cache
+
+
+def _cacheable(request: Dict[str, Any], streams: bool = False) -> bool:
+    """Streamed responses are cached only for async clients."""
+    return streams or not request.get("stream")
+
+
+async def _replay_stream(response: ChatCompletion) -> AsyncIterator[ChatCompletionChunk]:
+    """Stream a cached response."""
+    for chunk in completion_chunks(response):
+        yield chunk
+
+
+async def _record_stream(
+    stream: Any, cache: LLMCache, key: str, occurrence: int, request: Dict[str, Any]
+) -> AsyncIterator[ChatCompletionChunk]:
+    """Pass a stream on and store its response once it is complete."""
+    accumulator = ChunkAccumulator()
+    stored = False
+    try:
+        async for chunk in stream:
+            accumulator.add(chunk)
+            yield chunk
+        cache.store(key, occurrence, request, accumulator.completion())
+        stored = True
+    finally:
+        if not stored:
+            cache.release(key, occurrence)
+
+
+def cache_client(client: Any) -> Any:
+    """Route a client's chat completions through the LLM cache.
+
+    The client is modified in place, and wrapping it again has no effect.
+    Whether the cache is used is decided for every request, so a client
+    made before configure_llm_cache follows it.
+
+    Args:
+        client: An OpenAI or AsyncOpenAI client.
+
+    Returns:
+        The client.
+    """
+    completions = client.chat.completions
+    if getattr(completions, "_llm_cached", False):
+        return client
+    create = completions.create
+
+    if isinstance(client, AsyncOpenAI):
+        async def cached_create(**request: Any) -> Any:
+            cache = get_llm_cache()
+            if cache is None or not _cacheable(request, streams=True):
+                return await create(**request)
+            key, occurrence = cache.next_key(request)
+            try:
+                response = cache.lookup(key, occurrence, request)
+                if request.get("stream"):
+                    if response is not None:
+                        return _replay_stream(response)
+                    return _record_stream(await create(**request), cache, key, occurrence, request)
+                if response is None:
+                    response = await create(**request)
+                    cache.store(key, occurrence, request, response)
+                return response
+            except BaseException:
+                cache.release(key, occurrence)
+                raise
+    else:
+        def cached_create(**request: Any) -> Any:
+            cache = get_llm_cache()
+            if cache is None or not _cacheable(request):
+                return create(**request)
+            key, occurrence = cache.next_key(request)
+            try:
+                response = cache.lookup(key, occurrence, request)
+                if response is None:
+                    response = create(**request)
+                    cache.store(key, occurrence, request, response)
+                return response
+            except BaseException:
+                cache.release(key, occurrence)
+                raise
+
+    completions.create = cached_create
+    completions._llm_cached = True
+    return client
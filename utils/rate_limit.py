@@ -0,0 +1,480 @@
+"""Shared rate-limit-aware scheduling of LLM requests.
+
+When a runner starts many tasks at once, every task's requests hit the same
+provider limits. Retrying independently after a fixed sleep makes the tasks
+exceed the limits together and then idle together. ``rate_limit_client``
+wraps an OpenAI client so its ``chat.completions.create`` first takes its
+share from the provider's token buckets of a process-wide RateLimiter:
+
+- one request from the requests-per-minute (RPM) bucket, and the estimated
+  tokens of the request (prompt text, images, max completion tokens) from
+  the tokens-per-minute (TPM) bucket; the estimate is corrected by the
+  ``usage`` of the response;
+- low priority requests (the evaluators) leave a share of both buckets to
+  high priority ones (the agents, the tournament, the candidate code
+  generators), so offline scoring never starves a running task;
+- a 429 response pauses every request to the provider until the reset time
+  of its headers (``retry-after-ms``, ``retry-after``,
+  ``x-ratelimit-reset-requests``/``-tokens``), or for a backoff that doubles
+  with every 429 in a row if they have none, and drains the RPM bucket so
+  requests resume at the budgeted rate. The request is then retried through
+  the buckets; the OpenAI client's own retries are disabled for it;
+- the ``x-ratelimit-remaining-*`` headers of other responses lower the
+  buckets to what the provider reports.
+
+The buckets live in a SQLite file, so all processes of a run (main.py of
+every task, the tool servers, the evaluators) share them. Providers are the
+routing of build_client: openai, claude, gemini, groq and qwen, or the
+client's host for other models.
+
+The scheduler is configured by the ``LLM_RATE_LIMITS`` environment variable,
+which configure_rate_limits sets from the ``--llm-rate-limits`` flag, as a
+comma-separated list of ``provider=RPM/TPM`` (0 or a missing TPM is no
+budget; providers not listed are only paused by their 429 responses)::
+
+    LLM_RATE_LIMITS="openai=500/200000,claude=50/40000" python evaluators/...
+
+``LLM_RATE_STATE`` overrides the SQLite file (default
+``<tmp>/viga_llm_rate_limits.sqlite``), e.g. to keep the buckets of two API
+keys apart.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple
+
+from openai import APIConnectionError, AsyncOpenAI, InternalServerError, RateLimitError
+
+PRIORITIES = ("high", "low")
+
+# Share of each budget low priority requests leave to high priority ones
+_LOW_PRIORITY_RESERVE = 0.2
+# Tokens counted per image of a request
+_IMAGE_TOKENS = 1000
+# Completion tokens counted for requests without max_tokens
+_DEFAULT_COMPLETION_TOKENS = 1024
+# Longest sleep before a waiting request checks the buckets again
+_MAX_POLL = 5.0
+# 429 responses of one request retried through the buckets before it fails
+_RATE_LIMIT_RETRIES = 6
+# Connection errors and 5xx responses retried like the OpenAI client does
+_TRANSIENT_RETRIES = 2
+# Pause after a 429 without reset headers, doubled for every 429 in a row
+_BASE_BACKOFF = 1.0
+_MAX_BACKOFF = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    provider TEXT PRIMARY KEY,
+    requests REAL NOT NULL,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL,
+    blocked_until REAL NOT NULL,
+    backoff REAL NOT NULL
+)
+"""
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def provider_for(model: Optional[str]) -> Optional[str]:
+    """Return the provider build_client routes a model to, or None for other models."""
+    model = (model or "").lower()
+    if "gpt" in model:
+        return "openai"
+    elif "claude" in model:
+        return "claude"
+    elif "gemini" in model:
+        return "gemini"
+    elif "groq" in model or "llama" in model or "mixtral" in model or "meta-llama" in model:
+        return "groq"
+    elif "qwen" in model:
+        return "qwen"
+    return None
+
+
+def parse_limits(spec: Optional[str]) -> Dict[str, Tuple[float, float]]:
+    """Parse a ``provider=RPM/TPM,...`` budget list.
+
+    Returns:
+        The (RPM, TPM) budget of each listed provider; 0 is no budget.
+
+    Raises:
+        ValueError: If an entry is malformed.
+    """
+    limits = {}
+    for entry in (spec or "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        provider, sep, budget = entry.partition("=")
+        rpm, _, tpm = budget.partition("/")
+        try:
+            if not sep or not provider.strip():
+                raise ValueError
+            limits[provider.strip().lower()] = (float(rpm or 0), float(tpm or 0))
+        except ValueError:
+            raise ValueError(f"Invalid LLM rate limit '{entry}', expected provider=RPM/TPM") from None
+    return limits
+
+
+def _parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse seconds ('1.5') or an OpenAI reset duration ('6m0s', '20ms') into seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts or "".join(number + unit for number, unit in parts) != value:
+        return None
+    scale = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+
+def retry_delay(headers: Mapping[str, str]) -> Optional[float]:
+    """Return the seconds until a provider accepts requests again, from the headers of a 429 response."""
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    delay = _parse_duration(headers.get("retry-after"))
+    if delay is not None:
+        return delay
+    resets = [_parse_duration(headers.get(f"x-ratelimit-reset-{kind}")) for kind in ("requests", "tokens")]
+    resets = [reset for reset in resets if reset is not None]
+    return max(resets) if resets else None
+
+
+def estimate_tokens(request: Dict[str, Any]) -> int:
+    """Estimate the tokens a chat completion request counts against a TPM budget."""
+    chars, images = 0, 0
+    for message in request.get("messages") or []:
+        if not isinstance(message, dict):
+            chars += len(str(message))
+            continue
+        content = message.get("content")
+        if isinstance(content, str):
+            chars += len(content)
+        elif isinstance(content, list):
+            for part in content:
+                if part.get("type") == "text":
+                    chars += len(part.get("text") or "")
+                elif part.get("type") in ("image_url", "input_image"):
+                    images += 1
+        for tool_call in message.get("tool_calls") or []:
+            chars += len(json.dumps(tool_call, default=str))
+    if request.get("tools"):
+        chars += len(json.dumps(request["tools"], default=str))
+    completion = request.get("max_completion_tokens") or request.get("max_tokens") or _DEFAULT_COMPLETION_TOKENS
+    return chars // 4 + images * _IMAGE_TOKENS + completion * max(1, request.get("n") or 1)
+
+
+class RateLimiter:
+    """Token buckets of the providers, shared by processes through a SQLite file.
+
+    Attributes:
+        path: The SQLite file.
+        limits: The (RPM, TPM) budget of each provider.
+        waited: Seconds requests of this process waited for the buckets.
+        rate_limited: 429 responses this process received.
+    """
+
+    def __init__(self, path: str, limits: Dict[str, Tuple[float, float]]) -> None:
+        """Open or create the buckets.
+
+        Args:
+            path: The SQLite file.
+            limits: The (RPM, TPM) budget of each provider; 0 is no budget.
+        """
+        self.path = path
+        self.limits = limits
+        self.waited = 0.0
+        self.rate_limited = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Transactions are explicit; the lock serializes the threads of the process
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_SCHEMA)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _bucket(self, provider: str) -> Iterator[Dict[str, float]]:
+        """Lock a provider's bucket, refilled up to now, and save it afterwards."""
+        rpm, tpm = self.limits.get(provider, (0.0, 0.0))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._conn.execute(
+                    "SELECT requests, tokens, updated, blocked_until, backoff FROM buckets WHERE provider = ?", (provider,)
+                ).fetchone()
+                if row is None:
+                    row = (rpm, tpm, now, 0.0, 0.0)
+                elapsed = max(0.0, now - row[2])
+                bucket = {
+                    "now": now,
+                    "requests": min(rpm, row[0] + elapsed * rpm / 60),
+                    "tokens": min(tpm, row[1] + elapsed * tpm / 60),
+                    "blocked_until": row[3],
+                    "backoff": row[4],
+                }
+                yield bucket
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO buckets (provider, requests, tokens, updated, blocked_until, backoff) VALUES (?, ?, ?, ?, ?, ?)",
+                    (provider, bucket["requests"], bucket["tokens"], now, bucket["blocked_until"], bucket["backoff"]),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def try_acquire(self, provider: str, tokens: int, priority: str = "high") -> float:
+        """Take one request and the tokens of a request from a provider's buckets if they hold enough.
+
+        Args:
+            provider: The provider.
+            tokens: Estimated tokens of the request.
+            priority: 'high' or 'low'; low priority requests leave a reserve.
+
+        Returns:
+            0 if taken, else the seconds until the buckets may hold enough.
+        """
+        rpm, tpm = self.limits.get(provider, (0.0, 0.0))
+        reserve = _LOW_PRIORITY_RESERVE if priority == "low" else 0.0
+        with self._bucket(provider) as bucket:
+            wait = bucket["blocked_until"] - bucket["now"]
+            if wait > 0:
+                return wait
+            charged = min(tokens, tpm)
+            if rpm:
+                needed = min(rpm, 1 + reserve * rpm)
+                wait = max(wait, (needed - bucket["requests"]) * 60 / rpm)
+            if tpm:
+                needed = min(tpm, charged + reserve * tpm)
+                wait = max(wait, (needed - bucket["tokens"]) * 60 / tpm)
+            if wait > 0:
+                return wait
+            if rpm:
+                bucket["requests"] -= 1
+            if tpm:
+                bucket["tokens"] -= charged
+        return 0.0
+
+    def acquire(self, provider: str, tokens: int, priority: str = "high") -> None:
+        """Wait until try_acquire takes the request."""
+        while True:
+            wait = self.try_acquire(provider, tokens, priority)
+            if wait <= 0:
+                return
+            # A little jitter keeps the waiting requests of all tasks from checking at once
+            wait = min(wait, _MAX_POLL) + random.uniform(0, 0.05)
+            self.waited += wait
+            time.sleep(wait)
+
+    async def acquire_async(self, provider: str, tokens: int, priority: str = "high") -> None:
+        """Wait until try_acquire takes the request, without blocking the event loop."""
+        while True:
+            wait = self.try_acquire(provider, tokens, priority)
+            if wait <= 0:
+                return
+            wait = min(wait, _MAX_POLL) + random.uniform(0, 0.05)
+            self.waited += wait
+            await asyncio.sleep(wait)
+
+    def settle(self, provider: str, estimated: int, used: int) -> None:
+        """Correct the token bucket by the tokens a response reports it used."""
+        tpm = self.limits.get(provider, (0.0, 0.0))[1]
+        if not tpm:
+            return
+        with self._bucket(provider) as bucket:
+            bucket["tokens"] = min(tpm, bucket["tokens"] + min(estimated, tpm) - used)
+
+    def observe(self, provider: str, headers: Mapping[str, str]) -> None:
+        """Lower the buckets to the remaining budget a successful response reports, and end its backoff."""
+        rpm, tpm = self.limits.get(provider, (0.0, 0.0))
+        remaining = {}
+        for kind in ("requests", "tokens"):
+            try:
+                remaining[kind] = float(headers[f"x-ratelimit-remaining-{kind}"])
+            except (KeyError, ValueError):
+                pass
+        with self._bucket(provider) as bucket:
+            bucket["backoff"] = 0.0
+            if rpm and "requests" in remaining:
+                bucket["requests"] = min(bucket["requests"], remaining["requests"])
+            if tpm and "tokens" in remaining:
+                bucket["tokens"] = min(bucket["tokens"], remaining["tokens"])
+
+    def pause(self, provider: str, headers: Mapping[str, str]) -> float:
+        """Pause a provider after a 429 response.
+
+        Returns:
+            Seconds until its requests resume.
+        """
+        self.rate_limited += 1
+        with self._bucket(provider) as bucket:
+            delay = retry_delay(headers)
+            if delay is None:
+                bucket["backoff"] = min(max(2 * bucket["backoff"], _BASE_BACKOFF), _MAX_BACKOFF)
+                delay = bucket["backoff"]
+            bucket["blocked_until"] = max(bucket["blocked_until"], bucket["now"] + delay)
+            bucket["requests"] = 0.0
+            return bucket["blocked_until"] - bucket["now"]
+
+    def close(self) -> None:
+        """Close the buckets."""
+        with self._lock:
+            self._conn.close()
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_config: Optional[Tuple[str, str]] = None
+_limiter_lock = threading.Lock()
+
+
+def configure_rate_limits(spec: Optional[str]) -> None:
+    """Configure the scheduler of this process and the processes it starts.
+
+    Args:
+        spec: Budget list ``provider=RPM/TPM,...`` (None or '' disables it).
+
+    Raises:
+        ValueError: If the budget list is malformed.
+    """
+    if spec:
+        parse_limits(spec)
+        os.environ["LLM_RATE_LIMITS"] = spec
+    else:
+        os.environ.pop("LLM_RATE_LIMITS", None)
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    """Return the scheduler configured by the environment, or None if it is disabled."""
+    global _limiter, _limiter_config
+    spec = os.getenv("LLM_RATE_LIMITS")
+    if not spec:
+        return None
+    path = os.getenv("LLM_RATE_STATE") or os.path.join(tempfile.gettempdir(), "viga_llm_rate_limits.sqlite")
+    with _limiter_lock:
+        if _limiter_config != (spec, path):
+            if _limiter is not None:
+                _limiter.close()
+            _limiter = RateLimiter(path, parse_limits(spec))
+            _limiter_config = (spec, path)
+            logging.info(f"LLM rate limits: {spec} ({path})")
+        return _limiter
+
+
+def _provider(client: Any, request: Dict[str, Any]) -> str:
+    return provider_for(request.get("model")) or client.base_url.host or "default"
+
+
+def _used_tokens(response: Any) -> Optional[int]:
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None)
+
+
+def rate_limit_client(client: Any, priority: str = "high") -> Any:
+    """Route a client's chat completions through the shared rate-limit scheduler.
+
+    The client is modified in place, and wrapping it again has no effect.
+    Whether the scheduler is used is decided for every request, so a client
+    made before configure_rate_limits follows it. Wrap before cache_client,
+    so responses served from the cache take nothing from the budgets.
+
+    Args:
+        client: An OpenAI or AsyncOpenAI client.
+        priority: 'high' for the agents' requests, 'low' for offline work
+            such as the evaluators.
+
+    Returns:
+        The client.
+
+    Raises:
+        ValueError: If priority is not one of PRIORITIES.
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"Invalid LLM request priority: {priority}")
+    completions = client.chat.completions
+    if getattr(completions, "_llm_rate_limited", False):
+        return client
+    create = completions.create
+    # The scheduler retries 429 responses itself, through the shared pause
+    scheduled = client.with_options(max_retries=0).chat.completions.with_raw_response.create
+
+    if isinstance(client, AsyncOpenAI):
+        async def limited_create(**request: Any) -> Any:
+            limiter = get_rate_limiter()
+            if limiter is None:
+                return await create(**request)
+            provider, tokens = _provider(client, request), estimate_tokens(request)
+            rate_limit_retries, transient_retries = 0, 0
+            while True:
+                await limiter.acquire_async(provider, tokens, priority)
+                try:
+                    raw = await scheduled(**request)
+                except RateLimitError as e:
+                    delay = limiter.pause(provider, e.response.headers)
+                    logging.warning(f"{provider} rate limit reached, pausing its requests for {delay:.1f}s")
+                    rate_limit_retries += 1
+                    if rate_limit_retries > _RATE_LIMIT_RETRIES:
+                        raise
+                    continue
+                except (APIConnectionError, InternalServerError):
+                    transient_retries += 1
+                    if transient_retries > _TRANSIENT_RETRIES:
+                        raise
+                    await asyncio.sleep(0.5 * 2 ** transient_retries)
+                    continue
+                limiter.observe(provider, raw.headers)
+                response = raw.parse()
+                if _used_tokens(response) is not None:
+                    limiter.settle(provider, tokens, _used_tokens(response))
+                return response
+    else:
+        def limited_create(**request: Any) -> Any:
+            limiter = get_rate_limiter()
+            if limiter is None:
+                return create(**request)
+            provider, tokens = _provider(client, request), estimate_tokens(request)
+            rate_limit_retries, transient_retries = 0, 0
+            while True:
+                limiter.acquire(provider, tokens, priority)
+                try:
+                    raw = scheduled(**request)
+                except RateLimitError as e:
+                    delay = limiter.pause(provider, e.response.headers)
+                    logging.warning(f"{provider} rate limit reached, pausing its requests for {delay:.1f}s")
+                    rate_limit_retries += 1
+                    if rate_limit_retries > _RATE_LIMIT_RETRIES:
+                        raise
+                    continue
+                except (APIConnectionError, InternalServerError):
+                    transient_retries += 1
+                    if transient_retries > _TRANSIENT_RETRIES:
+                        raise
+                    time.sleep(0.5 * 2 ** transient_retries)
+                    continue
+                limiter.observe(provider, raw.headers)
+                response = raw.parse()
+                if _used_tokens(response) is not None:
+                    limiter.settle(provider, tokens, _used_tokens(response))
+                return response
+
+    completions.create = limited_create
+    completions._llm_rate_limited = True
+    return client
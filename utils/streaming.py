@@ -0,0 +1,233 @@
+"""Incremental parsing of streamed chat completions.
+
+A streamed response arrives as chunks whose deltas carry pieces of the
+content and of the tool calls' arguments. ChunkAccumulator joins them back
+into the ChatCompletion a non-streamed request returns, so code downstream
+of the request does not change. ToolCallStream follows the first tool call
+while it streams in and reports its name and each top-level string argument
+as soon as it is complete, from
+
+- a native tool call (its JSON arguments),
+- Groq's ``<function=name={...}>`` format in the content (see
+  utils.common.parse_groq_tool_call), or
+- the ```json block of the no-tools prompts, which stands for a call of
+  ``execute_and_evaluate``.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+# Start of a Groq tool call in the content, up to its JSON arguments
+_GROQ_CALL_START = re.compile(r"<function=(\w+)(?:=|\s+)")
+_JSON_BLOCK_START = "```json"
+
+
+class JSONFieldScanner:
+    """Reports the top-level string fields of a JSON object fed in pieces.
+
+    Other values are skipped; text before the object and after its end is
+    ignored.
+    """
+
+    def __init__(self) -> None:
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._chars: List[str] = []
+        self._expect_key = True
+        self._key: Optional[str] = None
+
+    def feed(self, text: str) -> Dict[str, Any]:
+        """Scan the next piece of the object.
+
+        Returns:
+            The fields completed by this piece.
+        """
+        completed = {}
+        for ch in text:
+            if self.done:
+                break
+            if self._in_string:
+                if self._depth == 1:
+                    self._chars.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._string_done(completed)
+                continue
+            if self._depth == 0 and ch != "{":
+                continue
+            if ch == '"':
+                self._in_string = True
+                self._chars = []
+            elif ch in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._expect_key = True
+            elif ch in "}]":
+                self._depth -= 1
+                self.done = self._depth == 0
+            elif self._depth == 1 and ch == ":":
+                self._expect_key = False
+            elif self._depth == 1 and ch == ",":
+                self._expect_key = True
+        return completed
+
+    def _string_done(self, completed: Dict[str, Any]) -> None:
+        try:
+            value = json.loads('"' + "".join(self._chars))
+        except ValueError:
+            value = None
+        if self._expect_key:
+            self._key = value
+        elif self._key is not None and value is not None:
+            self.fields[self._key] = completed[self._key] = value
+
+
+class ToolCallStream:
+    """Follows the first tool call of the first choice of a streamed response.
+
+    Attributes:
+        name: The tool's name once known, else None.
+        fields: The string arguments complete so far.
+    """
+
+    def __init__(self, no_tools: bool = False) -> None:
+        """Initialize the parser.
+
+        Args:
+            no_tools: Parse the ```json block of the content as a call of
+                execute_and_evaluate instead of native or Groq tool calls.
+        """
+        self.no_tools = no_tools
+        self.name: Optional[str] = None
+        self._scanner = JSONFieldScanner()
+        self._source: Optional[str] = None
+        self._content = ""
+
+    @property
+    def fields(self) -> Dict[str, Any]:
+        return self._scanner.fields
+
+    def feed(self, chunk: ChatCompletionChunk) -> Dict[str, Any]:
+        """Parse a chunk.
+
+        Returns:
+            The arguments completed by this chunk.
+        """
+        completed: Dict[str, Any] = {}
+        for choice in chunk.choices:
+            if choice.index != 0:
+                continue
+            delta = choice.delta
+            for tool_call in delta.tool_calls or []:
+                if tool_call.index != 0 or self._source == "content":
+                    continue
+                self._source = "tool_call"
+                if tool_call.function and tool_call.function.name and self.name is None:
+                    self.name = tool_call.function.name
+                if tool_call.function and tool_call.function.arguments:
+                    completed.update(self._scanner.feed(tool_call.function.arguments))
+            if delta.content and self._source != "tool_call":
+                completed.update(self._feed_content(delta.content))
+        return completed
+
+    def _feed_content(self, text: str) -> Dict[str, Any]:
+        if self._source == "content":
+            return self._scanner.feed(text)
+        self._content += text
+        if self.no_tools:
+            start = self._content.find(_JSON_BLOCK_START)
+            if start < 0:
+                return {}
+            name, rest = "execute_and_evaluate", self._content[start + len(_JSON_BLOCK_START):]
+        else:
+            match = _GROQ_CALL_START.search(self._content)
+            if not match:
+                return {}
+            name, rest = match.group(1), self._content[match.end():]
+        self._source, self.name, self._content = "content", name, ""
+        return self._scanner.feed(rest)
+
+
+class ChunkAccumulator:
+    """Joins the chunks of a streamed response into a ChatCompletion."""
+
+    def __init__(self) -> None:
+        self._id: Optional[str] = None
+        self._model = ""
+        self._created = 0
+        self._usage: Optional[Dict[str, Any]] = None
+        self._choices: Dict[int, Dict[str, Any]] = {}
+
+    def add(self, chunk: ChatCompletionChunk) -> None:
+        """Add the next chunk."""
+        self._id = self._id or chunk.id
+        self._model = self._model or chunk.model
+        self._created = self._created or chunk.created
+        if chunk.usage:
+            self._usage = chunk.usage.model_dump()
+        for choice in chunk.choices:
+            state = self._choices.setdefault(choice.index, {"content": [], "tool_calls": {}, "finish_reason": None})
+            delta = choice.delta
+            if delta.content:
+                state["content"].append(delta.content)
+            for tool_call in delta.tool_calls or []:
+                call = state["tool_calls"].setdefault(
+                    tool_call.index, {"id": "", "type": "function", "function": {"name": "", "arguments": ""}}
+                )
+                if tool_call.id:
+                    call["id"] = tool_call.id
+                if tool_call.function and tool_call.function.name:
+                    call["function"]["name"] += tool_call.function.name
+                if tool_call.function and tool_call.function.arguments:
+                    call["function"]["arguments"] += tool_call.function.arguments
+            if choice.finish_reason:
+                state["finish_reason"] = choice.finish_reason
+
+    def completion(self) -> ChatCompletion:
+        """Return the response the chunks so far make up."""
+        choices = []
+        for index in sorted(self._choices):
+            state = self._choices[index]
+            tool_calls = [state["tool_calls"][i] for i in sorted(state["tool_calls"])]
+            message = {"role": "assistant", "content": "".join(state["content"]) if state["content"] else None}
+            if tool_calls:
+                message["tool_calls"] = tool_calls
+            finish_reason = state["finish_reason"] or ("tool_calls" if tool_calls else "stop")
+            choices.append({"index": index, "message": message, "finish_reason": finish_reason})
+        return ChatCompletion.model_validate({
+            "id": self._id or "",
+            "object": "chat.completion",
+            "created": self._created,
+            "model": self._model,
+            "choices": choices,
+            "usage": self._usage,
+        })
+
+
+def completion_chunks(response: ChatCompletion) -> List[ChatCompletionChunk]:
+    """Return chunks that stream a complete response, one per choice."""
+    chunks = []
+    for choice in response.choices:
+        delta: Dict[str, Any] = {"role": "assistant", "content": choice.message.content}
+        if choice.message.tool_calls:
+            delta["tool_calls"] = [{"index": i, **call.model_dump()} for i, call in enumerate(choice.message.tool_calls)]
+        chunks.append(ChatCompletionChunk.model_validate({
+            "id": response.id,
+            "object": "chat.completion.chunk",
+            "created": response.created,
+            "model": response.model,
+            "choices": [{"index": choice.index, "delta": delta, "finish_reason": choice.finish_reason}],
+            "usage": response.usage.model_dump() if response.usage else None,
+        }))
+    return chunks